@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_cached_user(user_id):
+    """
+    Drop the cached auth fields of every token of the user in this process.
+    """
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+class DeferredUserJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads only the fields authentication and permission checks read, leaving every other
+    column deferred until it is accessed. With JWT_USER_CACHE_TTL set (seconds), those fields are also kept in an
+    in-process cache keyed by user id and token id, so repeated requests with the same token skip the query. Entries
+    are dropped by invalidate_cached_user() in the process that made the change and expire after the TTL in others,
+    so keep it short.
+    """
+    auth_fields = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+    cache_ttl = int(os.getenv('JWT_USER_CACHE_TTL', 0))
+    cache_max_users = 10000
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        # Model.from_db() expects the loaded values in the order of the model's fields.
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields
+                       if field.attname in self.auth_fields]
+        token_id = validated_token.get(api_settings.JTI_CLAIM)
+        values = self.get_cached_values(user_id, token_id)
+        cached = values is not None
+        if not cached:
+            values = (self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                      .values_list(*field_names).first())
+            if values is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        user = self.user_model.from_db(self.user_model.objects.db, field_names, values)
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if not cached:
+            self.set_cached_values(user_id, token_id, values)
+        return user
+
+    def get_cached_values(self, user_id, token_id):
+        if not self.cache_ttl or token_id is None:
+            return None
+        with _user_cache_lock:
+            expires, values = _user_cache.get(user_id, {}).get(token_id, (0, None))
+        return values if expires > time.monotonic() else None
+
+    def set_cached_values(self, user_id, token_id, values):
+        if not self.cache_ttl or token_id is None:
+            return
+        now = time.monotonic()
+        with _user_cache_lock:
+            if user_id not in _user_cache and len(_user_cache) >= self.cache_max_users:
+                _user_cache.clear()
+            tokens = {key: entry for key, entry in _user_cache.get(user_id, {}).items() if entry[0] > now}
+            tokens[token_id] = (now + self.cache_ttl, values)
+            _user_cache[user_id] = tokens
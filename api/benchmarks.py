@@ -0,0 +1,250 @@
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from constants import COMPANIES, DIFFICULTY_CHOICES, PROGRESS_STATUS_CHOICES
+from problems.models import Problem, ProblemFacetCount, ProblemSignature, UserProblemStatus, UserScore
+from users.models import User
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baselines.json')
+TAGS = ['Array', 'String', 'Hash Table', 'Dynamic Programming', 'Math', 'Sorting', 'Greedy', 'Depth-First Search',
+        'Binary Search', 'Breadth-First Search', 'Tree', 'Matrix', 'Two Pointers', 'Bit Manipulation', 'Stack',
+        'Heap (Priority Queue)', 'Graph', 'Design', 'Backtracking', 'Sliding Window', 'Union Find', 'Linked List']
+# Single-worker server commands compared by the load benchmark: the sync WSGI worker of the Procfile and an ASGI one.
+SERVERS = {
+    'wsgi': ['-m', 'gunicorn', 'job_prep.wsgi', '--workers', '1'],
+    'asgi': ['-m', 'gunicorn', 'job_prep.asgi:application', '--workers', '1', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+WORDS = ['array', 'integer', 'return', 'given', 'string', 'node', 'tree', 'sum', 'target', 'index', 'value',
+         'length', 'output', 'input', 'example', 'constraints', 'each', 'element', 'minimum', 'maximum']
+
+
+def seed(problems=2000, users=50, progress=100, random_seed=0):
+    """
+    Fill an empty database with problems carrying realistic question/solution bodies, tags and companies, and users
+    with progress on about the given number of problems each. Returns the benchmark user, whose password is
+    'benchmark'.
+    """
+    rng = random.Random(random_seed)
+
+    def paragraph():
+        return '<p>' + ' '.join(rng.choices(WORDS, k=rng.randint(100, 200))) + '</p>'
+
+    batch = []
+    for i in range(problems):
+        problem = Problem(
+            name=f'Problem {i}',
+            acceptance=round(rng.uniform(10, 90), 2),
+            difficulty=rng.choice(DIFFICULTY_CHOICES)[0],
+            question_html=paragraph(),
+            solution_html=paragraph(),
+            tags=rng.sample(TAGS, rng.randint(1, 4)),
+            companies=rng.sample(COMPANIES, rng.randint(0, 4)),
+        )
+        problem.refresh_derived_fields()
+        batch.append(problem)
+    Problem.objects.bulk_create(batch, batch_size=1000)
+    Problem.objects.update_search_vector()
+    ProblemSignature.objects.refresh()
+    ProblemFacetCount.objects.rebuild()
+    User.objects.bulk_create([User(username=f'benchmark{i}') for i in range(1, users)])
+    user = User.objects.create_user(username='benchmark', password='benchmark')
+    problem_ids = list(Problem.objects.values_list('id', flat=True))
+    statuses = [key for key, _ in PROGRESS_STATUS_CHOICES]
+    UserProblemStatus.objects.bulk_create([
+        UserProblemStatus(user_id=user_id, problem_id=problem_id, status=rng.choice(statuses))
+        for user_id in User.objects.values_list('id', flat=True)
+        for problem_id in rng.sample(problem_ids, min(progress, len(problem_ids)))
+    ], batch_size=5000)
+    UserScore.objects.rebuild()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return user
+
+
+def scenarios():
+    """
+    {name: (method, url)} of the read, search, filter and mark paths of the API and of the web views.
+    """
+    problem = Problem.objects.order_by('id').first()
+    company = COMPANIES[0]
+    api = reverse('api:problems-list')
+    web = reverse('problems:problem_list')
+    return {
+        'api-list': ('get', api),
+        'api-list-summary': ('get', f'{api}?summary=true'),
+        'api-list-cursor': ('get', f'{api}?cursor='),
+        'api-list-filter': ('get', f'{api}?company={company}&difficulty=easy'),
+        'api-search': ('get', f'{api}?search=target%20array'),
+        'api-detail': ('get', reverse('api:problems-detail', args=[problem.pk])),
+        'api-facets': ('get', reverse('api:problems-facets')),
+        'api-similar': ('get', reverse('api:problems-similar', args=[problem.pk])),
+        'api-autocomplete': ('get', f"{reverse('api:autocomplete')}?q=pro"),
+        'api-mark': ('get', reverse('api:problems-mark-solved', args=[problem.pk])),
+        'web-list': ('get', web),
+        'web-list-filter': ('get', f'{web}?company={company}&difficulty=easy'),
+        'web-detail': ('get', reverse('problems:problem_detail', args=[problem.pk])),
+        'web-mark': ('get', reverse('problems:mark_problem', args=[problem.pk, 'solved'])),
+    }
+
+
+def run(repeat=5, names=None):
+    """
+    Request every scenario repeat times as the seeded benchmark user, after one warm-up request.
+    Returns {name: {'queries': count, 'time_ms': median wall time}}.
+    """
+    client = Client()
+    client.login(username='benchmark', password='benchmark')
+    results = {}
+    for name, (method, url) in scenarios().items():
+        if names and name not in names:
+            continue
+        getattr(client, method)(url)
+        timings, queries = [], 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = getattr(client, method)(url)
+                timings.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name}: {method.upper()} {url} returned {response.status_code}')
+            queries = max(queries, len(context.captured_queries))
+        results[name] = {'queries': queries, 'time_ms': round(statistics.median(timings) * 1000, 2)}
+    return results
+
+
+def load_baselines(path=BASELINES_PATH):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_baselines(results, dataset, path=BASELINES_PATH):
+    with open(path, 'w') as file:
+        json.dump({'dataset': dataset, 'scenarios': results}, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def regressions(results, baselines, dataset, tolerance=1.5, slack_ms=10):
+    """
+    Messages for scenarios issuing more queries than their baseline, or, when measured on the same dataset as the
+    baselines, taking longer than tolerance times the baseline time plus slack_ms, which absorbs the jitter of
+    scenarios that only take a few milliseconds.
+    """
+    compare_time = baselines.get('dataset') == dataset
+    messages = []
+    for name, result in results.items():
+        baseline = baselines['scenarios'].get(name)
+        if baseline is None:
+            continue
+        if result['queries'] > baseline['queries']:
+            messages.append(f'{name}: {result["queries"]} queries, baseline {baseline["queries"]}')
+        if compare_time and result['time_ms'] > baseline['time_ms'] * tolerance + slack_ms:
+            messages.append(f'{name}: {result["time_ms"]} ms, baseline {baseline["time_ms"]} ms')
+    return messages
+
+
+def session_cookie():
+    """
+    Cookie header of a logged-in session of the seeded benchmark user, for requests made outside the test client.
+    """
+    client = Client()
+    client.login(username='benchmark', password='benchmark')
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+class Server:
+    """
+    One of SERVERS running on a free local port against the given database, for as long as the context lasts.
+    """
+
+    def __init__(self, name, database, startup_timeout=30):
+        self.name, self.database, self.startup_timeout = name, database, startup_timeout
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+
+    def __enter__(self):
+        env = {**os.environ, 'DATABASE_NAME': self.database, 'DEBUG': 'False', 'REQUEST_TIMING_SAMPLE_RATE': '0'}
+        self.process = subprocess.Popen(
+            [sys.executable, *SERVERS[self.name], '--bind', f'127.0.0.1:{self.port}', '--log-level', 'warning'],
+            env=env, cwd=settings.BASE_DIR,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.process.kill()
+        raise RuntimeError(f'{self.name} server did not start within {self.startup_timeout}s')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+def load(port, url, concurrency, duration, headers=None):
+    """
+    Keep concurrency clients requesting url back to back on the local port for duration seconds.
+    Returns {'requests', 'errors', 'rps', 'p50_ms', 'p99_ms'} over the completed requests.
+    """
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', url, headers=headers or {})
+                response = conn.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                failed = True
+            with lock:
+                if failed:
+                    errors[0] += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    ordered = sorted(latencies)
+
+    def percentile(percent):
+        return round(ordered[min(len(ordered) - 1, len(ordered) * percent // 100)] * 1000, 2) if ordered else None
+
+    return {'requests': len(ordered), 'errors': errors[0], 'rps': round(len(ordered) / elapsed, 1),
+            'p50_ms': percentile(50), 'p99_ms': percentile(99)}
+
+
+def sustained_concurrency(results, max_p99_ms):
+    """
+    The highest concurrency of {concurrency: load() result} served without errors and within max_p99_ms at the
+    99th percentile, or 0 if none was.
+    """
+    return max((concurrency for concurrency, result in results.items()
+                if not result['errors'] and result['p99_ms'] is not None and result['p99_ms'] <= max_p99_ms),
+               default=0)
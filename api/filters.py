@@ -0,0 +1,16 @@
+from rest_framework.filters import BaseFilterBackend
+
+from problems.search import search_problems
+
+
+class ProblemSearchFilter(BaseFilterBackend):
+    """
+    Full-text search over the stored problem search vector, ranked by relevance.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        return search_problems(queryset, term)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from api import benchmarks
+from problems.models import Problem
+
+
+class Command(BaseCommand):
+    help = ('Seed a test database and time the list/detail/search/filter/mark paths of the API and the web views, '
+            'failing on query counts or times above the stored baselines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problems', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--progress', type=int, default=100, help='Problems with progress per user.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Only run these scenarios.')
+        parser.add_argument('--tolerance', type=float, default=1.5,
+                            help='Allowed slowdown against the baseline times, as a factor.')
+        parser.add_argument('--slack-ms', type=float, default=10, help='Allowed slowdown on top of the tolerance.')
+        parser.add_argument('--baselines', default=benchmarks.BASELINES_PATH)
+        parser.add_argument('--update-baselines', action='store_true', help='Store the results as the new baselines.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the seeded test database between runs.')
+
+    def handle(self, *args, **options):
+        dataset = {name: options[name] for name in ('problems', 'users', 'progress')}
+        verbosity = options['verbosity']
+        old_config = setup_databases(verbosity, interactive=False, keepdb=options['keepdb'], aliases={'default'})
+        try:
+            if not Problem.objects.exists():
+                benchmarks.seed(**dataset)
+            results = benchmarks.run(options['repeat'], options['scenarios'])
+        finally:
+            teardown_databases(old_config, verbosity, keepdb=options['keepdb'])
+        for name, result in results.items():
+            self.stdout.write(f'{name:<20} {result["queries"]:4d} queries {result["time_ms"]:10.2f} ms')
+        if options['update_baselines']:
+            benchmarks.save_baselines(results, dataset, options['baselines'])
+            self.stdout.write(f'Baselines written to {options["baselines"]}.')
+            return
+        messages = benchmarks.regressions(results, benchmarks.load_baselines(options['baselines']), dataset,
+                                          options['tolerance'], options['slack_ms'])
+        if messages:
+            raise CommandError('Regressions against the baselines:\n' + '\n'.join(messages))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from api import benchmarks
+from problems.models import Problem
+
+
+class Command(BaseCommand):
+    help = ('Seed a test database, serve it with a single sync WSGI worker and a single ASGI worker in turn, and '
+            'compare the throughput and latency of each under growing numbers of concurrent clients.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problems', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--progress', type=int, default=100, help='Problems with progress per user.')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Scenarios of the benchmark command to load, api-list and web-detail by default.')
+        parser.add_argument('--concurrency', action='append', type=int, dest='levels',
+                            help='Concurrent clients, 1, 4, 16 and 64 by default.')
+        parser.add_argument('--duration', type=float, default=5, help='Seconds of load per concurrency level.')
+        parser.add_argument('--server', action='append', dest='servers', choices=sorted(benchmarks.SERVERS))
+        parser.add_argument('--max-p99-ms', type=float, default=1000,
+                            help='Slowest 99th percentile latency a level may have to count as sustained.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the seeded test database between runs.')
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'] or ['api-list', 'web-detail']
+        levels = sorted(options['levels'] or [1, 4, 16, 64])
+        verbosity = options['verbosity']
+        old_config = setup_databases(verbosity, interactive=False, keepdb=options['keepdb'], aliases={'default'})
+        try:
+            if not Problem.objects.exists():
+                benchmarks.seed(options['problems'], options['users'], options['progress'])
+            urls = benchmarks.scenarios()
+            unknown = set(scenarios) - set(urls)
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}.')
+            headers = {'Cookie': benchmarks.session_cookie()}
+            database = connection.settings_dict['NAME']
+            # The servers open their own connections to the test database.
+            connection.close()
+            for server in options['servers'] or sorted(benchmarks.SERVERS, reverse=True):
+                with benchmarks.Server(server, database) as running:
+                    for scenario in scenarios:
+                        results = {}
+                        for level in levels:
+                            result = benchmarks.load(running.port, urls[scenario][1], level, options['duration'],
+                                                     headers)
+                            results[level] = result
+                            self.stdout.write(
+                                f'{server:<5} {scenario:<16} {level:4d} clients {result["rps"]:8.1f} req/s '
+                                f'p50 {result["p50_ms"]} ms p99 {result["p99_ms"]} ms {result["errors"]} errors')
+                        sustained = benchmarks.sustained_concurrency(results, options['max_p99_ms'])
+                        self.stdout.write(self.style.SUCCESS(
+                            f'{server:<5} {scenario:<16} sustains {sustained} concurrent clients within '
+                            f'{options["max_p99_ms"]:g} ms p99'))
+        finally:
+            teardown_databases(old_config, verbosity, keepdb=options['keepdb'])
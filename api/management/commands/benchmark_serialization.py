@@ -0,0 +1,53 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+from api.serializers import ProblemRows, ProblemSerializer
+from problems.models import Problem
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare ProblemSerializer against the ProblemRows read path on a page of the catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Problems per page, like ?limit=.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--user', help='Username whose statuses are joined in, anonymous by default.')
+
+    def handle(self, *args, **options):
+        limit, repeat = options['limit'], options['repeat']
+        user = User.objects.get(username=options['user']) if options['user'] else AnonymousUser()
+        problems = Problem.objects.with_status(user)
+        if not problems.exists():
+            raise CommandError('The catalog is empty, import some problems first.')
+        rows = ProblemRows()
+        paths = {
+            'ProblemSerializer + JSONRenderer': lambda: JSONRenderer().render(
+                ProblemSerializer(list(problems[:limit]), many=True).data),
+            'ProblemRows + JSONRenderer': lambda: JSONRenderer().render(rows.many(rows.values(problems)[:limit])),
+            'ProblemRows + FastJSONRenderer': lambda: FastJSONRenderer().render(
+                rows.many(rows.values(problems)[:limit])),
+        }
+        expected = None
+        for name, render in paths.items():
+            content = json.loads(render())
+            if expected is None:
+                expected = content
+            elif content != expected:
+                raise CommandError(f'{name} does not match the ProblemSerializer output.')
+        baseline = None
+        for name, render in paths.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                render()
+                timings.append(time.perf_counter() - start)
+            median = statistics.median(timings) * 1000
+            baseline = baseline or median
+            self.stdout.write(f'{name:<34} {median:8.2f} ms  {baseline / median:5.1f}x')
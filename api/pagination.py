@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+from problems.pagination import KeysetPage, estimated_count
+from .filters import ProblemSearchFilter
+
+
+class ProblemPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that switches to keyset pagination on the (-acceptance, name, id) ordering when a
+    ?cursor= parameter is present (empty for the first page). ?count=estimate replaces the exact COUNT(*) with the
+    planner's estimate; cursor pages only include a count when one is asked for. Search results are ordered by rank,
+    which the keyset does not encode, so they keep limit/offset pages even with a cursor.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.estimate_count = request.query_params.get(self.count_query_param) == 'estimate'
+        self.keyset_page = None
+        searching = request.query_params.get(ProblemSearchFilter.search_param, '').strip()
+        if self.cursor_query_param not in request.query_params or searching:
+            return super().paginate_queryset(queryset, request, view)
+        self.limit = self.get_limit(request)
+        self.count = self.get_count(queryset) if self.estimate_count else None
+        try:
+            self.keyset_page = KeysetPage(queryset, request.query_params[self.cursor_query_param], self.limit)
+        except ValueError:
+            raise NotFound('Invalid cursor.')
+        return self.keyset_page.object_list
+
+    def get_count(self, queryset):
+        if self.estimate_count:
+            return estimated_count(queryset)
+        return super().get_count(queryset)
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_cursor_link(self.keyset_page.next_cursor)
+        response['previous'] = self.get_cursor_link(self.keyset_page.previous_cursor)
+        response['results'] = data
+        return Response(response)
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
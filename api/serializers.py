@@ -1,27 +1,134 @@
+import os
+
 from rest_framework import serializers
 
-from problems.models import Problem
+from constants import PROGRESS_STATUS_CHOICES, UNTRIED
+from problems.models import Problem, UserProblemStatus
 from users.models import User
+from .authentication import invalidate_cached_user
 
 
 class ProblemSerializer(serializers.ModelSerializer):
     status = serializers.SerializerMethodField()
+    # Stored as lookup table ids, but read and written by name.
+    tags = serializers.ListField(child=serializers.CharField(max_length=1023), required=False)
+    companies = serializers.ListField(child=serializers.CharField(max_length=1023), required=False)
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets: drop every field that was not asked for.
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, 'search_highlight'):
+            data['highlight'] = instance.search_highlight
+        return data
 
     def get_status(self, obj):
-        user = self.context['request'].user
-        if obj.id in user.confident_problems:
-            return 'Confident'
-        elif obj.id in user.solved_problems:
-            return 'Solved'
-        elif obj.id in user.tried_problems:
-            return 'Tried'
-        else:
-            return 'Untried'
+        # Querysets built with Problem.objects.with_status() already carry the status from the progress join.
+        if hasattr(obj, 'status'):
+            return obj.status
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return UNTRIED
+        # Otherwise resolve every instance of this serializer pass (all rows of a many=True list) with one query
+        # into a {problem_id: status} map shared through the context. Problems it does not cover yet, like those of
+        # another serializer given the same context, are looked up on first use.
+        status_map = self.context.setdefault('status_map', {})
+        if obj.id not in status_map:
+            instances = self.root.instance if isinstance(self.root, serializers.ListSerializer) else [obj]
+            problem_ids = {problem.id for problem in instances} | {obj.id}
+            statuses = UserProblemStatus.objects.status_map(request.user, problem_ids)
+            status_map.update({problem_id: statuses.get(problem_id) for problem_id in problem_ids})
+        return dict(PROGRESS_STATUS_CHOICES).get(status_map[obj.id], UNTRIED)
 
     class Meta:
         model = Problem
         fields = (
-            'id', 'name', 'status', 'acceptance', 'difficulty', 'question_html', 'solution_html', 'tags', 'companies')
+            'id', 'name', 'status', 'acceptance', 'difficulty', 'question_html', 'solution_html', 'tags', 'companies',
+            'excerpt',)
+
+
+class ProblemRows:
+    """
+    Read-only fast path for ProblemSerializer: builds the same representation from values() rows, without the
+    per-field serializer machinery. Fields that need converting (acceptance) reuse the serializer field's
+    to_representation, every other field is copied as the database returns it. Rows must come from a
+    Problem.objects.with_status() queryset, whose annotation stands in for the status method field.
+    """
+    passthrough_fields = (serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+                          serializers.ListField, serializers.SerializerMethodField)
+    # Columns the keyset paginator reads from every row, fetched even when they are not part of the output.
+    position_columns = ('id', 'name', 'acceptance')
+
+    def __init__(self, fields=None):
+        self.fields = []
+        for name, field in ProblemSerializer(fields=fields).fields.items():
+            passthrough = isinstance(field, self.passthrough_fields)
+            self.fields.append((name, None if passthrough else field.to_representation))
+
+    def values(self, queryset):
+        """
+        The queryset as dictionaries holding the columns this representation needs.
+        """
+        columns = [*self.position_columns, *(name for name, _ in self.fields if name not in self.position_columns)]
+        if 'search_highlight' in queryset.query.annotations:
+            columns.append('search_highlight')
+        return queryset.values(*columns)
+
+    def to_representation(self, row):
+        data = {name: row[name] if convert is None else convert(row[name]) for name, convert in self.fields}
+        if 'search_highlight' in row:
+            data['highlight'] = row['search_highlight']
+        return data
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def ranked(self, queryset, ranked):
+        """
+        The problems of (problem_id, value) pairs as (representation, value) pairs in the same order, fetched from the
+        queryset in one query. Ids the queryset does not hold are skipped.
+        """
+        rows = {row['id']: row for row in self.values(queryset.filter(pk__in=[pk for pk, _ in ranked]))}
+        return [(self.to_representation(rows[pk]), value) for pk, value in ranked if pk in rows]
+
+
+class ProgressChangeSerializer(serializers.Serializer):
+    problem_id = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=[key for key, _ in PROGRESS_STATUS_CHOICES] + ['untried'])
+    client_timestamp = serializers.DateTimeField()
+
+
+class ProgressSyncSerializer(serializers.Serializer):
+    max_changes = int(os.getenv('PROGRESS_SYNC_MAX_CHANGES', 1000))
+
+    batch_id = serializers.CharField(max_length=64)
+    changes = ProgressChangeSerializer(many=True)
+
+    def validate_changes(self, changes):
+        if len(changes) > self.max_changes:
+            raise serializers.ValidationError(f'Ensure this field has no more than {self.max_changes} elements.')
+        return changes
+
+
+class ReviewSerializer(serializers.Serializer):
+    problem_id = serializers.IntegerField(min_value=1)
+    quality = serializers.IntegerField(min_value=0, max_value=5)
+
+
+class ReviewCompleteSerializer(serializers.Serializer):
+    max_reviews = int(os.getenv('REVIEW_COMPLETE_MAX_REVIEWS', 1000))
+
+    reviews = ReviewSerializer(many=True)
+
+    def validate_reviews(self, reviews):
+        if len(reviews) > self.max_reviews:
+            raise serializers.ValidationError(f'Ensure this field has no more than {self.max_reviews} elements.')
+        return reviews
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -45,4 +152,5 @@ class UserSerializer(serializers.ModelSerializer):
         if 'password' in validated_data:
             user.set_password(validated_data['password'])
             user.save()
+            invalidate_cached_user(user.pk)
         return user
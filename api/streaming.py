@@ -0,0 +1,29 @@
+import json
+import zlib
+
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def ndjson_chunks(rows, buffer_size=STREAM_BUFFER_SIZE):
+    """
+    Encode rows as newline-delimited JSON, yielding chunks of about buffer_size bytes.
+    """
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(row, default=str, separators=(',', ':')) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield ''.join(lines).encode()
+            lines, size = [], 0
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
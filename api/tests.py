@@ -1,8 +1,40 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 
 from constants import DIFFICULTY_CHOICES
-from problems.models import Problem
+from api import benchmarks
+from job_prep.asgi import application
+from job_prep.middleware import request_metrics
+from job_prep.routers import ReplicaRouter, routing
+from api.authentication import DeferredUserJWTAuthentication, invalidate_cached_user
+from api.renderers import FastJSONRenderer
+from api.serializers import ProblemRows, ProblemSerializer
+from problems.autocomplete import autocomplete_index
+from problems.lookups import name_lookups
+from problems.models import Problem, ProblemFacetCount, UserProblemStatus
+from problems.recommendations import recommendation_index
+from problems.search import search_problems
 from users.models import User
 
 c = Client()
@@ -123,6 +155,9 @@ class ProblemAPITestCase(TestCase):
     def test_get_problem_invalid(self):
         res = c.get(f"{self.base_url}999/")
         self.assertEqual(res.status_code, 404)
+        for pk in ('abc', '²'):
+            res = c.get(f"{self.base_url}{pk}/")
+            self.assertEqual(res.status_code, 404)
 
     def test_update_problem_staff(self):
         c.force_login(self.staff)
@@ -161,3 +196,833 @@ class ProblemAPITestCase(TestCase):
         res = c.delete(f"{self.base_url}{self.problem1.id}/")
         self.assertEqual(res.status_code, 403)
         self.assertEqual(Problem.objects.count(), 2)
+
+    def test_get_problems_status_ann(self):
+        res = c.get(self.base_url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual({p['status'] for p in res.json()['results']}, {'Untried'})
+
+    def test_mark_problem_ann(self):
+        res = c.get(f"{self.base_url}{self.problem1.id}/mark_solved/")
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(UserProblemStatus.objects.count(), 0)
+
+    def test_mark_problem(self):
+        c.force_login(self.user)
+        res = c.get(f"{self.base_url}{self.problem1.id}/mark_tried/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'Tried')
+        res = c.get(f"{self.base_url}{self.problem1.id}/mark_confident/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'Confident')
+        # a problem has at most one status per user
+        self.assertEqual(UserProblemStatus.objects.filter(user=self.user).count(), 1)
+        res = c.get(self.base_url)
+        statuses = {p['id']: p['status'] for p in res.json()['results']}
+        self.assertEqual(statuses, {self.problem1.id: 'Confident', self.problem2.id: 'Untried'})
+
+    def test_mark_problem_repeatedly(self):
+        c.force_login(self.user)
+        for _ in range(30):
+            self.assertEqual(c.get(f"{self.base_url}{self.problem1.id}/mark_confident/").status_code, 200)
+        self.assertEqual(c.get(f"{self.base_url}{self.problem1.id}/").json()['status'], 'Confident')
+
+    def test_mark_problem_invalid(self):
+        c.force_login(self.user)
+        res = c.get(f"{self.base_url}999/mark_solved/")
+        self.assertEqual(res.status_code, 404)
+        # Digits str.isdigit() accepts but int() does not.
+        self.assertEqual(c.get(f"{self.base_url}²/mark_solved/").status_code, 404)
+        self.assertEqual(UserProblemStatus.objects.count(), 0)
+
+    def test_status_is_per_user(self):
+        UserProblemStatus.objects.mark(self.staff, self.problem1.id, 'solved')
+        c.force_login(self.user)
+        res = c.get(f"{self.base_url}{self.problem1.id}/")
+        self.assertEqual(res.json()['status'], 'Untried')
+
+    def serialize_problems(self, user):
+        request = RequestFactory().get(self.base_url)
+        request.user = user
+        data = ProblemSerializer(Problem.objects.all(), many=True, context={'request': request}).data
+        return {p['id']: p['status'] for p in data}
+
+    def test_serializer_status_map(self):
+        UserProblemStatus.objects.mark(self.user, self.problem1.id, 'solved')
+        # one query for the problems and one for the statuses of the whole page
+        with self.assertNumQueries(2):
+            statuses = self.serialize_problems(self.user)
+        self.assertEqual(statuses, {self.problem1.id: 'Solved', self.problem2.id: 'Untried'})
+
+    def test_serializer_shared_context(self):
+        UserProblemStatus.objects.mark(self.user, self.problem2.id, 'tried')
+        request = RequestFactory().get(self.base_url)
+        request.user = self.user
+        context = {'request': request}
+        self.assertEqual(ProblemSerializer(self.problem1, context=context).data['status'], 'Untried')
+        self.assertEqual(ProblemSerializer(self.problem2, context=context).data['status'], 'Tried')
+        with self.assertNumQueries(0):
+            self.assertEqual(ProblemSerializer(self.problem2, context=context).data['status'], 'Tried')
+
+    def test_serializer_status_ann(self):
+        with self.assertNumQueries(1):
+            statuses = self.serialize_problems(AnonymousUser())
+        self.assertEqual(statuses, {self.problem1.id: 'Untried', self.problem2.id: 'Untried'})
+
+    def test_get_problems_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = c.get(self.base_url, {'fields': 'id,name,status'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(set(res.json()['results'][0]), {'id', 'name', 'status'})
+        self.assertFalse(any('question_html' in q['sql'] for q in queries.captured_queries))
+
+    def test_get_problems_summary(self):
+        res = c.get(self.base_url, {'summary': 'true'})
+        self.assertEqual(res.status_code, 200)
+        problem = res.json()['results'][0]
+        self.assertNotIn('question_html', problem)
+        self.assertEqual(problem['excerpt'], 'Test Question')
+
+    def test_get_problem_full(self):
+        res = c.get(f"{self.base_url}{self.problem1.id}/")
+        self.assertEqual(res.json()['question_html'], self.problem1.question_html)
+
+    def test_search_problems(self):
+        Problem.objects.create(
+            name='Two Sum',
+            acceptance=0.5,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Return indices of the two numbers.</p>',
+            solution_html='<p>Use a hash map.</p>',
+        )
+        Problem.objects.create(
+            name='Three Numbers',
+            acceptance=0.9,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Find the <strong>sum</strong> of three numbers.</p>',
+            solution_html='<p>Add them.</p>',
+        )
+        res = c.get(self.base_url, {'search': 'sum'})
+        self.assertEqual(res.status_code, 200)
+        results = res.json()['results']
+        # a match in the name ranks above a match in the question, regardless of the default ordering
+        self.assertEqual([p['name'] for p in results], ['Two Sum', 'Three Numbers'])
+        self.assertIn('<mark>sum</mark>', results[1]['highlight'])
+        # the keyset would drop the rank ordering, so cursors fall back to offset pages on searches
+        res = c.get(self.base_url, {'search': 'sum', 'cursor': '', 'limit': 1})
+        self.assertEqual(res.json()['count'], 2)
+        self.assertEqual([p['name'] for p in res.json()['results']], ['Two Sum'])
+        self.assertEqual([p['name'] for p in c.get(res.json()['next']).json()['results']], ['Three Numbers'])
+        # markup is not searchable
+        res = c.get(self.base_url, {'search': 'strong'})
+        self.assertEqual(res.json()['results'], [])
+
+    def test_search_updated_on_save(self):
+        self.problem1.question_html = '<p>Reverse a linked list.</p>'
+        self.problem1.save()
+        res = c.get(self.base_url, {'search': 'linked list'})
+        self.assertEqual([p['id'] for p in res.json()['results']], [self.problem1.id])
+
+    def test_get_problems_cursor(self):
+        for i in range(3):
+            Problem.objects.create(
+                name=f'Cursor Problem {i}',
+                acceptance=0.5,
+                difficulty=DIFFICULTY_CHOICES[1][0],
+                question_html='<p>Test Question</p>',
+                solution_html='<p>Test Solution</p>',
+                companies=['Google'],
+            )
+        res = c.get(self.base_url, {'cursor': '', 'limit': 2, 'company': 'Google'})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('count', res.json())
+        self.assertIsNone(res.json()['previous'])
+        names = [p['name'] for p in res.json()['results']]
+        next_url = res.json()['next']
+        self.assertIn('company=Google', next_url)
+        res = c.get(next_url)
+        names += [p['name'] for p in res.json()['results']]
+        self.assertIsNone(res.json()['next'])
+        self.assertEqual(names, ['Cursor Problem 0', 'Cursor Problem 1', 'Cursor Problem 2'])
+        res = c.get(res.json()['previous'])
+        self.assertEqual([p['name'] for p in res.json()['results']], names[:2])
+
+    def test_get_problems_cursor_invalid(self):
+        res = c.get(self.base_url, {'cursor': 'invalid'})
+        self.assertEqual(res.status_code, 404)
+
+    def test_get_problems_estimated_count(self):
+        res = c.get(self.base_url, {'count': 'estimate'})
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(res.json()['count'], int)
+        self.assertEqual(len(res.json()['results']), 2)
+
+    def test_facets(self):
+        self.problem1.companies = ['Google', 'Amazon']
+        self.problem1.tags = ['Array']
+        self.problem1.save()
+        self.problem2.companies = ['Google']
+        self.problem2.difficulty = DIFFICULTY_CHOICES[2][0]
+        self.problem2.save()
+        UserProblemStatus.objects.mark(self.user, self.problem1.id, 'solved')
+        c.force_login(self.user)
+        res = c.get(f"{self.base_url}facets/")
+        self.assertEqual(res.status_code, 200)
+        facets = res.json()
+        self.assertEqual(facets['companies'][0], {
+            'value': 'Google', 'count': 2, 'statuses': {'tried': 0, 'solved': 1, 'confident': 0, 'untried': 1}})
+        self.assertEqual([f['value'] for f in facets['difficulty']], ['easy', 'hard'])
+        self.assertEqual(facets['tags'], [
+            {'value': 'Array', 'count': 1, 'statuses': {'tried': 0, 'solved': 1, 'confident': 0, 'untried': 0}}])
+        # the filtered path aggregates the same numbers as the rollup
+        res = c.get(f"{self.base_url}facets/", {'company': 'Google,Amazon'})
+        self.assertEqual(res.json(), facets)
+        res = c.get(f"{self.base_url}facets/", {'difficulty': 'hard'})
+        self.assertEqual(res.json()['companies'], [
+            {'value': 'Google', 'count': 1, 'statuses': {'tried': 0, 'solved': 0, 'confident': 0, 'untried': 1}}])
+
+    def test_facets_ann(self):
+        res = c.get(f"{self.base_url}facets/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['difficulty'], [
+            {'value': 'easy', 'count': 2, 'statuses': {'tried': 0, 'solved': 0, 'confident': 0, 'untried': 2}}])
+
+    def test_get_problem_conditional(self):
+        c.force_login(self.user)
+        url = f"{self.base_url}{self.problem1.id}/"
+        res = c.get(url)
+        etag = res['ETag']
+        res = c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        res = c.get(url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, 304)
+        # the status is part of the representation
+        c.get(f"{url}mark_solved/")
+        res = c.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'Solved')
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_get_problem_cached(self):
+        url = f"{self.base_url}{self.problem1.id}/"
+        c.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            res = c.get(url)
+        self.assertFalse(any('question_html' in q['sql'] for q in queries.captured_queries))
+        self.assertEqual(res.json()['question_html'], self.problem1.question_html)
+        self.problem1.question_html = '<p>Changed</p>'
+        self.problem1.save()
+        res = c.get(url)
+        self.assertEqual(res.json()['question_html'], '<p>Changed</p>')
+        self.assertEqual(res.json()['excerpt'], 'Changed')
+
+    def test_get_problem_cached_sparse_fields(self):
+        url = f"{self.base_url}{self.problem1.id}/"
+        c.get(url)
+        res = c.get(url, {'fields': 'name,status'})
+        self.assertEqual(res.json(), {'name': self.problem1.name, 'status': 'Untried'})
+
+    def test_export(self):
+        self.problem2.companies = ['Google']
+        self.problem2.save()
+        res = c.get(self.base_url + 'export/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(res.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.problem1.id, self.problem2.id])
+        self.assertEqual(rows[0]['acceptance'], '0.99')
+        self.assertEqual(rows[1]['companies'], ['Google'])
+        res = c.get(self.base_url + 'export/', {'company': 'Google', 'fields': 'id,name'})
+        rows = [json.loads(line) for line in b''.join(res.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [{'id': self.problem2.id, 'name': self.problem2.name}])
+
+    def test_export_gzip(self):
+        res = c.get(self.base_url + 'export/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(res.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_recommended(self):
+        recommendation_index.index = None
+        self.problem1.tags = ['Graph']
+        self.problem1.save()
+        problem3 = Problem.objects.create(name='Test Problem 3', acceptance=0.5, difficulty=DIFFICULTY_CHOICES[0][0],
+                                          question_html='<p>Q</p>', solution_html='<p>S</p>', tags=['Graph'])
+        UserProblemStatus.objects.mark(self.user, self.problem1.id, 'solved')
+        c.force_login(self.user)
+        res = c.get(self.base_url + 'recommended/', {'fields': 'id,name,status'})
+        self.assertEqual(res.status_code, 200)
+        results = res.json()
+        self.assertEqual([problem['id'] for problem in results], [problem3.id, self.problem2.id])
+        self.assertEqual(set(results[0]), {'id', 'name', 'status', 'score'})
+        res = c.get(self.base_url + 'recommended/', {'limit': 1})
+        self.assertEqual(len(res.json()), 1)
+
+    def test_autocomplete(self):
+        autocomplete_index.index = None
+        self.problem1.companies = ['Google']
+        self.problem1.save()
+        url = reverse('api:autocomplete')
+        res = c.get(url, {'q': 'test pro'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([problem['name'] for problem in res.json()['problems']], ['Test Problem', 'Test Problem 2'])
+        self.assertEqual(len(c.get(url, {'q': 'problem', 'limit': 1}).json()['problems']), 1)
+        self.assertEqual(c.get(url, {'q': 'goo'}).json()['companies'], [{'value': 'Google', 'count': 1}])
+        with self.assertNumQueries(0):
+            self.assertEqual(c.get(url).json(), {'problems': [], 'companies': [], 'tags': []})
+
+    def test_similar(self):
+        text = ('<p>Given a string s, find the length of the longest substring without repeating characters. The '
+                'substring must be contiguous and the answer is its length.</p>')
+        self.problem1.question_html = text
+        self.problem1.save()
+        copy = Problem.objects.create(name='Test Problem 3', acceptance=0.5, difficulty=DIFFICULTY_CHOICES[0][0],
+                                      question_html=text.replace('string s', 'string t'), solution_html='<p>S</p>')
+        c.force_login(self.user)
+        res = c.get(f'{self.base_url}{self.problem1.id}/similar/', {'fields': 'id,name,status'})
+        self.assertEqual(res.status_code, 200)
+        results = res.json()
+        self.assertEqual([problem['id'] for problem in results], [copy.id])
+        self.assertEqual(set(results[0]), {'id', 'name', 'status', 'score'})
+        self.assertEqual(c.get(f'{self.base_url}{self.problem2.id}/similar/').json(), [])
+        self.assertEqual(c.get(f'{self.base_url}{copy.id + 100}/similar/').status_code, 404)
+        self.assertEqual(c.get(f'{self.base_url}²/similar/').status_code, 404)
+
+    def test_user_stats(self):
+        self.problem1.companies = ['Google']
+        self.problem1.save()
+        c.logout()
+        self.assertEqual(c.get(reverse('api:users-stats')).status_code, 403)
+        c.force_login(self.user)
+        c.get(f"{self.base_url}{self.problem1.id}/mark_solved/")
+        stats = c.get(reverse('api:users-stats')).json()
+        self.assertEqual(stats['total'], 2)
+        self.assertEqual(stats['statuses'], {'tried': 0, 'solved': 1, 'confident': 0, 'untried': 1})
+        self.assertEqual(stats['completion'], 50.0)
+        self.assertEqual(stats['companies'], [{'value': 'Google', 'count': 1, 'completion': 100.0, 'statuses': {
+            'tried': 0, 'solved': 1, 'confident': 0, 'untried': 0}}])
+        self.assertEqual(stats['difficulty'][0]['completion'], 50.0)
+        # Served from the cache until a mark invalidates it.
+        UserProblemStatus.objects.filter(user=self.user).delete()
+        self.assertEqual(c.get(reverse('api:users-stats')).json()['completion'], 50.0)
+        c.get(f"{self.base_url}{self.problem2.id}/mark_tried/")
+        stats = c.get(reverse('api:users-stats')).json()
+        self.assertEqual(stats['statuses'], {'tried': 1, 'solved': 0, 'confident': 0, 'untried': 1})
+
+    def test_leaderboard(self):
+        self.problem1.companies = ['Google']
+        self.problem1.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProblemStatus.objects.mark(self.user, self.problem1.id, 'solved')
+            UserProblemStatus.objects.mark(self.staff, self.problem2.id, 'confident')
+        res = c.get(reverse('api:leaderboard-list'))
+        self.assertEqual([leader['username'] for leader in res.json()['results']], ['teststaff', 'testuser'])
+        res = c.get(reverse('api:leaderboard-list'), {'company': 'Google'})
+        self.assertEqual(res.json(), {'company': 'Google', 'results': [
+            {'rank': 1, 'user_id': self.user.id, 'username': 'testuser', 'score': 1}]})
+        c.force_login(self.user)
+        res = c.get(reverse('api:leaderboard-me'))
+        self.assertEqual(res.json(), {'company': None, 'score': 1, 'rank': 2, 'users': 2})
+
+    def test_problem_rows_match_serializer(self):
+        self.problem1.tags = ['Array']
+        self.problem1.save()
+        UserProblemStatus.objects.mark(self.user, self.problem1.id, 'solved')
+        problems = Problem.objects.with_status(self.user)
+        for fields in (None, ['name', 'status', 'acceptance']):
+            rows = ProblemRows(fields)
+            self.assertEqual(rows.many(rows.values(problems)),
+                             ProblemSerializer(problems, many=True, fields=fields).data)
+        problems = search_problems(problems, 'question')
+        rows = ProblemRows()
+        self.assertEqual(rows.many(rows.values(problems)), ProblemSerializer(problems, many=True).data)
+
+    def test_fast_json_renderer(self):
+        data = {'acceptance': Decimal('0.99'), 1: ['Google'], 'name': 'Two Sum \u2028'}
+        content = FastJSONRenderer().render(data)
+        self.assertEqual(json.loads(content), json.loads(JSONRenderer().render(data)))
+        with mock.patch('api.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_benchmark_serialization(self):
+        out = io.StringIO()
+        call_command('benchmark_serialization', repeat=1, stdout=out)
+        self.assertIn('ProblemRows + FastJSONRenderer', out.getvalue())
+
+
+class ProgressSyncAPITestCase(TestCase):
+    def setUp(self):
+        self.problem1 = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+        )
+        self.problem2 = Problem.objects.create(
+            name='Test Problem 2',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question 2</p>',
+            solution_html='<p>Test Solution 2</p>',
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword',
+        )
+        self.url = reverse('api:progress-sync')
+
+    def sync(self, batch_id, changes):
+        return c.post(self.url, {'batch_id': batch_id, 'changes': [
+            {'problem_id': problem_id, 'status': status, 'client_timestamp': timestamp}
+            for problem_id, status, timestamp in changes
+        ]}, content_type='application/json')
+
+    def test_sync_ann(self):
+        res = self.sync('b1', [(self.problem1.id, 'solved', '2024-01-01T00:00:00Z')])
+        self.assertEqual(res.status_code, 403)
+
+    def test_sync(self):
+        c.force_login(self.user)
+        res = self.sync('b1', [
+            (self.problem1.id, 'tried', '2024-01-01T00:00:00Z'),
+            (self.problem1.id, 'solved', '2024-01-01T00:01:00Z'),
+            (self.problem2.id, 'confident', '2024-01-01T00:00:00Z'),
+            (999, 'solved', '2024-01-01T00:00:00Z'),
+        ])
+        self.assertEqual(res.status_code, 200, res.json())
+        self.assertEqual(res.json()['applied'], 2)
+        self.assertEqual(res.json()['statuses'], {str(self.problem1.id): 'solved', str(self.problem2.id): 'confident'})
+
+    def test_sync_last_writer_wins(self):
+        c.force_login(self.user)
+        self.sync('b1', [(self.problem1.id, 'solved', '2024-01-01T00:01:00Z')])
+        res = self.sync('b2', [
+            (self.problem1.id, 'tried', '2024-01-01T00:00:00Z'),
+            (self.problem2.id, 'tried', '2024-01-01T00:00:00Z'),
+        ])
+        self.assertEqual(res.json()['applied'], 1)
+        self.assertEqual(res.json()['statuses'], {str(self.problem1.id): 'solved', str(self.problem2.id): 'tried'})
+        res = self.sync('b3', [(self.problem2.id, 'untried', '2024-01-01T00:01:00Z')])
+        self.assertEqual(res.json()['statuses'], {str(self.problem1.id): 'solved'})
+
+    def test_sync_idempotent(self):
+        c.force_login(self.user)
+        self.sync('b1', [(self.problem1.id, 'tried', '2024-01-01T00:00:00Z')])
+        self.sync('b2', [(self.problem1.id, 'untried', '2024-01-01T00:01:00Z')])
+        res = self.sync('b1', [(self.problem1.id, 'tried', '2024-01-01T00:00:00Z')])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['applied'], 1)
+        self.assertEqual(res.json()['statuses'], {})
+
+    def test_sync_clear_tombstone(self):
+        c.force_login(self.user)
+        self.sync('b1', [(self.problem1.id, 'tried', '2024-01-01T00:00:00Z')])
+        self.sync('b2', [(self.problem1.id, 'untried', '2024-01-01T00:02:00Z')])
+        # A mark made before the clear but synced after it loses to the clear.
+        res = self.sync('b3', [(self.problem1.id, 'solved', '2024-01-01T00:01:00Z')])
+        self.assertEqual(res.json()['applied'], 0)
+        self.assertEqual(res.json()['statuses'], {})
+        res = self.sync('b4', [(self.problem1.id, 'solved', '2024-01-01T00:03:00Z')])
+        self.assertEqual(res.json()['statuses'], {str(self.problem1.id): 'solved'})
+
+    def test_sync_future_timestamp(self):
+        c.force_login(self.user)
+        self.sync('b1', [(self.problem1.id, 'solved', '2999-01-01T00:00:00Z')])
+        # The future timestamp was stored as the server time, so it does not block later changes.
+        self.assertLessEqual(UserProblemStatus.objects.get().client_updated_at, timezone.now())
+        res = self.sync('b2', [(self.problem1.id, 'tried', (timezone.now() + timedelta(seconds=1)).isoformat())])
+        self.assertEqual(res.json()['statuses'], {str(self.problem1.id): 'tried'})
+
+    def test_sync_last_modified(self):
+        c.force_login(self.user)
+        url = f"/api/problems/{self.problem1.id}/"
+        Problem.objects.filter(pk=self.problem1.id).update(updated_at=timezone.now() - timedelta(days=1))
+        last_modified = c.get(url)['Last-Modified']
+        # An old client timestamp still moves the validators forward: updated_at is the server write time.
+        self.sync('b1', [(self.problem1.id, 'solved', '2000-01-01T00:00:00Z')])
+        progress = UserProblemStatus.objects.get()
+        self.assertGreater(progress.updated_at, progress.client_updated_at)
+        res = c.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'Solved')
+
+    def test_sync_invalid_status(self):
+        c.force_login(self.user)
+        res = self.sync('b1', [(self.problem1.id, 'invalid', '2024-01-01T00:00:00Z')])
+        self.assertEqual(res.status_code, 400)
+
+
+class ReviewAPITestCase(TestCase):
+    def setUp(self):
+        self.problem1 = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+        )
+        self.problem2 = Problem.objects.create(
+            name='Test Problem 2',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question 2</p>',
+            solution_html='<p>Test Solution 2</p>',
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword',
+        )
+        for problem in (self.problem1, self.problem2):
+            UserProblemStatus.objects.mark(self.user, problem.id, 'solved')
+
+    def test_due_ann(self):
+        c.logout()
+        res = c.get(reverse('api:review-due'))
+        self.assertEqual(res.status_code, 403)
+
+    def test_due(self):
+        c.force_login(self.user)
+        self.assertEqual(c.get(reverse('api:review-due')).json(), [])
+        UserProblemStatus.objects.filter(problem=self.problem2).update(due_at=timezone.now() - timedelta(days=2))
+        UserProblemStatus.objects.filter(problem=self.problem1).update(due_at=timezone.now() - timedelta(days=1))
+        res = c.get(reverse('api:review-due'))
+        self.assertEqual([problem['id'] for problem in res.json()], [self.problem2.id, self.problem1.id])
+        self.assertEqual(res.json()[0]['status'], 'Solved')
+        self.assertIn('due_at', res.json()[0])
+        self.assertNotIn('question_html', res.json()[0])
+
+    def test_complete(self):
+        c.force_login(self.user)
+        res = c.post(reverse('api:review-complete'), {'reviews': [
+            {'problem_id': self.problem1.id, 'quality': 5}, {'problem_id': self.problem2.id, 'quality': 1},
+        ]}, content_type='application/json')
+        self.assertEqual(res.status_code, 200, res.json())
+        self.assertEqual(res.json()['reviewed'], 2)
+        intervals = {item['problem_id']: item['interval_days'] for item in res.json()['schedule']}
+        self.assertEqual(intervals, {self.problem1.id: 6, self.problem2.id: 1})
+
+    def test_complete_invalid_quality(self):
+        c.force_login(self.user)
+        res = c.post(reverse('api:review-complete'), {'reviews': [{'problem_id': self.problem1.id, 'quality': 6}]},
+                     content_type='application/json')
+        self.assertEqual(res.status_code, 400)
+
+
+class ImportProblemsCommandTestCase(TestCase):
+    def setUp(self):
+        self.problem = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+            companies=['Google'],
+        )
+
+    def import_file(self, suffix, content, **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        call_command('import_problems', file.name, stdout=io.StringIO(), stderr=io.StringIO(), **options)
+
+    def test_import_jsonl(self):
+        rows = [
+            {'name': 'Test Problem', 'acceptance': 0.5, 'difficulty': 'hard', 'question_html': '<p>Updated</p>',
+             'solution_html': '<p>Test Solution</p>', 'companies': ['Amazon']},
+            {'name': 'New Problem', 'acceptance': 0.5, 'difficulty': 'easy', 'question_html': '<p>Sum <b>it</b></p>',
+             'solution_html': '<p>Test Solution</p>', 'tags': ['Array']},
+            {'name': 'Invalid Problem', 'acceptance': 0.5, 'difficulty': 'invalid'},
+        ]
+        rejects = os.path.join(tempfile.mkdtemp(), 'rejects.jsonl')
+        self.import_file('.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n', batch_size=1,
+                         rejects=rejects)
+        self.assertEqual(Problem.objects.count(), 2)
+        self.problem.refresh_from_db()
+        self.assertEqual((self.problem.difficulty, self.problem.companies), ('hard', ['Amazon']))
+        self.assertEqual(self.problem.excerpt, 'Updated')
+        problem = Problem.objects.get(name='New Problem')
+        self.assertEqual(problem.content_hash, problem.compute_content_hash())
+        self.assertTrue(Problem.objects.filter(search_vector='sum').exists())
+        self.assertEqual(
+            dict(ProblemFacetCount.objects.filter(facet='company').values_list('value', 'count')), {'Amazon': 1})
+        with open(rejects) as file:
+            self.assertEqual([json.loads(line)['line'] for line in file], [3, 4])
+
+    def test_import_csv(self):
+        self.import_file('.csv', 'name,acceptance,difficulty,question_html,solution_html,tags,companies\n'
+                                 'CSV Problem,0.5,medium,<p>Q</p>,<p>S</p>,"Array, Math",Google\n')
+        problem = Problem.objects.get(name='CSV Problem')
+        self.assertEqual((problem.tags, problem.companies), (['Array', 'Math'], ['Google']))
+
+
+class JWTAuthenticationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.staff = User.objects.create_user(username='teststaff', password='testpassword', is_staff=True)
+        res = c.post(reverse('api:token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'})
+        self.token = res.json()['access']
+        invalidate_cached_user(self.user.pk)
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return DeferredUserJWTAuthentication().authenticate(request)[0]
+
+    def test_deferred_user(self):
+        with self.assertNumQueries(1):
+            user = self.authenticate()
+        self.assertEqual((user.pk, user.username), (self.user.pk, 'testuser'))
+        self.assertTrue({'password', 'email', 'date_joined'} <= user.get_deferred_fields())
+
+    def test_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_api_request(self):
+        UserProblemStatus.objects.mark(self.user, Problem.objects.create(
+            name='Test Problem', acceptance=0.5, difficulty=DIFFICULTY_CHOICES[0][0], question_html='<p>Q</p>',
+            solution_html='<p>S</p>').id, 'solved')
+        res = Client().get(reverse('api:problems-list'), HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(res.json()['results'][0]['status'], 'Solved')
+
+    @mock.patch.object(DeferredUserJWTAuthentication, 'cache_ttl', 60)
+    def test_cached_user(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+        c.force_login(self.staff)
+        res = c.patch(reverse('api:users-detail', args=[self.user.pk]), {'password': 'newpassword'},
+                      content_type='application/json')
+        self.assertEqual(res.status_code, 200)
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+
+class BenchmarkTestCase(TestCase):
+    """
+    The benchmark scenarios on a small seeded catalog: query counts must not grow past the stored baselines, whatever
+    the size of the data.
+    """
+    dataset = {'problems': 200, 'users': 5, 'progress': 20}
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmarks.seed(**cls.dataset)
+
+    def test_baselines(self):
+        results = benchmarks.run(repeat=1)
+        self.assertEqual(set(results), set(benchmarks.load_baselines()['scenarios']))
+        self.assertEqual(benchmarks.regressions(results, benchmarks.load_baselines(), self.dataset), [])
+
+    def test_regressions(self):
+        baselines = {'dataset': self.dataset, 'scenarios': {'api-list': {'queries': 4, 'time_ms': 10}}}
+        self.assertEqual(benchmarks.regressions({'api-list': {'queries': 5, 'time_ms': 40}}, baselines, self.dataset),
+                         ['api-list: 5 queries, baseline 4', 'api-list: 40 ms, baseline 10 ms'])
+        self.assertEqual(benchmarks.regressions({'api-list': {'queries': 4, 'time_ms': 40}}, baselines, {}), [])
+
+    def test_sustained_concurrency(self):
+        results = {
+            1: {'errors': 0, 'p99_ms': 20}, 8: {'errors': 0, 'p99_ms': 300}, 32: {'errors': 2, 'p99_ms': 400},
+            64: {'errors': 0, 'p99_ms': 2000},
+        }
+        self.assertEqual(benchmarks.sustained_concurrency(results, 1000), 8)
+        self.assertEqual(benchmarks.sustained_concurrency(results, 10), 0)
+
+
+class RequestTimingTestCase(TestCase):
+    def setUp(self):
+        request_metrics.clear()
+        Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+        )
+        self.staff = User.objects.create_user(username='teststaff', password='testpassword', is_staff=True)
+
+    def test_sampling_off(self):
+        res = Client().get(reverse('api:problems-list'))
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(request_metrics.percentiles(), {})
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_server_timing(self):
+        res = Client().get(reverse('api:problems-list'))
+        self.assertRegex(res['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", view;dur=[\d.]+, '
+                                               r'render;dur=[\d.]+, total;dur=[\d.]+$')
+        client = Client()
+        client.force_login(self.staff)
+        client.get(reverse('problems:problem_list'))
+        metrics = request_metrics.percentiles()
+        self.assertEqual(metrics['GET /api/problems/']['count'], 1)
+        self.assertGreater(metrics['GET /api/problems/']['queries']['p50'], 0)
+        self.assertGreater(metrics['GET /problems/']['render']['p99'], 0)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        with self.assertLogs('job_prep.requests', 'WARNING') as logs:
+            Client().get(reverse('api:problems-list'))
+        self.assertIn('Slow request GET /api/problems/', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_metrics_endpoint(self):
+        client = Client()
+        self.assertEqual(client.get(reverse('api:request_metrics')).status_code, 403)
+        client.force_login(self.staff)
+        res = client.get(reverse('api:request_metrics'))
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('GET /api/metrics/requests/', res.json())
+
+
+# The replica is the test database itself: the tests check which reads are routed, not what a replica returns.
+# Replicas need a cache shared by the workers, which a file-based one is.
+@override_settings(DATABASE_REPLICAS=['default'], CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp(),
+}})
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.problem = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+        )
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def routed(self, url, method='get'):
+        with mock.patch('job_prep.routers.random.choice', return_value='default') as choice:
+            self.assertLess(getattr(self.client, method)(url).status_code, 400)
+        return choice.called
+
+    def test_router(self):
+        request = RequestFactory().get('/')
+        request.read_database = 'replica1'
+        self.assertIsNone(ReplicaRouter().db_for_read(Problem))
+        with routing(request):
+            self.assertEqual(ReplicaRouter().db_for_read(Problem), 'replica1')
+
+    def test_router_needs_shared_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaRouter()
+            with override_settings(DATABASE_REPLICAS=[]):
+                ReplicaRouter()
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_relation_across_replicas(self):
+        problem = Problem.objects.get(pk=self.problem.pk)
+        problem._state.db = 'replica1'
+        progress = UserProblemStatus(user=self.user, problem=problem)
+        self.assertEqual(progress.problem, problem)
+        self.assertTrue(ReplicaRouter().allow_relation(self.user, problem))
+        problem._state.db = 'other'
+        self.assertIsNone(ReplicaRouter().allow_relation(self.user, problem))
+
+    def test_safe_reads_use_replica(self):
+        self.assertTrue(self.routed(reverse('api:problems-list')))
+        self.assertTrue(self.routed(reverse('api:problems-detail', args=[self.problem.pk])))
+        self.assertTrue(self.routed(reverse('problems:problem_list')))
+        self.assertTrue(self.routed(reverse('problems:problem_detail', args=[self.problem.pk])))
+        self.assertFalse(self.routed(reverse('api:problems-mark-tried', args=[self.problem.pk])))
+
+    def test_reads_stick_to_primary_after_writes(self):
+        self.routed(reverse('problems:mark_problem', args=[self.problem.pk, 'solved']))
+        self.assertFalse(self.routed(reverse('api:problems-list')))
+        self.assertFalse(self.routed(reverse('problems:problem_detail', args=[self.problem.pk])))
+        # Other users still read from the replica.
+        self.client.logout()
+        self.assertTrue(self.routed(reverse('api:problems-list')))
+        cache.clear()
+        self.client.force_login(self.user)
+        self.routed(reverse('problems:add_problem_link', args=[self.problem.pk]), 'post')
+        self.assertFalse(self.routed(reverse('problems:problem_list')))
+
+
+@override_settings(ROOT_URLCONF='job_prep.asgi_urls')
+class AsyncViewTestCase(TransactionTestCase):
+    """
+    The async list, detail and mark views under ASGI, where they query from the shared thread pool on their own
+    connections, so the data has to be committed.
+    """
+
+    def setUp(self):
+        self.problem = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+            tags=['Array'],
+        )
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def tearDown(self):
+        # The flush after each test empties the lookup tables behind the per-process name maps.
+        for lookup in name_lookups.values():
+            lookup.clear()
+
+    async def asgi_get(self, path):
+        """
+        Status and body of a GET through the ASGI application itself, which resolves against job_prep.asgi_urls.
+        """
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http', 'root_path': '',
+            'path': path, 'query_string': b'', 'headers': [(b'host', b'testserver')],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output()
+        body = b''
+        while True:
+            message = await communicator.receive_output()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return start['status'], body
+
+    def test_views_are_async(self):
+        for url in (reverse('api:problems-list'), reverse('api:problems-mark-solved', args=[self.problem.pk]),
+                    reverse('problems:problem_list'), reverse('problems:problem_detail', args=[self.problem.pk])):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func), url)
+            # WSGI keeps the plain views, without an event loop per request.
+            self.assertFalse(asyncio.iscoroutinefunction(resolve(url, 'job_prep.urls').func), url)
+        self.assertFalse(asyncio.iscoroutinefunction(resolve(reverse('api:problems-facets')).func))
+
+    async def test_asgi_requests(self):
+        client = AsyncClient()
+        res = await client.get(reverse('api:problems-list'))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([problem['tags'] for problem in json.loads(res.content)['results']], [['Array']])
+        res = await client.get(reverse('api:problems-detail', args=[self.problem.pk]))
+        self.assertEqual(json.loads(res.content)['name'], 'Test Problem')
+        await sync_to_async(client.force_login)(self.user)
+        res = await client.get(reverse('api:problems-mark-solved', args=[self.problem.pk]))
+        self.assertEqual(json.loads(res.content), {'id': self.problem.pk, 'status': 'Solved'})
+        res = await client.get(reverse('problems:problem_list'))
+        self.assertContains(res, 'Test Problem')
+        res = await client.get(reverse('problems:problem_detail', args=[self.problem.pk]))
+        self.assertContains(res, 'Solved')
+        res = await client.get(reverse('problems:mark_problem', args=[self.problem.pk, 'confident']))
+        self.assertEqual(res.status_code, 302)
+        status = await sync_to_async(UserProblemStatus.objects.get)(user=self.user)
+        self.assertEqual(status.status, 'confident')
+
+    async def test_asgi_application(self):
+        status, body = await self.asgi_get(reverse('api:problems-list'))
+        self.assertEqual(status, 200)
+        self.assertEqual([problem['name'] for problem in json.loads(body)['results']], ['Test Problem'])
+        # Django 4.0 would iterate the export's database cursor on the event loop, so only WSGI serves it.
+        status, body = await self.asgi_get(reverse('api:problems-export'))
+        self.assertEqual(status, 501)
+        self.assertEqual(json.loads(body), {'detail': 'Not available over ASGI.'})
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    async def test_pool_queries_timed(self):
+        request_metrics.clear()
+        res = await AsyncClient().get(reverse('api:problems-list'))
+        self.assertRegex(res['Server-Timing'], r'desc="[1-9]\d* queries"')
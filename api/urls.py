@@ -7,10 +7,21 @@ from . import views
 router = routers.DefaultRouter()
 router.register('problems', views.ProblemViewSet, basename='problems')
 router.register('users', views.UserViewSet, basename='users')
+router.register('progress', views.ProgressViewSet, basename='progress')
+router.register('review', views.ReviewViewSet, basename='review')
+router.register('leaderboard', views.LeaderboardViewSet, basename='leaderboard')
+
+# The hot read and mark paths, run as async views when served over ASGI (job_prep.asgi_urls).
+ASYNC_ROUTES = {'problems-list', 'problems-detail', 'problems-mark-confident', 'problems-mark-solved',
+                'problems-mark-tried'}
+# Streamed from a database cursor, which Django 4.0 would iterate on the ASGI event loop.
+WSGI_ONLY_ROUTES = {'problems-export'}
 
 app_name = 'api'
 urlpatterns = router.urls + [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
+    path('metrics/requests/', views.RequestMetricsView.as_view(), name='request_metrics'),
 ]
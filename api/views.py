@@ -1,11 +1,32 @@
+import re
+
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, serializers
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.filters import SearchFilter
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from problems.models import Problem
+from job_prep.middleware import request_metrics
+from job_prep.routers import use_replica
+from problems.autocomplete import autocomplete_index
+from problems.cache import cached_representation, cached_user_stats, problem_validators
+from problems.facets import facet_counts, progress_stats
+from problems.models import Problem, ProblemSignature, UserProblemStatus, ProgressSyncBatch, UserScore
+from problems.recommendations import recommend_problems
 from users.models import User
-from .serializers import ProblemSerializer, UserSerializer
+from .filters import ProblemSearchFilter
+from .pagination import ProblemPagination
+from .streaming import gzip_chunks, ndjson_chunks
+from .serializers import (
+    ProblemRows, ProblemSerializer, UserSerializer, ProgressSyncSerializer, ReviewCompleteSerializer,
+)
 
 
 class IsAdminUserOrReadOnly(permissions.BasePermission):
@@ -25,6 +46,23 @@ class UserTablePermission(permissions.BasePermission):
         return request.user and request.user.is_authenticated and (request.user == obj or request.user.is_staff)
 
 
+def object_id(pk):
+    """
+    The integer id of a URL, NotFound unless it is ASCII digits: str.isdigit() also accepts characters like '²' that
+    int() rejects.
+    """
+    if not re.fullmatch(r'[0-9]+', pk):
+        raise NotFound
+    return int(pk)
+
+
+def query_limit(request, default, maximum):
+    try:
+        return min(max(int(request.query_params.get('limit', default)), 1), maximum)
+    except ValueError:
+        return default
+
+
 # noinspection DuplicatedCode
 class ProblemViewSet(viewsets.ModelViewSet):
     """
@@ -32,7 +70,13 @@ class ProblemViewSet(viewsets.ModelViewSet):
     """
 
     def get_queryset(self):
-        problems = Problem.objects.all()
+        problems = self.filter_catalog(Problem.objects.with_status(self.request.user))
+        fields = self.get_requested_fields()
+        if fields is not None:
+            problems = problems.defer(*[name for name in self.heavy_fields if name not in fields])
+        return problems
+
+    def filter_catalog(self, problems):
         company = self.request.query_params.get('company')
         tags = self.request.query_params.get('tags')
         if company:
@@ -43,52 +87,250 @@ class ProblemViewSet(viewsets.ModelViewSet):
             problems = problems.filter(tags__overlap=tags)
         return problems
 
+    def get_requested_fields(self):
+        """
+        Fields asked for with ?fields=id,name,... or ?summary=true on reads, None for the full representation.
+        """
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        fields = self.request.query_params.get('fields')
+        if fields:
+            return [name for name in fields.split(',') if name]
+        if self.request.query_params.get('summary') in ('1', 'true'):
+            return self.summary_fields
+        return None
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
     queryset = Problem.objects.all()
     serializer_class = ProblemSerializer
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = [IsAdminUserOrReadOnly]
     filterset_fields = ('difficulty',)
-    search_fields = ('name', 'question_html')
-    filter_backends = (DjangoFilterBackend, SearchFilter,)
+    filter_backends = (DjangoFilterBackend, ProblemSearchFilter,)
+    pagination_class = ProblemPagination
+    summary_fields = ('id', 'name', 'status', 'acceptance', 'difficulty', 'tags', 'companies', 'excerpt')
+    heavy_fields = ('question_html', 'solution_html')
+    export_fields = ('id', 'name', 'acceptance', 'difficulty', 'question_html', 'solution_html', 'problem_link', 'tags',
+                     'companies', 'excerpt')
+    export_chunk_size = 2000
+    recommended_limit = 20
+    recommended_max_limit = 100
+    similar_limit = 10
+    similar_max_limit = 50
+    # Read-only actions, whose safe requests read from a replica. The mark_* actions write despite being GETs.
+    replica_actions = ('list', 'retrieve', 'facets', 'recommended', 'similar', 'export')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            use_replica(request)
+
+    def mark(self, request, pk, status):
+        problem_id = object_id(pk)
+        label = UserProblemStatus.objects.mark(request.user, problem_id, status)
+        if label is None:
+            raise NotFound
+        return Response({'id': problem_id, 'status': label})
+
+    def list(self, request, *args, **kwargs):
+        # Reads skip ProblemSerializer: ProblemRows builds the same representation straight from values() rows.
+        rows = ProblemRows(self.get_requested_fields())
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.many(page))
+        return Response(rows.many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        # Only the validators are read up front, so a 304 costs one narrow query. Otherwise the user-independent
+        # representation comes from the shared cache and the user's status is overlaid on it.
+        queryset = self.filter_queryset(self.get_queryset()).only('id', 'content_hash', 'updated_at')
+        problem = get_object_or_404(queryset, pk=object_id(kwargs['pk']))
+        self.check_object_permissions(request, problem)
+        etag, last_modified = problem_validators(problem)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            rows = ProblemRows([name for name in ProblemSerializer.Meta.fields if name != 'status'])
+            data = cached_representation(problem, lambda: rows.to_representation(
+                rows.values(Problem.objects.filter(pk=problem.pk)).get()))
+            fields = self.get_requested_fields() or ProblemSerializer.Meta.fields
+            response = Response({
+                name: problem.status if name == 'status' else data[name]
+                for name in ProblemSerializer.Meta.fields if name in fields
+            })
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        problems = self.filter_queryset(self.filter_catalog(Problem.objects.all()))
+        return Response(facet_counts(problems, request.user))
+
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        """
+        Problems the user has not solved yet, ranked by company and tag overlap with their progress, with the score.
+        """
+        limit = query_limit(request, self.recommended_limit, self.recommended_max_limit)
+        ranked = recommend_problems(request.user, limit)
+        problems = ProblemRows(self.get_requested_fields()).ranked(Problem.objects.with_status(request.user), ranked)
+        return Response([{**data, 'score': round(score, 6)} for data, score in problems])
 
     @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        """
+        Problems similar to this one by question text and tag/company overlap, found through the precomputed
+        MinHash/LSH signatures instead of a scan of the catalog, with the score.
+        """
+        limit = query_limit(request, self.similar_limit, self.similar_max_limit)
+        ranked = ProblemSignature.objects.similar(object_id(pk), limit)
+        if ranked is None:
+            raise NotFound
+        problems = ProblemRows(self.get_requested_fields()).ranked(Problem.objects.with_status(request.user), ranked)
+        return Response([{**data, 'score': round(score, 6)} for data, score in problems])
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        The filtered catalog as NDJSON, gzip-compressed when the client accepts it. Rows are read through a
+        server-side cursor and streamed as they are encoded, so worker memory stays flat however big the catalog is.
+        Served under WSGI only: Django 4.0 iterates streaming responses on the ASGI event loop, where the ORM cannot
+        run.
+        """
+        fields = self.get_requested_fields() or self.export_fields
+        problems = self.filter_queryset(self.filter_catalog(Problem.objects.all())).order_by('id').values(
+            *[name for name in self.export_fields if name in fields])
+        chunks = ndjson_chunks(problems.iterator(chunk_size=self.export_chunk_size))
+        gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response = StreamingHttpResponse(gzip_chunks(chunks) if gzipped else chunks,
+                                         content_type='application/x-ndjson')
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        response['Content-Disposition'] = 'attachment; filename="problems.ndjson"'
+        return response
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def mark_confident(self, request, pk):
-        pk = int(pk)
-        user = request.user
-        if pk not in user.confident_problems:
-            user.confident_problems.append(pk)
-        if pk in user.solved_problems:
-            user.solved_problems.remove(pk)
-        if pk in user.tried_problems:
-            user.solved_problems.remove(pk)
-        user.save()
-        return self.retrieve(request, pk)
+        return self.mark(request, pk, 'confident')
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def mark_solved(self, request, pk):
-        pk = int(pk)
-        user = request.user
-        if pk not in user.solved_problems:
-            user.solved_problems.append(pk)
-        if pk in user.confident_problems:
-            user.confident_problems.remove(pk)
-        if pk in user.tried_problems:
-            user.tried_problems.remove(pk)
-        user.save()
-        return self.retrieve(request, pk)
+        return self.mark(request, pk, 'solved')
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def mark_tried(self, request, pk):
-        pk = int(pk)
-        user = request.user
-        if pk not in list(user.tried_problems):
-            user.tried_problems.append(pk)
-        if pk in user.confident_problems:
-            user.confident_problems.remove(pk)
-        if pk in user.solved_problems:
-            user.solved_problems.remove(pk)
-        user.save()
-        return self.retrieve(request, pk)
+        return self.mark(request, pk, 'tried')
+
+
+class ProgressViewSet(viewsets.GenericViewSet):
+    """
+    API endpoint that applies progress changes queued by offline clients.
+    """
+    serializer_class = ProgressSyncSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        with transaction.atomic():
+            batch, created = ProgressSyncBatch.objects.get_or_create(user=request.user, batch_id=data['batch_id'])
+            if created:
+                batch.applied = UserProblemStatus.objects.sync(request.user, [
+                    (change['problem_id'], change['status'], change['client_timestamp']) for change in data['changes']
+                ])
+                batch.save(update_fields=['applied'])
+        return Response({
+            'batch_id': batch.batch_id,
+            'applied': batch.applied,
+            'statuses': UserProblemStatus.objects.status_map(request.user),
+        })
+
+
+class ReviewViewSet(viewsets.GenericViewSet):
+    """
+    API endpoint for the user's spaced-repetition review queue.
+    """
+    serializer_class = ReviewCompleteSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    due_limit = 20
+    due_max_limit = 100
+
+    @action(detail=False, methods=['get'])
+    def due(self, request):
+        due = UserProblemStatus.objects.due(request.user, query_limit(request, self.due_limit, self.due_max_limit))
+        problems = ProblemRows(ProblemViewSet.summary_fields).ranked(Problem.objects.with_status(request.user), due)
+        due_at = serializers.DateTimeField()
+        return Response([{**data, 'due_at': due_at.to_representation(at)} for data, at in problems])
+
+    @action(detail=False, methods=['post'])
+    def complete(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        schedule = UserProblemStatus.objects.review(request.user, [
+            (review['problem_id'], review['quality']) for review in serializer.validated_data['reviews']
+        ])
+        due_at = serializers.DateTimeField()
+        return Response({
+            'reviewed': len(schedule),
+            'schedule': [
+                {'problem_id': problem_id, 'due_at': due_at.to_representation(at), 'interval_days': interval_days}
+                for problem_id, (at, interval_days) in schedule.items()
+            ],
+        })
+
+
+class LeaderboardViewSet(viewsets.GenericViewSet):
+    """
+    API endpoint that ranks users by their solved and confident problems, overall or for one ?company=.
+    """
+    permission_classes = [permissions.AllowAny]
+    leaders_limit = 20
+    leaders_max_limit = 100
+
+    def list(self, request):
+        scope = request.query_params.get('company', '')
+        limit = query_limit(request, self.leaders_limit, self.leaders_max_limit)
+        return Response({'company': scope or None, 'results': UserScore.objects.top(limit, scope)})
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def me(self, request):
+        scope = request.query_params.get('company', '')
+        return Response({'company': scope or None, **UserScore.objects.rank(request.user.pk, scope)})
+
+
+class AutocompleteView(APIView):
+    """
+    API endpoint with the problem names, companies and tags matching ?q= as the user types, from a per-process
+    prefix index instead of an ILIKE over the catalog.
+    """
+    autocomplete_limit = 10
+    autocomplete_max_limit = 50
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Only (re)loading the index reads the catalog.
+        use_replica(request)
+
+    def get(self, request):
+        limit = query_limit(request, self.autocomplete_limit, self.autocomplete_max_limit)
+        return Response(autocomplete_index.get().complete(request.query_params.get('q', ''), limit))
+
+
+class RequestMetricsView(APIView):
+    """
+    API endpoint with per-route percentiles of the requests timed by RequestTimingMiddleware in this process.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(request_metrics.percentiles())
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -102,3 +344,7 @@ class UserViewSet(viewsets.ModelViewSet):
     search_fields = ('username', 'email')
     filterset_fields = ('is_staff', 'is_superuser', 'is_active', 'date_joined', 'last_login')
     filter_backends = (SearchFilter, DjangoFilterBackend)
+
+    @action(detail=False, methods=['get'], url_path='me/stats', permission_classes=[permissions.IsAuthenticated])
+    def stats(self, request):
+        return Response(cached_user_stats(request.user, lambda: progress_stats(request.user)))
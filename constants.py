@@ -4,6 +4,19 @@ DIFFICULTY_CHOICES = (
     ('hard', 'Hard'),
 )
 
+PROGRESS_STATUS_CHOICES = (
+    ('tried', 'Tried'),
+    ('solved', 'Solved'),
+    ('confident', 'Confident'),
+)
+UNTRIED = 'Untried'
+
+FACET_CHOICES = (
+    ('difficulty', 'Difficulty'),
+    ('company', 'Company'),
+    ('tag', 'Tag'),
+)
+
 STATUS_CHOICES = (
     ('unread', 'Unread'),
     ('read', 'Read'),
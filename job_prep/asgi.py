@@ -1,7 +1,19 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'job_prep.settings')
 
-application = get_asgi_application()
+
+class AsyncViewRequest(ASGIRequest):
+    # Resolved against the URLconf that serves the hot read and mark paths as async views.
+    urlconf = 'job_prep.asgi_urls'
+
+
+class AsyncViewHandler(ASGIHandler):
+    request_class = AsyncViewRequest
+
+
+django.setup(set_prefix=False)
+application = AsyncViewHandler()
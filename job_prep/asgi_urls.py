@@ -0,0 +1,16 @@
+from django.urls import include, path
+
+from api import urls as api_urls
+from problems import urls as problems_urls
+from .async_views import async_patterns, wsgi_only_patterns
+from .urls import urlpatterns as wsgi_urlpatterns
+
+# The URLconf of the ASGI application only: the same routes as job_prep.urls, with the hot read and mark paths
+# as async views. Under WSGI those would pay for an event loop per request and gain nothing.
+urlpatterns = [
+    path('api/', include((wsgi_only_patterns(async_patterns(api_urls.urlpatterns, api_urls.ASYNC_ROUTES),
+                                             api_urls.WSGI_ONLY_ROUTES), api_urls.app_name))),
+    path('problems/', include((async_patterns(problems_urls.urlpatterns, problems_urls.ASYNC_ROUTES),
+                               problems_urls.app_name))),
+    *wsgi_urlpatterns,
+]
@@ -0,0 +1,78 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.urls import URLPattern
+
+from .middleware import recording_queries
+
+
+def run_in_pool(function):
+    """
+    function as a coroutine running on the event loop's shared thread pool. Each call checks the pool thread's
+    connections before and after, honouring CONN_MAX_AGE, since the request signals that do so only fire in the
+    request's own thread.
+    """
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def async_view(view):
+    """
+    Async version of a sync view, for the ASGI application. The view, its queries and the rendering of template and
+    DRF responses (which query lazily) run on the shared thread pool instead of the single thread Django keeps for
+    sync code. Django 4.0 has no async ORM, so the queries themselves stay synchronous. The middleware stack is
+    sync-only too (WhiteNoise among others), so every ASGI request still hops to a thread for the middlewares, which
+    is why the Procfile serves WSGI and ASGI is only compared by benchmark_concurrency.
+    """
+    @run_in_pool
+    def respond(request, *args, **kwargs):
+        with recording_queries(request):
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()
+        return response
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await respond(request, *args, **kwargs)
+
+    return wrapper
+
+
+def wsgi_only(view):
+    """
+    A view answering 501 Not Implemented in place of one that only works under WSGI.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return JsonResponse({'detail': 'Not available over ASGI.'}, status=501)
+
+    return wrapper
+
+
+def wrap_patterns(patterns, names, wrap):
+    """
+    The URL patterns, with the views of those named in names replaced by wrap(view).
+    """
+    return [
+        URLPattern(pattern.pattern, wrap(pattern.callback), pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in names else pattern
+        for pattern in patterns
+    ]
+
+
+def async_patterns(patterns, names):
+    return wrap_patterns(patterns, names, async_view)
+
+
+def wsgi_only_patterns(patterns, names):
+    return wrap_patterns(patterns, names, wsgi_only)
@@ -0,0 +1,168 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .routers import routing
+
+logger = logging.getLogger('job_prep.requests')
+
+TOP_QUERIES = 5
+
+
+class RequestMetrics:
+    """
+    Per-route samples of sampled requests, the last max_samples of each route, kept in this process.
+    """
+
+    def __init__(self, max_samples=1000):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def record(self, route, timings):
+        with self.lock:
+            self.samples[route].append(timings)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def percentiles(self, percents=(50, 90, 99)):
+        """
+        {route: {'count': n, metric: {'p50': ..., ...}}} for every recorded metric of every route.
+        """
+        with self.lock:
+            samples = {route: list(values) for route, values in self.samples.items()}
+        summary = {}
+        for route, values in sorted(samples.items()):
+            summary[route] = {'count': len(values)}
+            for metric in values[0]:
+                ordered = sorted(timings[metric] for timings in values)
+                summary[route][metric] = {
+                    f'p{percent}': ordered[min(len(ordered) - 1, len(ordered) * percent // 100)] for percent in percents
+                }
+        return summary
+
+
+request_metrics = RequestMetrics()
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting queries and their time.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - start, sql))
+
+    @property
+    def duration(self):
+        return sum(duration for duration, _ in self.queries)
+
+
+@contextmanager
+def recording_queries(request):
+    """
+    Count the queries of this thread's connections towards the request, if RequestTimingMiddleware is timing it.
+    Views that query from other threads use this to have their queries counted too.
+    """
+    recorder = getattr(request, '_query_recorder', None)
+    with ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestTimingMiddleware:
+    """
+    Times a sample of requests: query count, database time, view time and render time (templates and DRF
+    renderers), reported in a Server-Timing header and aggregated per route for the request metrics endpoint.
+    Requests slower than SLOW_REQUEST_MS are logged with their slowest queries. With REQUEST_TIMING_SAMPLE_RATE
+    at 0 requests pass straight through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        self.slow_request_ms = settings.SLOW_REQUEST_MS
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        recorder = request._query_recorder = QueryRecorder()
+        request._timing = {}
+        start = time.perf_counter()
+        with recording_queries(request):
+            response = self.get_response(request)
+        end = time.perf_counter()
+        marks = request._timing
+        view_end = marks.get('render_start', end)
+        timings = {
+            'total': milliseconds(end - start),
+            'db': milliseconds(recorder.duration),
+            'queries': len(recorder.queries),
+            'view': milliseconds(view_end - marks.get('view_start', view_end)),
+            'render': milliseconds(marks.get('render_end', view_end) - view_end),
+        }
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings["db"]};desc="{timings["queries"]} queries"',
+            f'view;dur={timings["view"]}',
+            f'render;dur={timings["render"]}',
+            f'total;dur={timings["total"]}',
+        ])
+        match = request.resolver_match
+        # DRF router routes are regular expressions, anchored with ^ and $.
+        route = f'{request.method} /{match.route.lstrip("^").replace("$", "")}' if match else f'{request.method} ?'
+        request_metrics.record(route, timings)
+        if timings['total'] >= self.slow_request_ms:
+            slowest = sorted(recorder.queries, key=lambda query: query[0], reverse=True)[:TOP_QUERIES]
+            logger.warning(
+                'Slow request %s %s: %s\n%s', request.method, request.get_full_path(), timings,
+                '\n'.join(f'  {milliseconds(duration)} ms: {sql}' for duration, sql in slowest),
+                extra={'timings': timings, 'route': route},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_timing'):
+            request._timing['view_start'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        if hasattr(request, '_timing'):
+            request._timing['render_start'] = time.perf_counter()
+
+            def rendered(response):
+                request._timing['render_end'] = time.perf_counter()
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Lets ReplicaRouter see the request while its view runs and its response renders.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing(request):
+            return self.get_response(request)
@@ -0,0 +1,75 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The request being handled, so the router can see which database the view picked for its reads.
+current_request = ContextVar('current_request', default=None)
+
+
+@contextmanager
+def routing(request):
+    token = current_request.set(request)
+    try:
+        yield
+    finally:
+        current_request.reset(token)
+
+
+def primary_reads_key(user_id):
+    return f'primary_reads:{user_id}'
+
+
+def read_from_primary(user_id):
+    """
+    Keep the user's reads on the primary for REPLICA_STICKY_SECONDS, long enough for the replicas to catch up with
+    what they just wrote. The cache is shared by the workers, so this holds across them; ReplicaRouter refuses to
+    start on a per-process one.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(primary_reads_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def use_replica(request):
+    """
+    Send the request's remaining reads to a random replica, unless it is not a safe request or the user wrote
+    recently. Called once the user is authenticated.
+    """
+    if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+        return
+    user = request.user
+    if user.is_authenticated and cache.get(primary_reads_key(user.pk)):
+        return
+    # DRF requests wrap the HttpRequest the router sees.
+    getattr(request, '_request', request).read_database = random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    """
+    Routes the reads of requests whose view called use_replica() to that replica; everything else, writes
+    included, stays on the default database.
+    """
+
+    def __init__(self):
+        if settings.DATABASE_REPLICAS and isinstance(caches['default'], LocMemCache):
+            # Another worker would still send the user's reads to a replica right after a write.
+            raise ImproperlyConfigured(
+                'DATABASE_REPLICAS needs a cache shared by all workers, such as Redis or Memcached, to keep reads '
+                'on the primary after a write. Set CACHE_BACKEND and CACHE_LOCATION.'
+            )
+
+    def db_for_read(self, model, **hints):
+        return getattr(current_request.get(), 'read_database', None)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary, so an object read from one can be related to another.
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
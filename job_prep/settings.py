@@ -4,6 +4,7 @@ from abc import ABC
 from datetime import timedelta
 
 from corsheaders.defaults import default_headers
+import dj_database_url
 import django_heroku
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -32,6 +33,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'job_prep.middleware.RequestTimingMiddleware',
+    'job_prep.middleware.DatabaseRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -42,6 +45,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Share of requests RequestTimingMiddleware times, from 0 (off) to 1, and the time above which it logs them.
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv('REQUEST_TIMING_SAMPLE_RATE', 0))
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+
 ROOT_URLCONF = 'job_prep.urls'
 
 TEMPLATES = [
@@ -66,7 +73,7 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'ENFORCE_SCHEMA': False,
-        'NAME': 'jp_db',
+        'NAME': os.getenv('DATABASE_NAME', 'jp_db'),
         'USER': 'mah',
         'PASSWORD': '1234',
         'HOST': '127.0.0.1',
@@ -74,6 +81,23 @@ DATABASES = {
     }
 }
 
+# Read replicas as comma-separated database URLs, added as replica1, replica2, ... Safe reads of the problem views go
+# to a random replica, except for users who marked progress or edited a problem in the last REPLICA_STICKY_SECONDS.
+# Those users are tracked in the cache, so replicas need CACHE_BACKEND set to a cache shared by all workers.
+# To try it locally, point DATABASE_REPLICA_URLS at a second database and run migrate --database replica1 on it.
+for index, url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {**dj_database_url.parse(url), 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['job_prep.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -110,9 +134,13 @@ LOGIN_REDIRECT_URL = '/'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 100,
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.DeferredUserJWTAuthentication',
     ),
 }
 
@@ -1,6 +1,16 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
 
-from .models import Problem
+from .models import Problem, UserProblemStatus
+from .search import search_problems
+
+
+class ProblemChangeList(ChangeList):
+    def get_ordering(self, request, queryset):
+        # Searches are listed by relevance unless a column ordering was picked.
+        if self.query.strip() and ORDER_VAR not in self.params:
+            return ['-rank', '-pk']
+        return super().get_ordering(request, queryset)
 
 
 @admin.register(Problem)
@@ -9,3 +19,19 @@ class ProblemAdmin(admin.ModelAdmin):
     list_filter = ('difficulty',)
     search_fields = ('name', 'question_html',)
     list_per_page = 20
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_problems(queryset, search_term), False
+
+    def get_changelist(self, request, **kwargs):
+        return ProblemChangeList
+
+
+@admin.register(UserProblemStatus)
+class UserProblemStatusAdmin(admin.ModelAdmin):
+    list_display = ('user', 'problem', 'status', 'updated_at', 'due_at',)
+    list_filter = ('status',)
+    raw_id_fields = ('user', 'problem',)
+    list_per_page = 20
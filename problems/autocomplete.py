@@ -0,0 +1,184 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+from .catalog_index import CatalogIndexCache
+
+AUTOCOMPLETE_VERSION_KEY = 'autocomplete:version'
+# Sorts after every character, so prefix + KEY_END bounds the keys starting with prefix.
+KEY_END = chr(0x10FFFF)
+# Problems changed since the name index was built, matched by a scan until there are this many.
+DELTA_LIMIT = 500
+
+
+def normalize(text):
+    """
+    Lowercase words of the text separated by single spaces, so punctuation and case never stop a match.
+    """
+    return ' '.join(re.findall(r'\w+', text.casefold()))
+
+
+def word_suffixes(text):
+    words = normalize(text).split(' ')
+    return [' '.join(words[start:]) for start in range(len(words)) if words[start]]
+
+
+class PrefixIndex:
+    """
+    Matches a query against the start of any word of the texts, case-insensitively. Every word suffix of every text is
+    a key in one sorted list, so the matches of a query are a single bisected range. Each key ranks its text by where
+    the match starts, texts matching from their first word first, then by the order the texts were given in; the best
+    matches of a range are a NumPy partial sort of those ranks.
+    """
+
+    def __init__(self, texts):
+        keys = sorted(
+            (key, start > 0, position)
+            for position, text in enumerate(texts) for start, key in enumerate(word_suffixes(text))
+        )
+        self.keys = [key for key, _, _ in keys]
+        self.positions = np.array([position for _, _, position in keys], dtype=np.int64)
+        self.size = len(texts)
+        self.ranks = np.array([inner * len(texts) + position for _, inner, position in keys], dtype=np.int64)
+
+    def search(self, query, limit):
+        """
+        Positions of up to limit texts matching the query, best first.
+        """
+        return [position for _, position in self.ranked(query, limit)]
+
+    def ranked(self, query, limit, excluded=()):
+        """
+        (first_word, position) of up to limit texts matching the query, best first, leaving out the excluded
+        positions; first_word tells whether the text matches from its first word.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + KEY_END, start)
+        ranks, positions = self.ranks[start:end], self.positions[start:end]
+        wanted = limit
+        while True:
+            # A text can match through several of its words, so take more keys until limit texts are found.
+            count = min(wanted, len(ranks))
+            top = np.argpartition(ranks, count - 1)[:count] if count < len(ranks) else np.arange(len(ranks))
+            top = top[np.argsort(ranks[top], kind='stable')]
+            found = {}
+            for rank, position in zip(ranks[top].tolist(), positions[top].tolist()):
+                if position not in found and position not in excluded:
+                    found[position] = rank < self.size
+            if len(found) >= limit or count == len(ranks):
+                return [(first_word, position) for position, first_word in found.items()][:limit]
+            wanted *= 2
+
+
+class AutocompleteIndex:
+    """
+    Prefix indexes over problem names, in catalog order, and over the companies and tags, most used first.
+
+    Changed problems are patched in without rebuilding the name index: their entries there are skipped, and their
+    current names are matched by a scan of the problems changed since the build, merged into the results in the same
+    order. Past DELTA_LIMIT changes the name index is built again. The company and tag indexes are small, and are
+    rebuilt from running counts when a change touches them.
+    """
+
+    def __init__(self, rows=()):
+        # {problem_id: (name, acceptance, tags, companies)}, the source the indexes are built from.
+        self.rows = dict(rows)
+        self.tag_counts, self.company_counts = Counter(), Counter()
+        for _, _, tags, companies in self.rows.values():
+            self.tag_counts.update(tags)
+            self.company_counts.update(companies)
+        self.build()
+        self.build_facets()
+
+    def build(self):
+        problems = sorted(self.rows.items(), key=lambda item: (-item[1][1], item[1][0], item[0]))
+        self.problems = [(pk, name) for pk, (name, _, _, _) in problems]
+        self.problem_positions = {pk: position for position, (pk, _) in enumerate(self.problems)}
+        self.problem_index = PrefixIndex([name for _, name in self.problems])
+        # Positions of the problems changed since the build, and {problem_id: name word suffixes} of their rows now.
+        self.stale, self.changed = set(), {}
+
+    def build_facets(self):
+        self.tags = sorted(((value, count) for value, count in self.tag_counts.items() if count > 0),
+                           key=lambda item: (-item[1], item[0]))
+        self.companies = sorted(((value, count) for value, count in self.company_counts.items() if count > 0),
+                                key=lambda item: (-item[1], item[0]))
+        self.tag_index = PrefixIndex([value for value, _ in self.tags])
+        self.company_index = PrefixIndex([value for value, _ in self.companies])
+
+    def update(self, changed, removed=()):
+        """
+        Patch in the {problem_id: (name, acceptance, tags, companies)} of new or changed problems and drop the
+        removed problem ids.
+        """
+        facets = False
+        for pk in [*changed, *removed]:
+            row = self.rows.pop(pk, None)
+            if row is not None:
+                self.tag_counts.subtract(row[2])
+                self.company_counts.subtract(row[3])
+                new = changed.get(pk)
+                facets = facets or new is None or row[2:] != new[2:]
+            if pk in self.problem_positions:
+                self.stale.add(self.problem_positions[pk])
+            self.changed.pop(pk, None)
+        for pk, row in changed.items():
+            self.rows[pk] = row
+            self.tag_counts.update(row[2])
+            self.company_counts.update(row[3])
+            facets = facets or pk not in self.problem_positions
+            self.changed[pk] = word_suffixes(row[0])
+        if len(self.stale) + len(self.changed) > DELTA_LIMIT:
+            self.build()
+        if facets:
+            self.build_facets()
+
+    def complete_problems(self, query, limit):
+        def order(first_word, pk):
+            name, acceptance, _, _ = self.rows[pk]
+            return not first_word, -acceptance, name, pk
+
+        found = [order(first_word, self.problems[position][0])
+                 for first_word, position in self.problem_index.ranked(query, limit, self.stale)]
+        query = normalize(query)
+        if query:
+            found.extend(order(suffixes[0].startswith(query), pk) for pk, suffixes in self.changed.items()
+                         if any(suffix.startswith(query) for suffix in suffixes))
+        return [{'id': pk, 'name': name} for _, _, name, pk in sorted(found)[:limit]]
+
+    def complete(self, query, limit):
+        """
+        Up to limit problems, companies and tags each that match what the user typed so far.
+        """
+        limit = max(limit, 0)
+        return {
+            'problems': self.complete_problems(query, limit),
+            'companies': [
+                {'value': value, 'count': count} for value, count in
+                (self.companies[position] for position in self.company_index.search(query, limit))
+            ],
+            'tags': [
+                {'value': value, 'count': count} for value, count in
+                (self.tags[position] for position in self.tag_index.search(query, limit))
+            ],
+        }
+
+
+class AutocompleteIndexCache(CatalogIndexCache):
+    """
+    The per-process AutocompleteIndex.
+    """
+    index_class = AutocompleteIndex
+    version_key = AUTOCOMPLETE_VERSION_KEY
+    fields = ('name', 'acceptance', 'tags', 'companies')
+
+    def row(self, name, acceptance, tags, companies):
+        return name, float(acceptance), tags, companies
+
+
+autocomplete_index = AutocompleteIndexCache()
@@ -0,0 +1,61 @@
+import os
+
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from .utils import content_hash
+
+PROBLEM_CACHE_TIMEOUT = int(os.getenv('PROBLEM_CACHE_TIMEOUT', 60 * 60 * 24))
+# Progress changes invalidate the stats explicitly; the timeout only bounds how long catalog changes take to show.
+USER_STATS_CACHE_TIMEOUT = int(os.getenv('USER_STATS_CACHE_TIMEOUT', 60 * 10))
+
+
+def problem_cache_key(pk):
+    return f'problem:{pk}'
+
+
+def cached_representation(problem, build):
+    """
+    The user-independent representation of a problem from the shared cache, built and stored on a miss. Entries
+    are checked against the problem's content hash, so a stale entry is never served even if an invalidation is lost.
+    """
+    key = problem_cache_key(problem.pk)
+    cached = cache.get(key)
+    if cached is not None and cached['content_hash'] == problem.content_hash:
+        return cached['data']
+    data = build()
+    cache.set(key, {'content_hash': problem.content_hash, 'data': data}, PROBLEM_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_problems(pks):
+    cache.delete_many([problem_cache_key(pk) for pk in pks])
+
+
+def user_stats_cache_key(user_id):
+    return f'user_stats:{user_id}'
+
+
+def cached_user_stats(user, build):
+    key = user_stats_cache_key(user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = build()
+        cache.set(key, stats, USER_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_user_stats(user_id):
+    cache.delete(user_stats_cache_key(user_id))
+
+
+def problem_validators(problem, *variants):
+    """
+    ETag and Last-Modified timestamp for a problem fetched through Problem.objects.with_status(). The rendered
+    problem depends on its content and on the user's status, so both feed the validators, along with any variants.
+    """
+    tag = f'{problem.content_hash}-{problem.status}'
+    if variants:
+        tag = f'{tag}-{content_hash(variants)[:16]}'
+    last_modified = max(filter(None, (problem.updated_at, problem.status_updated_at)))
+    return quote_etag(tag), int(last_modified.timestamp())
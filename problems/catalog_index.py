@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from .models import Problem
+
+# How long after its updated_at a problem save may still commit and be caught by other processes' watermarks.
+SYNC_MARGIN = timedelta(minutes=5)
+CHANGELOG_TIMEOUT = 60 * 60 * 24
+# Seconds between checks against the database itself, which bound how stale an index gets when the version counter
+# cannot reach this process, as with the default per-process LocMemCache.
+CATALOG_SYNC_INTERVAL = float(os.getenv('CATALOG_SYNC_INTERVAL', 60))
+
+
+class CatalogIndexCache:
+    """
+    A per-process index over the catalog, loaded on first use and refreshed lazily. A refresh reads back only the
+    changed problems and patches their rows into the index.
+
+    Problem signals mark changed problems dirty here and log their ids in the shared cache under the next number of a
+    version counter. When the counter moves, the next read reloads the ids logged since this process's version, which
+    covers deletions, along with every problem updated since the watermark: the latest updated_at seen minus
+    SYNC_MARGIN, which catches saves that were still uncommitted when their ids were first reloaded. If the counter
+    went backwards or a logged entry expired, the whole catalog is loaded again.
+
+    Every CATALOG_SYNC_INTERVAL seconds the next read also reloads the problems updated since the watermark and
+    compares the problem count with the index, loading everything again on a mismatch. That is how changes made by
+    other processes arrive when the cache is not shared between them.
+
+    Subclasses set the index class, built from {problem_id: row} and patched by its update(changed, removed) method,
+    the version key and the fields each row is made from.
+    """
+    index_class = None
+    version_key = None
+    fields = ()
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.updated_at = None
+        self.synced_at = None
+        self.dirty = set()
+
+    def changelog_key(self, version):
+        return f'{self.version_key}:{version}'
+
+    def invalidate(self, pks):
+        pks = set(pks)
+        with self.lock:
+            self.dirty.update(pks)
+        cache.add(self.version_key, 0, None)
+        version = cache.incr(self.version_key)
+        cache.set(self.changelog_key(version), pks, CHANGELOG_TIMEOUT)
+
+    def get(self):
+        with self.lock:
+            version = cache.get(self.version_key, 0)
+            logged = self.changelog(version) if self.index is not None else None
+            expired = self.synced_at is not None and time.monotonic() - self.synced_at >= CATALOG_SYNC_INTERVAL
+            if logged is None:
+                self.reload()
+            elif self.dirty or version != self.version or expired:
+                self.refresh(self.dirty | logged, remote=version != self.version or expired)
+                if expired and Problem.objects.count() != len(self.index.rows):
+                    # Deleted by a process whose log this one cannot read.
+                    self.reload()
+            else:
+                return self.index
+            self.version = version
+            return self.index
+
+    def changelog(self, version):
+        """
+        The ids logged between this process's version and the given one, or None if some of them cannot be read.
+        """
+        if version == self.version:
+            return set()
+        if self.version is None or version < self.version:
+            return None
+        keys = [self.changelog_key(number) for number in range(self.version + 1, version + 1)]
+        logged = cache.get_many(keys)
+        if len(logged) < len(keys):
+            return None
+        return set().union(*logged.values())
+
+    def row(self, *values):
+        return values
+
+    def load(self, problems):
+        rows = {}
+        for pk, updated_at, *values in problems.values_list('id', 'updated_at', *self.fields).iterator():
+            rows[pk] = self.row(*values)
+            if self.updated_at is None or updated_at > self.updated_at:
+                self.updated_at = updated_at
+        return rows
+
+    def reload(self):
+        self.dirty = set()
+        self.updated_at = None
+        self.index = self.index_class(self.load(Problem.objects.all()))
+        self.synced_at = time.monotonic()
+
+    def refresh(self, pks, remote):
+        rows = self.index.rows
+        self.dirty = set()
+        stale = Problem.objects.filter(pk__in=pks)
+        if remote:
+            # Saves made by other processes may have committed after their ids were reloaded.
+            stale |= (Problem.objects.all() if self.updated_at is None
+                      else Problem.objects.filter(updated_at__gte=self.updated_at - SYNC_MARGIN))
+            self.synced_at = time.monotonic()
+        loaded = self.load(stale)
+        changed = {pk: row for pk, row in loaded.items() if rows.get(pk) != row}
+        removed = {pk for pk in pks - set(loaded) if pk in rows}
+        if changed or removed:
+            self.index.update(changed, removed)
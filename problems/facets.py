@@ -0,0 +1,123 @@
+from collections import defaultdict
+
+from django.db import connections
+
+from constants import PROGRESS_STATUS_CHOICES
+from .models import Problem, ProblemFacetCount, UserProblemStatus
+
+FACET_KEYS = {'difficulty': 'difficulty', 'company': 'companies', 'tag': 'tags'}
+
+# Counts per (facet, value, status) over the problems of the CTE "p", one unnest() per array facet. Companies and
+# tags are grouped by their smallint ids, as text to match the difficulty column, which name_rows() turns back into
+# names.
+FACET_AGGREGATE = """
+SELECT 'difficulty', difficulty, status, count(*) FROM p GROUP BY difficulty, status
+UNION ALL
+SELECT 'company', value::text, status, count(DISTINCT id) FROM p, unnest(companies) value GROUP BY value, status
+UNION ALL
+SELECT 'tag', value::text, status, count(DISTINCT id) FROM p, unnest(tags) value GROUP BY value, status
+"""
+
+
+def facet_counts(problems, user):
+    """
+    Counts per difficulty, company and tag over the given problems, each split by the user's status.
+    Unfiltered catalogs are answered from the ProblemFacetCount rollup plus the user's own progress rows; filtered
+    ones with a single aggregate query over the filtered problems joined with the user's progress.
+    """
+    user_id = user.pk if user.is_authenticated else None
+    if not problems.query.where:
+        return catalog_facet_counts(user_id, problems.db)
+    sql, params = problems.order_by().values('id', 'difficulty', 'tags', 'companies').query.sql_with_params()
+    with connections[problems.db].cursor() as cursor:
+        cursor.execute(f"""
+            WITH p AS (
+                SELECT f.id, f.difficulty, f.tags, f.companies, coalesce(s.status, 'untried') AS status
+                FROM ({sql}) f
+                LEFT JOIN {UserProblemStatus._meta.db_table} s ON s.problem_id = f.id AND s.user_id = %s
+            )
+            {FACET_AGGREGATE}
+        """, [*params, user_id])
+        rows = name_rows(cursor.fetchall(), problems.db)
+    totals = defaultdict(int)
+    for facet, value, _, count in rows:
+        totals[facet, value] += count
+    return build_facets(totals, rows)
+
+
+def catalog_facet_counts(user_id, using):
+    totals = {(facet, value): count for facet, value, count in
+              ProblemFacetCount.objects.using(using).values_list('facet', 'value', 'count')}
+    rows = []
+    if user_id is not None:
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"""
+                WITH p AS (
+                    SELECT pr.id, pr.difficulty, pr.tags, pr.companies, s.status
+                    FROM {UserProblemStatus._meta.db_table} s
+                    JOIN {Problem._meta.db_table} pr ON pr.id = s.problem_id
+                    WHERE s.user_id = %s AND s.status IS NOT NULL
+                )
+                {FACET_AGGREGATE}
+            """, [user_id])
+            rows = name_rows(cursor.fetchall(), using)
+    return build_facets(totals, rows)
+
+
+def name_rows(rows, using):
+    """
+    FACET_AGGREGATE rows with company and tag ids replaced by names, through the per-process lookup maps.
+    """
+    names = {}
+    for facet, key in (('company', 'companies'), ('tag', 'tags')):
+        lookup = Problem._meta.get_field(key).lookup
+        names[facet] = lookup.id_names({int(value) for row_facet, value, _, _ in rows if row_facet == facet}, using)
+    return [
+        (facet, names[facet][int(value)] if facet in names else value, status, count)
+        for facet, value, status, count in rows if facet not in names or int(value) in names[facet]
+    ]
+
+
+def build_facets(totals, status_rows):
+    """
+    {'difficulty': [...], 'companies': [...], 'tags': [...]}, each a list of
+    {'value', 'count', 'statuses': {status: count}} ordered by descending count.
+    """
+    statuses = defaultdict(lambda: {key: 0 for key, _ in PROGRESS_STATUS_CHOICES})
+    for facet, value, status, count in status_rows:
+        if status != 'untried':
+            statuses[facet, value][status] = count
+    facets = {key: [] for key in FACET_KEYS.values()}
+    for (facet, value), count in totals.items():
+        counts = statuses[facet, value]
+        facets[FACET_KEYS[facet]].append({
+            'value': value,
+            'count': count,
+            'statuses': {**counts, 'untried': count - sum(counts.values())},
+        })
+    for values in facets.values():
+        values.sort(key=lambda item: (-item['count'], item['value']))
+    return facets
+
+
+def completion(statuses, count):
+    done = statuses['solved'] + statuses['confident']
+    return round(100 * done / count, 1) if count else 0.0
+
+
+def progress_stats(user):
+    """
+    The user's progress over the whole catalog: counts per status overall and per difficulty, company and tag,
+    each with the percentage of problems solved or confident.
+    """
+    facets = facet_counts(Problem.objects.all(), user)
+    statuses = {key: 0 for key in [*(key for key, _ in PROGRESS_STATUS_CHOICES), 'untried']}
+    # Every problem has exactly one difficulty, so the difficulty counts add up to the catalog.
+    for item in facets['difficulty']:
+        for key, count in item['statuses'].items():
+            statuses[key] += count
+    total = sum(statuses.values())
+    stats = {'total': total, 'statuses': statuses, 'completion': completion(statuses, total)}
+    for key, values in facets.items():
+        stats[key] = [{**item, 'completion': completion(item['statuses'], item['count'])} for item in values]
+    return stats
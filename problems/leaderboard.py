@@ -0,0 +1,35 @@
+LEADERBOARD_POINTS = {'solved': 1, 'confident': 2}
+# Scores are counted in a Fenwick tree over this many slots, stored sparsely in LeaderboardNode, highest score first.
+RANK_TREE_SIZE = 2 ** 20
+
+
+def points_sql(status):
+    """
+    SQL for the leaderboard points a progress row with the given status expression is worth.
+    """
+    cases = ' '.join(f"WHEN '{key}' THEN {points}" for key, points in LEADERBOARD_POINTS.items())
+    return f'CASE {status} {cases} ELSE 0 END'
+
+
+def rank_tree_index(score):
+    return RANK_TREE_SIZE - min(score, RANK_TREE_SIZE) + 1
+
+
+def rank_tree_path(score):
+    """
+    Nodes to update when a user with the given score is added or removed.
+    """
+    index = rank_tree_index(score)
+    while index <= RANK_TREE_SIZE:
+        yield index
+        index += index & -index
+
+
+def rank_tree_prefix(score):
+    """
+    Nodes whose counts add up to the number of users with at least the given score.
+    """
+    index = rank_tree_index(score)
+    while index > 0:
+        yield index
+        index -= index & -index
@@ -0,0 +1,166 @@
+import threading
+
+from django import forms
+from django.apps import apps
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.forms import SimpleArrayField
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.utils.functional import cached_property
+
+# Id lookups for names that are not in the table match no row, as ids start at 1.
+UNKNOWN_ID = 0
+
+
+class NameLookup:
+    """
+    Per-process two-way map between the names and small integer ids of a lookup table (Company, Tag), read from the
+    database once per worker. Names or ids it does not know are fetched, and on writes inserted, when they turn up.
+    Names inserted inside a transaction are only reused by that transaction until it commits, so a rollback cannot
+    leave the map pointing names at ids that do not exist.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.ids = {}
+        self.names = {}
+        # {name: on_commit callback} of names inserted by transactions that have not committed yet.
+        self.pending = {}
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+    def clear(self):
+        with self.lock:
+            self.loaded = False
+            self.ids, self.names, self.pending = {}, {}, {}
+
+    def fetch(self, using, **filters):
+        rows = list(self.model.objects.using(using).filter(**filters).values_list('id', 'name'))
+        with self.lock:
+            for pk, name in rows:
+                self.ids[name] = pk
+                self.names[pk] = name
+            self.loaded = self.loaded or not filters
+        return rows
+
+    def insert(self, names, using):
+        def committed():
+            with self.lock:
+                for name in names:
+                    if self.pending.get(name) is committed:
+                        del self.pending[name]
+
+        with self.lock:
+            self.pending.update(dict.fromkeys(names, committed))
+        self.model.objects.using(using).bulk_create([self.model(name=name) for name in names], ignore_conflicts=True)
+        transaction.on_commit(committed, using=using)
+        return self.fetch(using, name__in=names)
+
+    def usable(self, name, using):
+        # A pending name is only safe within the transaction that inserted it, which still holds its callback.
+        committed = self.pending.get(name)
+        return committed is None or any(entry[1] is committed for entry in connections[using].run_on_commit)
+
+    def name_ids(self, names, using=DEFAULT_DB_ALIAS, create=False):
+        """
+        {name: id} of the given names. Unknown names are inserted when create is set and left out otherwise.
+        """
+        if not self.loaded:
+            self.fetch(using)
+        found = {name: self.ids[name] for name in names
+                 if name in self.ids and (not create or self.usable(name, using))}
+        missing = set(names) - set(found)
+        if missing:
+            found.update({name: pk for pk, name in self.fetch(using, name__in=missing)})
+            missing -= set(found)
+        if missing and create:
+            found.update({name: pk for pk, name in self.insert(sorted(missing), using)})
+        return found
+
+    def id_names(self, ids, using=DEFAULT_DB_ALIAS):
+        """
+        {id: name} of the given ids, leaving out ids that are not in the table.
+        """
+        if not self.loaded:
+            self.fetch(using)
+        found = {pk: self.names[pk] for pk in ids if pk in self.names}
+        missing = set(ids) - set(found)
+        if missing:
+            found.update(self.fetch(using, id__in=missing))
+        return found
+
+
+name_lookups = {}
+
+
+def name_lookup(label):
+    return name_lookups.setdefault(label, NameLookup(label))
+
+
+class NameIdField(models.SmallIntegerField):
+    """
+    Base field of NameArrayField: an id of the lookup table, which lookups such as __overlap and __contains may
+    also be given by name.
+    """
+
+    def __init__(self, to, **kwargs):
+        self.to = to
+        super().__init__(**kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['to'] = self.to
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        # Model values are names; the integer range only applies to the stored ids.
+        return []
+
+    def to_python(self, value):
+        return value
+
+    def get_prep_value(self, value):
+        if isinstance(value, str):
+            return name_lookup(self.to).name_ids([value]).get(value, UNKNOWN_ID)
+        return super().get_prep_value(value)
+
+
+class NameArrayField(ArrayField):
+    """
+    Array of names stored as the smallint ids of a lookup table. Models, querysets, forms and serializers see the
+    names; only the database holds the ids, which keeps rows, GIN indexes and facet scans small.
+    """
+
+    def __init__(self, to, **kwargs):
+        self.to = to
+        kwargs['base_field'] = NameIdField(to)
+        super().__init__(**kwargs)
+
+    @property
+    def lookup(self):
+        return name_lookup(self.to)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop('base_field')
+        kwargs['to'] = self.to
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        names = self.lookup.id_names(value, connection.alias)
+        return [names[pk] for pk in value if pk in names]
+
+    def get_db_prep_save(self, value, connection):
+        if isinstance(value, (list, tuple)):
+            ids = self.lookup.name_ids(value, connection.alias, create=True)
+            value = [ids[name] for name in value]
+        return super().get_db_prep_save(value, connection)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': SimpleArrayField, 'base_field': forms.CharField(), **kwargs})
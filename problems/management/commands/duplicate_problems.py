@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from problems.models import Problem, ProblemSignature
+from problems.similarity import DUPLICATE_THRESHOLD
+
+
+class Command(BaseCommand):
+    help = ('Report clusters of near-duplicate problems across the catalog, found by comparing the problems that '
+            'share an LSH band of their question text signatures.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DUPLICATE_THRESHOLD,
+                            help='Smallest estimated question text similarity counted as a duplicate.')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every signature first.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            ProblemSignature.objects.refresh()
+        clusters = ProblemSignature.objects.duplicate_clusters(options['threshold'])
+        names = dict(Problem.objects.filter(pk__in=[pk for cluster in clusters for pk in cluster]).values_list(
+            'id', 'name'))
+        for number, cluster in enumerate(clusters, 1):
+            self.stdout.write(f'Cluster {number} ({len(cluster)} problems):')
+            for pk in cluster:
+                self.stdout.write(f'  {pk}: {names.get(pk, "")}')
+        duplicates = sum(len(cluster) for cluster in clusters)
+        self.stdout.write(f'Found {len(clusters)} clusters of {duplicates} near-duplicate problems.')
@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.serializers import ProblemSerializer
+from problems.models import Problem
+
+LIST_FIELDS = ('tags', 'companies')
+
+
+def read_jsonl(file):
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_number, error
+
+
+def read_csv(file):
+    # List columns hold comma-separated values, like the company/tags filters of the API.
+    for line_number, row in enumerate(csv.DictReader(file), start=2):
+        for name in LIST_FIELDS:
+            if name in row:
+                row[name] = [value.strip() for value in (row[name] or '').split(',') if value.strip()]
+        if not row.get('problem_link'):
+            row.pop('problem_link', None)
+        yield line_number, row
+
+
+class Command(BaseCommand):
+    help = 'Stream problems from a JSONL or CSV file into the catalog, upserting by name in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--rejects', help='Write rejected rows with their errors to this JSONL file.')
+
+    def handle(self, *args, **options):
+        path, batch_size = options['path'], options['batch_size']
+        file_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        readers = {'jsonl': read_jsonl, 'ndjson': read_jsonl, 'csv': read_csv}
+        if file_format not in readers:
+            raise CommandError(f'Unknown format {file_format!r}, pass --format jsonl or --format csv.')
+        rejects = open(options['rejects'], 'w') if options['rejects'] else None
+        start = time.monotonic()
+        rows = created = updated = rejected = 0
+        batch = []
+        try:
+            with open(path, newline='') as file:
+                for line_number, row in readers[file_format](file):
+                    rows += 1
+                    data, errors = self.validate(row)
+                    if errors:
+                        rejected += 1
+                        self.reject(line_number, row, errors, rejects)
+                        continue
+                    batch.append(Problem(**data))
+                    if len(batch) >= batch_size:
+                        created, updated = self.flush(batch, created, updated)
+                        batch = []
+                        self.report(rows, created, updated, rejected, start)
+            created, updated = self.flush(batch, created, updated)
+        finally:
+            if rejects is not None:
+                rejects.close()
+        self.report(rows, created, updated, rejected, start, ending='\n')
+
+    @staticmethod
+    def validate(row):
+        if not isinstance(row, dict):
+            return None, {'non_field_errors': [str(row)]}
+        serializer = ProblemSerializer(data=row)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        return serializer.validated_data, None
+
+    def reject(self, line_number, row, errors, rejects):
+        self.stderr.write(f'line {line_number}: {json.dumps(errors)}')
+        if rejects is not None:
+            row = row if isinstance(row, dict) else None
+            rejects.write(json.dumps({'line': line_number, 'row': row, 'errors': errors}) + '\n')
+
+    @staticmethod
+    def flush(batch, created, updated):
+        if batch:
+            batch_created, batch_updated = Problem.objects.upsert_by_name(batch)
+            created, updated = created + batch_created, updated + batch_updated
+        return created, updated
+
+    def report(self, rows, created, updated, rejected, start, ending='\r'):
+        elapsed = time.monotonic() - start
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{rows} rows: {created} created, {updated} updated, {rejected} rejected ({rate:.0f} rows/sec)',
+            ending=ending)
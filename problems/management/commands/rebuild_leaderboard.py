@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from problems.models import UserScore
+
+
+class Command(BaseCommand):
+    help = 'Recount every user\'s leaderboard scores and rank trees from their progress.'
+
+    def handle(self, *args, **options):
+        UserScore.objects.rebuild()
+        users = UserScore.objects.filter(scope='').count()
+        scopes = UserScore.objects.values('scope').distinct().count()
+        self.stdout.write(f'Ranked {users} users across {scopes} leaderboards.')
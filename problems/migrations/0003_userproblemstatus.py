@@ -0,0 +1,71 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Carry the per-user progress arrays over into the progress table. A problem listed in several arrays keeps the
+# status the old serializer reported first (confident, then solved, then tried); ids of deleted problems are dropped.
+COPY_PROGRESS_ARRAYS = """
+INSERT INTO problems_userproblemstatus (user_id, problem_id, status, created_at, updated_at)
+SELECT DISTINCT ON (u.id, p.id) u.id, p.id, s.status, now(), now()
+FROM users_user u
+CROSS JOIN LATERAL (
+    SELECT unnest(u.confident_problems) AS problem_id, 'confident' AS status, 1 AS priority
+    UNION ALL
+    SELECT unnest(u.solved_problems), 'solved', 2
+    UNION ALL
+    SELECT unnest(u.tried_problems), 'tried', 3
+) s
+JOIN problems_problem p ON p.id = s.problem_id
+ORDER BY u.id, p.id, s.priority
+"""
+
+RESTORE_PROGRESS_ARRAYS = """
+UPDATE users_user u SET
+    confident_problems = ARRAY(
+        SELECT problem_id FROM problems_userproblemstatus WHERE user_id = u.id AND status = 'confident'),
+    solved_problems = ARRAY(
+        SELECT problem_id FROM problems_userproblemstatus WHERE user_id = u.id AND status = 'solved'),
+    tried_problems = ARRAY(
+        SELECT problem_id FROM problems_userproblemstatus WHERE user_id = u.id AND status = 'tried')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0001_initial'),
+        ('problems', '0002_problem_problem_link'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProblemStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(
+                    choices=[('tried', 'Tried'), ('solved', 'Solved'), ('confident', 'Confident')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress',
+                                              to='problems.problem')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE,
+                                           related_name='problem_statuses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Problem Status',
+                'verbose_name_plural': 'User Problem Statuses',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userproblemstatus',
+            index=models.Index(fields=['user', 'status'], name='progress_user_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userproblemstatus',
+            constraint=models.UniqueConstraint(fields=('user', 'problem'), name='unique_user_problem_status'),
+        ),
+        migrations.RunSQL(COPY_PROGRESS_ARRAYS, RESTORE_PROGRESS_ARRAYS),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('problems', '0003_userproblemstatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressSyncBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=64)),
+                ('applied', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='progress_sync_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Progress Sync Batch',
+                'verbose_name_plural': 'Progress Sync Batches',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='progresssyncbatch',
+            constraint=models.UniqueConstraint(fields=('user', 'batch_id'), name='unique_user_sync_batch'),
+        ),
+    ]
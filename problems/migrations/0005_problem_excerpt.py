@@ -0,0 +1,33 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:10
+
+from django.db import migrations, models
+
+from problems.utils import make_excerpt
+
+
+def fill_excerpts(apps, schema_editor):
+    Problem = apps.get_model('problems', 'Problem')
+    problems = []
+    for problem in Problem.objects.only('id', 'question_html').iterator(chunk_size=500):
+        problem.excerpt = make_excerpt(problem.question_html)
+        problems.append(problem)
+        if len(problems) == 500:
+            Problem.objects.bulk_update(problems, ['excerpt'])
+            problems = []
+    Problem.objects.bulk_update(problems, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0004_progresssyncbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from problems.search import search_vector
+
+
+def fill_search_vectors(apps, schema_editor):
+    Problem = apps.get_model('problems', 'Problem')
+    Problem.objects.update(search_vector=search_vector())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0005_problem_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='problem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='problem_search_vector_idx'),
+        ),
+    ]
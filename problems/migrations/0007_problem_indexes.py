@@ -0,0 +1,30 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:30
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0006_problem_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='problem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='problem_tags_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['companies'], name='problem_companies_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['-acceptance', 'name'], name='problem_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['difficulty', '-acceptance', 'name'], name='problem_difficulty_order_idx'),
+        ),
+    ]
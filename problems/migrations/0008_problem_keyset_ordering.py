@@ -0,0 +1,33 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0007_problem_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='problem',
+            options={'ordering': ['-acceptance', 'name', 'id'], 'verbose_name': 'Problem', 'verbose_name_plural': 'Problems'},
+        ),
+        migrations.RemoveIndex(
+            model_name='problem',
+            name='problem_ordering_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='problem',
+            name='problem_difficulty_order_idx',
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['-acceptance', 'name', 'id'], name='problem_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['difficulty', '-acceptance', 'name', 'id'], name='problem_difficulty_order_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:50
+
+from django.db import migrations, models
+
+
+BUILD_FACET_COUNTS = """
+INSERT INTO problems_problemfacetcount (facet, value, count)
+SELECT 'difficulty', difficulty, count(*) FROM problems_problem GROUP BY difficulty
+UNION ALL
+SELECT 'company', value, count(DISTINCT id) FROM problems_problem, unnest(companies) value GROUP BY value
+UNION ALL
+SELECT 'tag', value, count(DISTINCT id) FROM problems_problem, unnest(tags) value GROUP BY value
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0008_problem_keyset_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(
+                    choices=[('difficulty', 'Difficulty'), ('company', 'Company'), ('tag', 'Tag')], max_length=10)),
+                ('value', models.CharField(max_length=1023)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Problem Facet Count',
+                'verbose_name_plural': 'Problem Facet Counts',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='problemfacetcount',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='unique_problem_facet_value'),
+        ),
+        migrations.RunSQL(BUILD_FACET_COUNTS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.0.4 on 2026-10-18 09:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+from problems.utils import content_hash
+
+CONTENT_FIELDS = (
+    'name', 'acceptance', 'difficulty', 'question_html', 'solution_html', 'problem_link', 'tags', 'companies')
+
+
+def fill_content_hashes(apps, schema_editor):
+    Problem = apps.get_model('problems', 'Problem')
+    problems = []
+    for problem in Problem.objects.only('id', *CONTENT_FIELDS).iterator(chunk_size=500):
+        values = {name: getattr(problem, name) for name in CONTENT_FIELDS}
+        values['acceptance'] = f"{Decimal(str(values['acceptance'])):.2f}"
+        problem.content_hash = content_hash(values)
+        problems.append(problem)
+        if len(problems) == 500:
+            Problem.objects.bulk_update(problems, ['content_hash'])
+            problems = []
+    Problem.objects.bulk_update(problems, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0009_problemfacetcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+    ]
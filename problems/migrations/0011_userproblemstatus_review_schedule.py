@@ -0,0 +1,54 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+# Schedule existing progress as if each mark had been a first SM-2 review at its last update: tried counts as a
+# failed review (quality 2), solved as quality 4 and confident as quality 5, all due again a day later.
+SCHEDULE_EXISTING_PROGRESS = """
+UPDATE problems_userproblemstatus SET
+    repetitions = CASE status WHEN 'tried' THEN 0 ELSE 1 END,
+    interval_days = 1,
+    ease_factor = CASE status WHEN 'tried' THEN 2.18 WHEN 'solved' THEN 2.5 ELSE 2.6 END,
+    reviewed_at = updated_at,
+    due_at = updated_at + interval '1 day'
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0010_problem_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userproblemstatus',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userproblemstatus',
+            name='ease_factor',
+            field=models.FloatField(default=2.5),
+        ),
+        migrations.AddField(
+            model_name='userproblemstatus',
+            name='interval_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userproblemstatus',
+            name='repetitions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userproblemstatus',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunSQL(SCHEDULE_EXISTING_PROGRESS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='userproblemstatus',
+            index=models.Index(fields=['user', 'due_at'], include=('problem',), name='progress_user_due_idx'),
+        ),
+    ]
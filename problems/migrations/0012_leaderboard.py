@@ -0,0 +1,84 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:32
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from problems.leaderboard import rank_tree_path
+
+# Solved problems are worth one point and confident ones two, overall and for each company of the problem.
+COUNT_SCORES = """
+INSERT INTO problems_userscore (user_id, scope, score)
+SELECT s.user_id, scope, sum(CASE s.status WHEN 'solved' THEN 1 WHEN 'confident' THEN 2 ELSE 0 END)
+FROM problems_userproblemstatus s
+JOIN problems_problem p ON p.id = s.problem_id,
+unnest(ARRAY['']::varchar[] || p.companies) scope
+GROUP BY s.user_id, scope
+HAVING sum(CASE s.status WHEN 'solved' THEN 1 WHEN 'confident' THEN 2 ELSE 0 END) > 0
+"""
+
+
+def fill_leaderboard(apps, schema_editor):
+    LeaderboardNode = apps.get_model('problems', 'LeaderboardNode')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(COUNT_SCORES)
+        cursor.execute('SELECT scope, score, count(*) FROM problems_userscore GROUP BY scope, score')
+        nodes = Counter()
+        for scope, score, users in cursor.fetchall():
+            for node in rank_tree_path(score):
+                nodes[scope, node] += users
+    LeaderboardNode.objects.bulk_create([
+        LeaderboardNode(scope=scope, node=node, users=users) for (scope, node), users in nodes.items()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('problems', '0011_userproblemstatus_review_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(blank=True, max_length=1023)),
+                ('node', models.IntegerField()),
+                ('users', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Leaderboard Node',
+                'verbose_name_plural': 'Leaderboard Nodes',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(blank=True, max_length=1023)),
+                ('score', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Score',
+                'verbose_name_plural': 'User Scores',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardnode',
+            constraint=models.UniqueConstraint(fields=('scope', 'node'), name='unique_leaderboard_node'),
+        ),
+        migrations.AddIndex(
+            model_name='userscore',
+            index=models.Index(fields=['scope', '-score', 'user'], name='score_scope_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userscore',
+            constraint=models.UniqueConstraint(fields=('scope', 'user'), name='unique_scope_user_score'),
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.0.4 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+import problems.lookups
+from constants import COMPANIES
+
+# The known companies first, in their listed order, then every other name found on problems.
+FILL_LOOKUPS = [
+    ("""
+     INSERT INTO problems_company (name)
+     SELECT name FROM unnest(%s::varchar[]) WITH ORDINALITY c(name, position) ORDER BY position
+     ON CONFLICT (name) DO NOTHING
+     """, [COMPANIES]),
+    """
+    INSERT INTO problems_company (name) SELECT DISTINCT unnest(companies) FROM problems_problem ORDER BY 1
+    ON CONFLICT (name) DO NOTHING
+    """,
+    """
+    INSERT INTO problems_tag (name) SELECT DISTINCT unnest(tags) FROM problems_problem ORDER BY 1
+    ON CONFLICT (name) DO NOTHING
+    """,
+]
+
+
+def convert_column(column, table, source_type, target_type, source_key, target_key):
+    """
+    Replace the array column by one holding the matching target_key of table for each source_key value, keeping the
+    order of the elements, and rebuild its GIN index.
+    """
+    return f"""
+    ALTER TABLE problems_problem ADD COLUMN {column}_new {target_type}[];
+    UPDATE problems_problem p SET {column}_new = ARRAY(
+        SELECT l.{target_key} FROM unnest(p.{column}::{source_type}[]) WITH ORDINALITY v(value, position)
+        JOIN {table} l ON l.{source_key} = v.value ORDER BY v.position
+    );
+    ALTER TABLE problems_problem DROP COLUMN {column};
+    ALTER TABLE problems_problem RENAME COLUMN {column}_new TO {column};
+    ALTER TABLE problems_problem ALTER COLUMN {column} SET NOT NULL;
+    CREATE INDEX problem_{column}_idx ON problems_problem USING gin ({column});
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0012_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=1023, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Company',
+                'verbose_name_plural': 'Companies',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=1023, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Tag',
+                'verbose_name_plural': 'Tags',
+            },
+        ),
+        migrations.RunSQL(FILL_LOOKUPS, migrations.RunSQL.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    convert_column('companies', 'problems_company', 'varchar', 'smallint', 'name', 'id')
+                    + convert_column('tags', 'problems_tag', 'varchar', 'smallint', 'name', 'id'),
+                    convert_column('companies', 'problems_company', 'smallint', 'varchar(1023)', 'id', 'name')
+                    + convert_column('tags', 'problems_tag', 'smallint', 'varchar(1023)', 'id', 'name'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='problem',
+                    name='companies',
+                    field=problems.lookups.NameArrayField(default=list, size=None, to='problems.Company'),
+                ),
+                migrations.AlterField(
+                    model_name='problem',
+                    name='tags',
+                    field=problems.lookups.NameArrayField(default=list, size=None, to='problems.Tag'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.0.4 on 2026-10-18 11:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from problems.similarity import band_hashes, minhash, signature_bytes
+
+
+def fill_signatures(apps, schema_editor):
+    Problem = apps.get_model('problems', 'Problem')
+    ProblemSignature = apps.get_model('problems', 'ProblemSignature')
+    ProblemBand = apps.get_model('problems', 'ProblemBand')
+    signatures, bands = [], []
+    for pk, question_html in Problem.objects.values_list('id', 'question_html').iterator(chunk_size=2000):
+        signature = minhash(question_html)
+        if signature is not None:
+            signatures.append(ProblemSignature(problem_id=pk, minhash=signature_bytes(signature)))
+            bands.extend(ProblemBand(problem_id=pk, band_hash=value) for value in band_hashes(signature))
+    ProblemSignature.objects.bulk_create(signatures, batch_size=2000)
+    ProblemBand.objects.bulk_create(bands, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0013_company_tag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemSignature',
+            fields=[
+                ('problem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='problems.problem')),
+                ('minhash', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Problem Signature',
+                'verbose_name_plural': 'Problem Signatures',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProblemBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band_hash', models.BigIntegerField()),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='problems.problem')),
+            ],
+            options={
+                'verbose_name': 'Problem Band',
+                'verbose_name_plural': 'Problem Bands',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='problemband',
+            index=models.Index(fields=['band_hash', 'problem'], name='problem_band_hash_idx'),
+        ),
+        migrations.RunPython(fill_signatures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0014_problemsignature'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userproblemstatus',
+            name='status',
+            field=models.CharField(blank=True, choices=[('tried', 'Tried'), ('solved', 'Solved'), ('confident', 'Confident')], max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0015_userproblemstatus_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['updated_at'], name='problem_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-18 13:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Until now updated_at held the client's timestamp of synced changes, which last-writer-wins compared.
+COPY_CLIENT_TIMESTAMPS = 'UPDATE problems_userproblemstatus SET client_updated_at = updated_at'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0016_problem_updated_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userproblemstatus',
+            name='client_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunSQL(COPY_CLIENT_TIMESTAMPS, migrations.RunSQL.noop),
+    ]
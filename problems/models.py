@@ -1,8 +1,123 @@
-from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from collections import Counter
+from decimal import Decimal
 
-from constants import DIFFICULTY_CHOICES
+import numpy as np
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models import Case, F, FilteredRelation, Q, Sum, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from constants import DIFFICULTY_CHOICES, FACET_CHOICES, PROGRESS_STATUS_CHOICES, UNTRIED
+from job_prep.routers import read_from_primary
 from users.models import User
+from .cache import invalidate_user_stats
+from .leaderboard import LEADERBOARD_POINTS, points_sql, rank_tree_path, rank_tree_prefix
+from .lookups import NameArrayField
+from .reviews import INITIAL_EASE_FACTOR, first_schedule_sql, quality_sql, schedule_sql
+from .search import search_vector
+from .similarity import (
+    band_hashes, duplicate_clusters, estimated_similarity, facet_set, minhash, overlap, signature_array,
+    signature_bytes, similarity_score,
+)
+from .utils import content_hash, make_excerpt
+
+
+def facet_values(difficulty, tags, companies):
+    """
+    The (facet, value) pairs a problem is counted under.
+    """
+    return {('difficulty', difficulty), *(('company', c) for c in companies), *(('tag', t) for t in tags)}
+
+
+# Sent with the primary keys of problems written by bulk statements, which bypass the model save/delete signals.
+problems_bulk_saved = Signal()
+
+
+class Company(models.Model):
+    """
+    Lookup table of company names, referenced from Problem.companies by small integer id.
+    """
+    id = models.SmallAutoField(primary_key=True)
+    name = models.CharField(max_length=1023, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name_plural = 'Companies'
+        verbose_name = 'Company'
+
+
+class Tag(models.Model):
+    """
+    Lookup table of tag names, referenced from Problem.tags by small integer id.
+    """
+    id = models.SmallAutoField(primary_key=True)
+    name = models.CharField(max_length=1023, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name_plural = 'Tags'
+        verbose_name = 'Tag'
+
+
+class ProblemQuerySet(models.QuerySet):
+    def update_search_vector(self):
+        return self.update(search_vector=search_vector())
+
+    def upsert_by_name(self, problems):
+        """
+        Insert unsaved problems, or update the stored problem with the same name, using bulk statements. Keeps the
+        derived columns, the search vectors, the facet rollup and the company leaderboards in step like save() and the
+        model signals do for single problems. Returns the numbers of created and updated problems.
+        """
+        self._for_write = True
+        problems = list({problem.name: problem for problem in problems}.values())
+        stored = {row['name']: row for row in self.filter(name__in=[problem.name for problem in problems]).values(
+            'id', 'name', 'difficulty', 'tags', 'companies')}
+        now = timezone.now()
+        created, updated, old_facet_values, new_facet_values, moved = [], [], [], [], {}
+        for problem in problems:
+            problem.refresh_derived_fields()
+            problem.updated_at = now
+            new_facet_values.extend(problem.facet_values)
+            row = stored.get(problem.name)
+            if row is None:
+                created.append(problem)
+            else:
+                problem.id = row['id']
+                old_facet_values.extend(facet_values(row['difficulty'], row['tags'], row['companies']))
+                updated.append(problem)
+                if set(row['companies']) != set(problem.companies):
+                    moved[problem.id] = row['companies']
+        with transaction.atomic(using=self.db):
+            self.bulk_create(created)
+            self.bulk_update(updated, [*Problem.content_fields, 'excerpt', 'content_hash', 'updated_at'])
+            pks = [problem.pk for problem in created + updated]
+            self.filter(pk__in=pks).update_search_vector()
+            ProblemFacetCount.objects.using(self.db).apply(old_facet_values, new_facet_values)
+            UserScore.objects.using(self.db).refresh_problems(moved)
+        problems_bulk_saved.send(sender=Problem, pks=pks)
+        return len(created), len(updated)
+
+    def with_status(self, user):
+        """
+        Annotate each problem with the user's status label, resolved through a single LEFT JOIN on the progress table.
+        """
+        if not user.is_authenticated:
+            return self.annotate(status=Value(UNTRIED), status_updated_at=Value(None, models.DateTimeField()))
+        return self.annotate(
+            user_progress=FilteredRelation('progress', condition=Q(progress__user=user)),
+            status=Case(
+                *[When(user_progress__status=key, then=Value(label)) for key, label in PROGRESS_STATUS_CHOICES],
+                default=Value(UNTRIED),
+            ),
+            status_updated_at=F('user_progress__updated_at'),
+        )
 
 
 class Problem(models.Model):
@@ -12,13 +127,620 @@ class Problem(models.Model):
     question_html = models.TextField()
     solution_html = models.TextField()
     problem_link = models.URLField(max_length=1023, blank=True, null=True)
-    tags = ArrayField(models.CharField(max_length=1023), default=list)
-    companies = ArrayField(models.CharField(max_length=1023), default=list)
+    # Names in Python, smallint ids of the Tag and Company tables in the database.
+    tags = NameArrayField('problems.Tag', default=list)
+    companies = NameArrayField('problems.Company', default=list)
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    content_fields = (
+        'name', 'acceptance', 'difficulty', 'question_html', 'solution_html', 'problem_link', 'tags', 'companies')
+
+    objects = ProblemQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    @property
+    def facet_values(self):
+        return facet_values(self.difficulty, self.tags, self.companies)
+
+    def compute_content_hash(self):
+        values = {name: getattr(self, name) for name in self.content_fields}
+        values['acceptance'] = f"{Decimal(str(values['acceptance'])):.2f}"
+        return content_hash(values)
+
+    def refresh_derived_fields(self):
+        # The plain-text excerpt lets list pages skip the HTML, and the content hash backs ETags and the shared
+        # response cache.
+        self.excerpt = make_excerpt(self.question_html)
+        self.content_hash = self.compute_content_hash()
+
+    def save(self, *args, **kwargs):
+        self.refresh_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'excerpt', 'content_hash', 'updated_at'}
+        super().save(*args, **kwargs)
+        if update_fields is None or {'name', 'question_html'} & set(update_fields):
+            Problem.objects.filter(pk=self.pk).update_search_vector()
+
     class Meta:
-        ordering = ['-acceptance', 'name']
+        ordering = ['-acceptance', 'name', 'id']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='problem_search_vector_idx'),
+            GinIndex(fields=['tags'], name='problem_tags_idx'),
+            GinIndex(fields=['companies'], name='problem_companies_idx'),
+            models.Index(fields=['-acceptance', 'name', 'id'], name='problem_ordering_idx'),
+            models.Index(fields=['difficulty', '-acceptance', 'name', 'id'], name='problem_difficulty_order_idx'),
+            models.Index(fields=['updated_at'], name='problem_updated_at_idx'),
+        ]
         verbose_name_plural = 'Problems'
         verbose_name = 'Problem'
+
+
+class UserProblemStatusQuerySet(models.QuerySet):
+    def mark(self, user, problem_id, status):
+        """
+        Set the user's status for a problem in a single statement, or clear it when status is not one of
+        PROGRESS_STATUS_CHOICES. Returns the new status label, or None if the problem does not exist.
+        """
+        self._for_write = True
+        labels = dict(PROGRESS_STATUS_CHOICES)
+        # The upsert only writes the progress row, and ON CONFLICT serializes concurrent marks on the unique
+        # (user, problem) constraint, so the last one wins instead of being lost. Every mark that changes the status
+        # also counts as a review of the problem and reschedules it.
+        if status in labels:
+            insert, update = self.schedule_assignments('c.status', 'now()')
+        else:
+            status, (insert, update) = None, self.clear_assignments()
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (
+                    user_id, problem_id, status, created_at, updated_at, client_updated_at, {', '.join(insert)}
+                )
+                SELECT %s, p.id, c.status, now(), now(), now(), {', '.join(insert.values())}
+                FROM {Problem._meta.db_table} p, (SELECT %s::varchar AS status) c
+                WHERE p.id = %s
+                ON CONFLICT (user_id, problem_id) DO UPDATE
+                SET status = EXCLUDED.status, updated_at = EXCLUDED.updated_at,
+                    client_updated_at = EXCLUDED.client_updated_at, {update}
+                RETURNING status
+                """,
+                [user.pk, status, problem_id],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        self.progress_changed(user, [problem_id])
+        return labels.get(row[0], UNTRIED)
+
+    def sync(self, user, changes):
+        """
+        Apply (problem_id, status, timestamp) changes with last-writer-wins: a change only replaces progress that was
+        last written before its timestamp. Unknown statuses clear the progress, keeping the row as a tombstone so that
+        older marks synced later cannot bring it back. Timestamps ahead of the server clock count as now, so one
+        client's clock cannot block every later change. Returns the number of rows changed.
+        """
+        self._for_write = True
+        labels = dict(PROGRESS_STATUS_CHOICES)
+        latest = {}
+        for problem_id, status, timestamp in changes:
+            if problem_id not in latest or latest[problem_id][1] <= timestamp:
+                latest[problem_id] = (status, timestamp)
+        marks = [(problem_id, status, ts) for problem_id, (status, ts) in latest.items() if status in labels]
+        clears = [(problem_id, None, ts) for problem_id, (status, ts) in latest.items() if status not in labels]
+        changed = 0
+        with connections[self.db].cursor() as cursor:
+            for rows, (insert, update) in ((marks, self.schedule_assignments('c.status', 'c.client_updated_at')),
+                                           (clears, self.clear_assignments())):
+                if not rows:
+                    continue
+                problem_ids, statuses, timestamps = zip(*rows)
+                table = self.model._meta.db_table
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (
+                        user_id, problem_id, status, created_at, updated_at, client_updated_at, {', '.join(insert)}
+                    )
+                    SELECT %s, p.id, c.status, now(), now(), c.client_updated_at, {', '.join(insert.values())}
+                    FROM (
+                        SELECT problem_id, status, least(updated_at, clock_timestamp()) AS client_updated_at
+                        FROM unnest(%s::bigint[], %s::varchar[], %s::timestamptz[]) AS u(problem_id, status, updated_at)
+                    ) c
+                    JOIN {Problem._meta.db_table} p ON p.id = c.problem_id
+                    ON CONFLICT (user_id, problem_id) DO UPDATE
+                    SET status = EXCLUDED.status, updated_at = EXCLUDED.updated_at,
+                        client_updated_at = EXCLUDED.client_updated_at, {update}
+                    WHERE {table}.client_updated_at < EXCLUDED.client_updated_at
+                    """,
+                    [user.pk, list(problem_ids), list(statuses), list(timestamps)],
+                )
+                changed += cursor.rowcount
+        if changed:
+            self.progress_changed(user, list(latest))
+        return changed
+
+    def progress_changed(self, user, problem_ids):
+        invalidate_user_stats(user.pk)
+        read_from_primary(user.pk)
+        # The leaderboard is recounted once the change is committed, outside the transaction that wrote it.
+        transaction.on_commit(lambda: UserScore.objects.using(self.db).refresh(user.pk, problem_ids), using=self.db)
+
+    def schedule_assignments(self, status, reviewed_at):
+        """
+        The review schedule of a mark with the given status and time, as {column: SQL} for a new progress row and as
+        the SET list an ON CONFLICT update applies to the existing row. Marking the status the row already has is
+        not a review and keeps its schedule.
+        """
+        table = self.model._meta.db_table
+        insert = first_schedule_sql(quality_sql(status), reviewed_at)
+        update = schedule_sql(f'{table}.repetitions', f'{table}.interval_days', f'{table}.ease_factor',
+                              quality_sql('EXCLUDED.status'), 'EXCLUDED.reviewed_at')
+        return insert, ', '.join(
+            f'{column} = CASE WHEN {table}.status = EXCLUDED.status THEN {table}.{column} ELSE {value} END'
+            for column, value in update.items()
+        )
+
+    def clear_assignments(self):
+        """
+        Like schedule_assignments(), for clearing the status: the tombstone left behind has no schedule.
+        """
+        insert = {'repetitions': '0', 'interval_days': '0', 'ease_factor': str(INITIAL_EASE_FACTOR),
+                  'reviewed_at': 'NULL', 'due_at': 'NULL'}
+        return insert, ', '.join(f'{column} = EXCLUDED.{column}' for column in insert)
+
+    def review(self, user, reviews):
+        """
+        Reschedule the user's progress on each (problem_id, quality) review, quality being the SM-2 grade from 0 to
+        5, in one statement. Problems without progress are skipped. Returns {problem_id: (due_at, interval_days)}.
+        """
+        self._for_write = True
+        latest = dict(reviews)
+        table = self.model._meta.db_table
+        assignments = schedule_sql('t.repetitions', 't.interval_days', 't.ease_factor', 'c.quality', 'now()')
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {table} t SET {', '.join(f'{column} = {value}' for column, value in assignments.items())}
+                FROM unnest(%s::bigint[], %s::integer[]) AS c(problem_id, quality)
+                WHERE t.user_id = %s AND t.problem_id = c.problem_id AND t.status IS NOT NULL
+                RETURNING t.problem_id, t.due_at, t.interval_days
+                """,
+                [list(latest), list(latest.values()), user.pk],
+            )
+            return {problem_id: (due_at, interval_days) for problem_id, due_at, interval_days in cursor.fetchall()}
+
+    def due(self, user, limit, now=None):
+        """
+        [(problem_id, due_at)] of the user's reviews due by now, most overdue first. Reads only the
+        (user, due_at) index, which includes problem_id.
+        """
+        progress = self.filter(user=user, due_at__lte=now or timezone.now()).order_by('due_at', 'problem_id')
+        return list(progress.values_list('problem_id', 'due_at')[:limit])
+
+    def status_map(self, user, problem_ids=None):
+        progress = self.filter(user=user, status__isnull=False)
+        if problem_ids is not None:
+            progress = progress.filter(problem_id__in=problem_ids)
+        return dict(progress.values_list('problem_id', 'status'))
+
+
+class UserProblemStatus(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='problem_statuses', db_index=False)
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='progress')
+    # NULL for a cleared status: the row stays as a tombstone, so older changes synced later cannot bring it back.
+    status = models.CharField(choices=PROGRESS_STATUS_CHOICES, max_length=10, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # When the change was made on the client, capped at the server clock: sync() compares it for last-writer-wins,
+    # while updated_at stays the server write time.
+    client_updated_at = models.DateTimeField(default=timezone.now)
+    # SM-2 review schedule, advanced by every mark and completed review.
+    repetitions = models.PositiveIntegerField(default=0)
+    interval_days = models.PositiveIntegerField(default=0)
+    ease_factor = models.FloatField(default=INITIAL_EASE_FACTOR)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    due_at = models.DateTimeField(null=True, blank=True)
+
+    objects = UserProblemStatusQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.user} - {self.problem}: {self.status}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'problem'), name='unique_user_problem_status'),
+        ]
+        indexes = [
+            models.Index(fields=('user', 'status'), name='progress_user_status_idx'),
+            models.Index(fields=('user', 'due_at'), include=('problem',), name='progress_user_due_idx'),
+        ]
+        verbose_name_plural = 'User Problem Statuses'
+        verbose_name = 'User Problem Status'
+
+
+class ProgressSyncBatch(models.Model):
+    """
+    Records which client sync batches were already applied, so that replaying a batch is a no-op.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress_sync_batches', db_index=False)
+    batch_id = models.CharField(max_length=64)
+    applied = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.user} - {self.batch_id}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'batch_id'), name='unique_user_sync_batch'),
+        ]
+        verbose_name_plural = 'Progress Sync Batches'
+        verbose_name = 'Progress Sync Batch'
+
+
+class ProblemFacetCountQuerySet(models.QuerySet):
+    def rebuild(self):
+        """
+        Recount every facet value of the catalog from scratch.
+        """
+        self._for_write = True
+        table, problems = self.model._meta.db_table, Problem._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(f"""
+                INSERT INTO {table} (facet, value, count)
+                SELECT 'difficulty', difficulty, count(*) FROM {problems} GROUP BY difficulty
+                UNION ALL
+                SELECT 'company', c.name, count(*) FROM {problems} p JOIN {Company._meta.db_table} c
+                ON c.id = ANY(p.companies) GROUP BY c.name
+                UNION ALL
+                SELECT 'tag', t.name, count(*) FROM {problems} p JOIN {Tag._meta.db_table} t
+                ON t.id = ANY(p.tags) GROUP BY t.name
+            """)
+
+    def apply(self, old_values, new_values):
+        """
+        Move problems' contributions from the old to the new (facet, value) pairs, one pair per problem counted.
+        """
+        self._for_write = True
+        deltas = Counter(new_values)
+        deltas.subtract(old_values)
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        table = self.model._meta.db_table
+        facets, values = zip(*deltas)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {table} (facet, value, count)
+                SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::integer[])
+                ON CONFLICT (facet, value) DO UPDATE SET count = {table}.count + EXCLUDED.count
+            """, [list(facets), list(values), list(deltas.values())])
+            cursor.execute(f'DELETE FROM {table} WHERE count <= 0')
+
+
+class ProblemFacetCount(models.Model):
+    """
+    Rollup of how many problems carry each difficulty, company and tag, kept up to date as problems change.
+    """
+    facet = models.CharField(choices=FACET_CHOICES, max_length=10)
+    value = models.CharField(max_length=1023)
+    count = models.IntegerField(default=0)
+
+    objects = ProblemFacetCountQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.facet}: {self.value} ({self.count})'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('facet', 'value'), name='unique_problem_facet_value'),
+        ]
+        verbose_name_plural = 'Problem Facet Counts'
+        verbose_name = 'Problem Facet Count'
+
+
+class UserScoreQuerySet(models.QuerySet):
+    def refresh(self, user_id, problem_ids, companies=()):
+        """
+        Recount the user's leaderboard score overall, for each company of the given problems and for the given
+        companies, moving the user in the rank tree of every scope whose score changed.
+        """
+        self._for_write = True
+        table, problems = self.model._meta.db_table, Problem._meta.db_table
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            # Serializes refreshes of the same user, so concurrent marks cannot both move the user from the old score.
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [user_id])
+            cursor.execute(f"""
+                WITH scopes AS (
+                    SELECT '' AS scope, NULL::smallint AS company_id
+                    UNION SELECT c.name, c.id FROM {problems} p
+                    JOIN {Company._meta.db_table} c ON c.id = ANY(p.companies) WHERE p.id = ANY(%s)
+                    UNION SELECT name, id FROM {Company._meta.db_table} WHERE name = ANY(%s)
+                )
+                SELECT sc.scope, coalesce(old.score, 0), coalesce(sum(u.points), 0)::integer
+                FROM scopes sc
+                LEFT JOIN (
+                    SELECT p.companies, {points_sql('s.status')} AS points
+                    FROM {UserProblemStatus._meta.db_table} s JOIN {problems} p ON p.id = s.problem_id
+                    WHERE s.user_id = %s
+                ) u ON sc.company_id IS NULL OR sc.company_id = ANY(u.companies)
+                LEFT JOIN {table} old ON old.scope = sc.scope AND old.user_id = %s
+                GROUP BY sc.scope, old.score
+            """, [list(problem_ids), list(companies), user_id, user_id])
+            changes = [(scope, old, new) for scope, old, new in cursor.fetchall() if old != new]
+            if not changes:
+                return
+            scores = [(scope, new) for scope, _, new in changes if new > 0]
+            cursor.execute(f"""
+                INSERT INTO {table} (user_id, scope, score) SELECT %s, * FROM unnest(%s::varchar[], %s::integer[])
+                ON CONFLICT (scope, user_id) DO UPDATE SET score = EXCLUDED.score
+            """, [user_id, [scope for scope, _ in scores], [score for _, score in scores]])
+            cursor.execute(f'DELETE FROM {table} WHERE user_id = %s AND scope = ANY(%s)', [
+                user_id, [scope for scope, _, new in changes if new == 0]])
+            nodes = Counter()
+            for scope, old, new in changes:
+                for score, delta in ((old, -1), (new, 1)):
+                    if score > 0:
+                        nodes.update({(scope, node): delta for node in rank_tree_path(score)})
+            LeaderboardNode.objects.using(self.db).apply(nodes)
+
+    def refresh_problems(self, companies):
+        """
+        Once the transaction commits, refresh the scores of every user with points from the problems, given as
+        {problem_id: companies they counted under until now}. Called before the problems are deleted, or after their
+        companies changed.
+        """
+        scorers = {}
+        for user_id, problem_id in UserProblemStatus.objects.using(self.db).filter(
+                problem_id__in=companies, status__in=LEADERBOARD_POINTS).values_list('user_id', 'problem_id'):
+            problem_ids, user_companies = scorers.setdefault(user_id, ([], set()))
+            problem_ids.append(problem_id)
+            user_companies.update(companies[problem_id])
+
+        def refresh():
+            for user_id, (problem_ids, user_companies) in scorers.items():
+                self.refresh(user_id, problem_ids, user_companies)
+
+        if scorers:
+            transaction.on_commit(refresh, using=self.db)
+
+    def remove_user(self, user_id):
+        self._for_write = True
+        nodes = Counter()
+        for scope, score in self.filter(user_id=user_id).values_list('scope', 'score'):
+            nodes.update({(scope, node): -1 for node in rank_tree_path(score)})
+        LeaderboardNode.objects.using(self.db).apply(nodes)
+        self.filter(user_id=user_id).delete()
+
+    def rebuild(self):
+        """
+        Recount every user's scores and the rank trees from the progress table.
+        """
+        self._for_write = True
+        table = self.model._meta.db_table
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(f'DELETE FROM {LeaderboardNode._meta.db_table}')
+            cursor.execute(f"""
+                INSERT INTO {table} (user_id, scope, score)
+                SELECT s.user_id, sc.scope, sum({points_sql('s.status')})
+                FROM {UserProblemStatus._meta.db_table} s
+                JOIN {Problem._meta.db_table} p ON p.id = s.problem_id,
+                LATERAL (
+                    SELECT ''::varchar UNION ALL SELECT name FROM {Company._meta.db_table} WHERE id = ANY(p.companies)
+                ) sc(scope)
+                GROUP BY s.user_id, sc.scope
+                HAVING sum({points_sql('s.status')}) > 0
+            """)
+            cursor.execute(f'SELECT scope, score, count(*) FROM {table} GROUP BY scope, score')
+            nodes = Counter()
+            for scope, score, users in cursor.fetchall():
+                for node in rank_tree_path(score):
+                    nodes[scope, node] += users
+            LeaderboardNode.objects.using(self.db).apply(nodes)
+
+    def rank(self, user_id, scope=''):
+        """
+        The user's score, competition rank (one more than the number of users scoring higher) and the number of
+        users on the leaderboard, read from O(log n) rank tree nodes.
+        """
+        score = self.filter(user_id=user_id, scope=scope).values_list('score', flat=True).first() or 0
+        higher, ranked = list(rank_tree_prefix(score + 1)), list(rank_tree_prefix(1))
+        counts = LeaderboardNode.objects.using(self.db).filter(scope=scope, node__in={*higher, *ranked}).aggregate(
+            higher=Sum('users', filter=Q(node__in=higher)), ranked=Sum('users', filter=Q(node__in=ranked)))
+        return {'score': score, 'rank': (counts['higher'] or 0) + 1, 'users': counts['ranked'] or 0}
+
+    def top(self, limit, scope=''):
+        """
+        [{'rank', 'user_id', 'username', 'score'}] of the best scores, ties sharing a rank.
+        """
+        rows = self.filter(scope=scope).order_by('-score', 'user_id').values_list(
+            'user_id', 'user__username', 'score')[:limit]
+        leaders = []
+        for position, (user_id, username, score) in enumerate(rows, start=1):
+            rank = leaders[-1]['rank'] if leaders and leaders[-1]['score'] == score else position
+            leaders.append({'rank': rank, 'user_id': user_id, 'username': username, 'score': score})
+        return leaders
+
+
+class UserScore(models.Model):
+    """
+    A user's leaderboard points overall (empty scope) and per company, from their solved and confident problems.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scores', db_index=False)
+    scope = models.CharField(max_length=1023, blank=True)
+    score = models.PositiveIntegerField()
+
+    objects = UserScoreQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.user} - {self.scope or "overall"}: {self.score}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('scope', 'user'), name='unique_scope_user_score'),
+        ]
+        indexes = [
+            models.Index(fields=('scope', '-score', 'user'), name='score_scope_rank_idx'),
+        ]
+        verbose_name_plural = 'User Scores'
+        verbose_name = 'User Score'
+
+
+class LeaderboardNodeQuerySet(models.QuerySet):
+    def apply(self, deltas):
+        """
+        Add {(scope, node): delta} to the rank tree counts, locking nodes in a fixed order.
+        """
+        self._for_write = True
+        deltas = sorted((key, delta) for key, delta in deltas.items() if delta)
+        if not deltas:
+            return
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {table} (scope, node, users)
+                SELECT * FROM unnest(%s::varchar[], %s::integer[], %s::integer[])
+                ON CONFLICT (scope, node) DO UPDATE SET users = {table}.users + EXCLUDED.users
+            """, [[scope for (scope, _), _ in deltas], [node for (_, node), _ in deltas],
+                  [delta for _, delta in deltas]])
+
+
+class LeaderboardNode(models.Model):
+    """
+    A node of a scope's Fenwick tree over scores: the number of users whose scores fall in the node's range.
+    """
+    scope = models.CharField(max_length=1023, blank=True)
+    node = models.IntegerField()
+    users = models.IntegerField(default=0)
+
+    objects = LeaderboardNodeQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('scope', 'node'), name='unique_leaderboard_node'),
+        ]
+        verbose_name_plural = 'Leaderboard Nodes'
+        verbose_name = 'Leaderboard Node'
+
+
+class ProblemSignatureQuerySet(models.QuerySet):
+    def refresh(self, pks=None):
+        """
+        Recompute the MinHash signatures and LSH bands of the given problems' question texts, or of every problem.
+        """
+        self._for_write = True
+        problems = Problem.objects.using(self.db).order_by('id').values_list('id', 'question_html')
+        bands = ProblemBand.objects.using(self.db)
+        if pks is not None:
+            problems, bands = problems.filter(pk__in=pks), bands.filter(problem_id__in=pks)
+        with transaction.atomic(using=self.db):
+            bands.delete()
+            (self if pks is None else self.filter(problem_id__in=pks)).delete()
+            signatures, band_rows = [], []
+            for pk, question_html in problems.iterator(chunk_size=2000):
+                signature = minhash(question_html)
+                if signature is None:
+                    continue
+                signatures.append(ProblemSignature(problem_id=pk, minhash=signature_bytes(signature)))
+                band_rows.extend((pk, value) for value in band_hashes(signature))
+                if len(signatures) >= 2000:
+                    self.insert_signatures(signatures, band_rows)
+                    signatures, band_rows = [], []
+            self.insert_signatures(signatures, band_rows)
+
+    def insert_signatures(self, signatures, band_rows):
+        self.bulk_create(signatures)
+        if band_rows:
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(f"""
+                    INSERT INTO {ProblemBand._meta.db_table} (problem_id, band_hash)
+                    SELECT * FROM unnest(%s::integer[], %s::bigint[])
+                """, [[pk for pk, _ in band_rows], [value for _, value in band_rows]])
+
+    def similar(self, problem_id, limit):
+        """
+        Up to limit (problem_id, score) pairs, best first, of the problems sharing an LSH band with the problem. The
+        score blends the MinHash estimate of their question text similarity with their tag and company overlap.
+        None if the problem does not exist.
+        """
+        table, bands = self.model._meta.db_table, ProblemBand._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            # The candidates, the problem itself included, come from the band hash index.
+            cursor.execute(f"""
+                SELECT s.problem_id, s.minhash FROM {table} s WHERE s.problem_id IN (
+                    SELECT c.problem_id FROM {bands} b JOIN {bands} c ON c.band_hash = b.band_hash
+                    WHERE b.problem_id = %s
+                )
+            """, [problem_id])
+            signatures = {pk: signature_array(value) for pk, value in cursor.fetchall()}
+        facets = {
+            pk: facet_set(tags, companies) for pk, tags, companies in Problem.objects.using(self.db).filter(
+                pk__in=[problem_id, *signatures]).values_list('id', 'tags', 'companies')
+        }
+        if problem_id not in facets:
+            return None
+        signature = signatures.pop(problem_id, None)
+        if signature is None or not signatures:
+            return []
+        ids = list(signatures)
+        texts = estimated_similarity(signature, np.vstack([signatures[pk] for pk in ids])).tolist()
+        scores = [
+            (pk, similarity_score(text, overlap(facets[problem_id], facets.get(pk, set()))))
+            for pk, text in zip(ids, texts)
+        ]
+        return sorted(scores, key=lambda item: (-item[1], item[0]))[:limit]
+
+    def duplicate_clusters(self, threshold):
+        """
+        Groups of problem ids whose question texts are estimated at least threshold similar, largest first. Only the
+        problems of the band buckets holding more than one problem are loaded and compared.
+        """
+        table, bands = self.model._meta.db_table, ProblemBand._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f"""
+                SELECT array_agg(problem_id ORDER BY problem_id) FROM {bands}
+                GROUP BY band_hash HAVING count(*) > 1
+            """)
+            buckets = [bucket for bucket, in cursor.fetchall()]
+            cursor.execute(f'SELECT problem_id, minhash FROM {table} WHERE problem_id = ANY(%s)',
+                           [sorted({pk for bucket in buckets for pk in bucket})])
+            signatures = {pk: signature_array(value) for pk, value in cursor.fetchall()}
+        return duplicate_clusters(signatures, buckets, threshold)
+
+
+class ProblemSignature(models.Model):
+    """
+    MinHash signature of a problem's question text, kept up to date with its LSH bands as problems change.
+    """
+    problem = models.OneToOneField(Problem, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.BinaryField()
+
+    objects = ProblemSignatureQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'Problem Signatures'
+        verbose_name = 'Problem Signature'
+
+
+class ProblemBand(models.Model):
+    """
+    The hash of one LSH band of a problem's signature. Problems sharing a band hash are the candidates for similar
+    problems and duplicates.
+    """
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='bands')
+    band_hash = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('band_hash', 'problem'), name='problem_band_hash_idx'),
+        ]
+        verbose_name_plural = 'Problem Bands'
+        verbose_name = 'Problem Band'
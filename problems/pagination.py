@@ -0,0 +1,83 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+KEYSET_ORDERING = ('-acceptance', 'name', 'id')
+
+
+def encode_cursor(problem, reverse=False):
+    # Pages hold model instances, or dictionaries on the API's values() read path.
+    if isinstance(problem, dict):
+        position = [str(problem['acceptance']), problem['name'], problem['id']]
+    else:
+        position = [str(problem.acceptance), problem.name, problem.id]
+    return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': reverse}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns ((acceptance, name, id), reverse) for a cursor made by encode_cursor, raising ValueError if it is invalid.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        acceptance, name, pk = data['p']
+        return (Decimal(acceptance), str(name), int(pk)), bool(data['r'])
+    except Exception as error:
+        raise ValueError('Invalid cursor') from error
+
+
+class KeysetPage:
+    """
+    A page of problems after (or, for reverse cursors, before) the position encoded in the cursor, ordered by
+    KEYSET_ORDERING. Every page is a bounded index range scan, no matter how deep it is, and no count is needed.
+    """
+
+    def __init__(self, queryset, cursor, page_size):
+        self.page_size = page_size
+        position, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if position is not None:
+            queryset = queryset.filter(self.after(*position) if not reverse else self.before(*position))
+        ordering = KEYSET_ORDERING if not reverse else ('acceptance', '-name', '-id')
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+        self.object_list = rows
+        if not rows:
+            self.next_cursor = self.previous_cursor = None
+        elif reverse:
+            self.next_cursor = encode_cursor(rows[-1])
+            self.previous_cursor = encode_cursor(rows[0], reverse=True) if has_more else None
+        else:
+            self.next_cursor = encode_cursor(rows[-1]) if has_more else None
+            self.previous_cursor = encode_cursor(rows[0], reverse=True) if position is not None else None
+
+    @staticmethod
+    def after(acceptance, name, pk):
+        # The leading acceptance bound lets the ordering index start the scan at the cursor position.
+        return Q(acceptance__lte=acceptance) & (
+                Q(acceptance__lt=acceptance) | Q(name__gt=name) | Q(name=name, id__gt=pk))
+
+    @staticmethod
+    def before(acceptance, name, pk):
+        return Q(acceptance__gte=acceptance) & (
+                Q(acceptance__gt=acceptance) | Q(name__lt=name) | Q(name=name, id__lt=pk))
+
+
+def estimated_count(queryset):
+    """
+    Row count the planner estimates for the queryset, from table statistics instead of a COUNT(*) scan.
+    """
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
@@ -0,0 +1,155 @@
+import numpy as np
+
+from .catalog_index import CatalogIndexCache
+from .models import UserProblemStatus
+
+RECOMMENDATIONS_VERSION_KEY = 'recommendations:version'
+# How much each status counts towards the user's company/tag profile.
+STATUS_WEIGHTS = {'tried': 0.5, 'solved': 1.0, 'confident': 1.0}
+# Statuses whose problems are never recommended again.
+DONE_STATUSES = {'solved', 'confident'}
+DIFFICULTY_WEIGHTS = {'easy': 1.0, 'medium': 0.9, 'hard': 0.75}
+# Affinity every problem gets, so problems sharing nothing with the history still rank by acceptance and difficulty.
+BASE_AFFINITY = 0.01
+
+
+def problem_features(tags, companies):
+    return [('company', company) for company in companies] + [('tag', tag) for tag in tags]
+
+
+class RecommendationIndex:
+    """
+    Problems as a sparse problem x (company, tag) matrix, scored with NumPy against a user's history.
+
+    The user's profile is the sum of the feature rows of the problems they tried or solved, weighted by status;
+    a problem's affinity is the dot product of its row with that profile. Features are weighted by inverse document
+    frequency and rows are normalised by the square root of their length, so rare companies and tags count for more
+    and problems with many tags are not favoured. The affinity is then scaled by a prior from acceptance and
+    difficulty. Both products are a single np.bincount over the non-zero entries.
+
+    The entries are (row, feature) pairs in no particular order, so a changed problem is patched by dropping its
+    entries and appending new ones, and the feature frequencies are counters kept up to date alongside. Deleted
+    problems leave dead rows, compacted once they outnumber the live ones.
+    """
+
+    def __init__(self, rows=()):
+        self.reset()
+        self.update(dict(rows))
+
+    def reset(self):
+        # {problem_id: (acceptance, difficulty, features)}, as given to update().
+        self.rows = {}
+        self.positions = {}
+        self.vocabulary = {}
+        self.problem_ids = np.empty(0, dtype=np.int64)
+        self.acceptance = np.empty(0)
+        self.difficulty = np.empty(0)
+        self.live = np.empty(0, dtype=bool)
+        self.frequency = np.empty(0, dtype=np.int64)
+        self.entry_rows = np.empty(0, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int64)
+        self.norms = np.empty(0)
+
+    def update(self, changed, removed=()):
+        """
+        Patch in the {problem_id: (acceptance, difficulty, features)} of new or changed problems and drop the removed
+        problem ids.
+        """
+        stale = [self.positions[pk] for pk in [*changed, *removed] if pk in self.positions]
+        if stale:
+            dropped = np.isin(self.entry_rows, stale)
+            self.frequency -= np.bincount(self.indices[dropped], minlength=len(self.frequency))
+            self.entry_rows, self.indices, self.norms = (
+                self.entry_rows[~dropped], self.indices[~dropped], self.norms[~dropped])
+            self.live[stale] = False
+        for pk in removed:
+            self.rows.pop(pk, None)
+            self.positions.pop(pk, None)
+        new = sorted(pk for pk in changed if pk not in self.positions)
+        self.positions.update((pk, len(self.problem_ids) + offset) for offset, pk in enumerate(new))
+        self.problem_ids = np.concatenate([self.problem_ids, np.array(new, dtype=np.int64)])
+        self.acceptance = np.concatenate([self.acceptance, np.zeros(len(new))])
+        self.difficulty = np.concatenate([self.difficulty, np.zeros(len(new))])
+        self.live = np.concatenate([self.live, np.zeros(len(new), dtype=bool)])
+        entry_rows, indices, norms = [], [], []
+        for pk, (acceptance, difficulty, features) in changed.items():
+            position = self.positions[pk]
+            self.acceptance[position] = acceptance
+            self.difficulty[position] = DIFFICULTY_WEIGHTS.get(difficulty, 1.0)
+            self.live[position] = True
+            entry_rows.extend([position] * len(features))
+            indices.extend(self.vocabulary.setdefault(feature, len(self.vocabulary)) for feature in features)
+            norms.extend([1 / np.sqrt(max(len(features), 1))] * len(features))
+        self.rows.update(changed)
+        indices = np.array(indices, dtype=np.int64)
+        self.frequency = np.concatenate([self.frequency, np.zeros(len(self.vocabulary) - len(self.frequency),
+                                                                  dtype=np.int64)])
+        self.frequency += np.bincount(indices, minlength=len(self.vocabulary))
+        self.entry_rows = np.concatenate([self.entry_rows, np.array(entry_rows, dtype=np.int64)])
+        self.indices = np.concatenate([self.indices, indices])
+        self.norms = np.concatenate([self.norms, np.array(norms)])
+        if len(self.live) > 2 * len(self.rows):
+            rows = self.rows
+            self.reset()
+            self.update(rows)
+            return
+        self.weigh()
+
+    def weigh(self):
+        """
+        The entry weights and problem priors, which depend on every problem: vectorised passes over the arrays.
+        """
+        idf = np.log((1 + len(self.rows)) / (1 + self.frequency)) + 1
+        self.data = idf[self.indices] * self.norms
+        top_acceptance = self.acceptance[self.live].max() if self.rows else 0
+        scale = self.acceptance / top_acceptance if top_acceptance > 0 else np.ones_like(self.acceptance)
+        self.prior = scale * self.difficulty
+
+    def recommend(self, statuses, limit):
+        """
+        Up to limit (problem_id, score) pairs, best first, for a user with the given {problem_id: status} history.
+        """
+        size = len(self.problem_ids)
+        if not self.rows or limit <= 0:
+            return []
+        history = [(self.positions[pk], status) for pk, status in statuses.items() if pk in self.positions]
+        row_weights = np.zeros(size)
+        for position, status in history:
+            row_weights[position] = STATUS_WEIGHTS.get(status, 0)
+        profile = np.bincount(self.indices, weights=row_weights[self.entry_rows] * self.data,
+                              minlength=len(self.vocabulary))
+        affinity = np.bincount(self.entry_rows, weights=profile[self.indices] * self.data, minlength=size)
+        scores = (affinity + BASE_AFFINITY) * self.prior
+        done = [position for position, status in history if status in DONE_STATUSES]
+        scores[done] = -np.inf
+        scores[~self.live] = -np.inf
+        candidates = len(self.rows) - len(done)
+        limit = min(limit, candidates)
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(self.problem_ids[top].tolist(), scores[top].tolist()))
+
+
+class RecommendationIndexCache(CatalogIndexCache):
+    """
+    The per-process RecommendationIndex.
+    """
+    index_class = RecommendationIndex
+    version_key = RECOMMENDATIONS_VERSION_KEY
+    fields = ('acceptance', 'difficulty', 'tags', 'companies')
+
+    def row(self, acceptance, difficulty, tags, companies):
+        return float(acceptance), difficulty, problem_features(tags, companies)
+
+
+recommendation_index = RecommendationIndexCache()
+
+
+def recommend_problems(user, limit):
+    """
+    [(problem_id, score)] of the problems the user should solve next, best first.
+    """
+    statuses = UserProblemStatus.objects.status_map(user) if user.is_authenticated else {}
+    return recommendation_index.get().recommend(statuses, limit)
@@ -0,0 +1,36 @@
+REVIEW_QUALITY = {'tried': 2, 'solved': 4, 'confident': 5}
+INITIAL_EASE_FACTOR = 2.5
+MIN_EASE_FACTOR = 1.3
+# Intervals stop growing after about a hundred years, keeping due dates far inside the timestamp range.
+MAX_INTERVAL_DAYS = 36500
+
+
+def quality_sql(status):
+    """
+    SQL for the SM-2 quality (0-5) a progress mark with the given status expression counts as.
+    """
+    cases = ' '.join(f"WHEN '{key}' THEN {quality}" for key, quality in REVIEW_QUALITY.items())
+    return f'CASE {status} {cases} END'
+
+
+def schedule_sql(repetitions, interval_days, ease_factor, quality, reviewed_at):
+    """
+    {column: SQL} assignments for the SM-2 schedule after a review of the given quality, from SQL expressions of the
+    previous schedule. A failed review (quality below 3) starts the repetitions over and is due again the next day;
+    otherwise the interval goes 1, 6, then grows by the ease factor, which itself moves with the quality, up to
+    MAX_INTERVAL_DAYS.
+    """
+    interval = (f'CASE WHEN {quality} < 3 OR {repetitions} = 0 THEN 1 WHEN {repetitions} = 1 THEN 6 '
+                f'ELSE least(round({interval_days} * {ease_factor}), {MAX_INTERVAL_DAYS})::integer END')
+    return {
+        'repetitions': f'CASE WHEN {quality} < 3 THEN 0 ELSE {repetitions} + 1 END',
+        'interval_days': interval,
+        'ease_factor': f'greatest({MIN_EASE_FACTOR}, '
+                       f'{ease_factor} + 0.1 - (5 - {quality}) * (0.08 + (5 - {quality}) * 0.02))',
+        'reviewed_at': reviewed_at,
+        'due_at': f"{reviewed_at} + ({interval}) * interval '1 day'",
+    }
+
+
+def first_schedule_sql(quality, reviewed_at):
+    return schedule_sql('0', '0', str(INITIAL_EASE_FACTOR), quality, reviewed_at)
@@ -0,0 +1,30 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Func, TextField, Value
+
+SEARCH_CONFIG = 'english'
+
+
+def question_text():
+    """
+    question_html with tags and entities blanked out in SQL, so markup is never indexed or matched.
+    """
+    return Func(F('question_html'), Value(r'<[^>]*>|&[#a-zA-Z0-9]+;'), Value(' '), Value('g'),
+                function='regexp_replace', output_field=TextField())
+
+
+def search_vector():
+    return (SearchVector('name', weight='A', config=SEARCH_CONFIG) +
+            SearchVector(question_text(), weight='B', config=SEARCH_CONFIG))
+
+
+def search_problems(queryset, term):
+    """
+    Filter problems matching a web-search style term through the stored search vector, ranked by relevance with
+    names weighted above the question text, and annotated with a highlighted snippet of the question.
+    """
+    query = SearchQuery(term, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        search_highlight=SearchHeadline(question_text(), query, config=SEARCH_CONFIG, start_sel='<mark>',
+                                        stop_sel='</mark>', max_words=35, min_words=15),
+    ).order_by('-rank', *queryset.model._meta.ordering)
@@ -0,0 +1,101 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import autocomplete_index
+from .cache import invalidate_problems
+from users.models import User
+from .models import Problem, ProblemFacetCount, ProblemSignature, UserScore, facet_values, problems_bulk_saved
+from .recommendations import recommendation_index
+
+FACET_FIELDS = {'difficulty', 'tags', 'companies'}
+
+
+def touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(pre_save, sender=Problem)
+def remember_stored_facets(sender, instance, update_fields=None, **kwargs):
+    instance._stored_facet_values = None
+    if not touches(update_fields, FACET_FIELDS):
+        return
+    row = None
+    if instance.pk is not None:
+        row = Problem.objects.filter(pk=instance.pk).values('difficulty', 'tags', 'companies').first()
+    instance._stored_facet_values = facet_values(**row) if row else set()
+
+
+@receiver(post_save, sender=Problem)
+def update_facet_counts(sender, instance, **kwargs):
+    if instance._stored_facet_values is not None:
+        ProblemFacetCount.objects.apply(instance._stored_facet_values, instance.facet_values)
+
+
+@receiver(post_delete, sender=Problem)
+def remove_facet_counts(sender, instance, **kwargs):
+    ProblemFacetCount.objects.apply(instance.facet_values, set())
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def invalidate_cached_problem(sender, instance, **kwargs):
+    invalidate_problems([instance.pk])
+
+
+@receiver(problems_bulk_saved, sender=Problem)
+def invalidate_cached_problems(sender, pks, **kwargs):
+    invalidate_problems(pks)
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def invalidate_recommended_problem(sender, instance, **kwargs):
+    recommendation_index.invalidate([instance.pk])
+
+
+@receiver(problems_bulk_saved, sender=Problem)
+def invalidate_recommended_problems(sender, pks, **kwargs):
+    recommendation_index.invalidate(pks)
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def invalidate_autocomplete_problem(sender, instance, **kwargs):
+    autocomplete_index.invalidate([instance.pk])
+
+
+@receiver(problems_bulk_saved, sender=Problem)
+def invalidate_autocomplete_problems(sender, pks, **kwargs):
+    autocomplete_index.invalidate(pks)
+
+
+@receiver(post_save, sender=Problem)
+def refresh_moved_scores(sender, instance, created, using, **kwargs):
+    # Points for the problem move from the companies it left to the ones it joined.
+    if created or instance._stored_facet_values is None:
+        return
+    companies = [value for facet, value in instance._stored_facet_values if facet == 'company']
+    if set(companies) != set(instance.companies):
+        UserScore.objects.using(using).refresh_problems({instance.pk: companies})
+
+
+@receiver(pre_delete, sender=Problem)
+def refresh_deleted_scores(sender, instance, using, **kwargs):
+    # Runs before the progress rows cascade away, so the users who lose points are still known.
+    UserScore.objects.using(using).refresh_problems({instance.pk: instance.companies})
+
+
+@receiver(pre_delete, sender=User)
+def remove_leaderboard_scores(sender, instance, **kwargs):
+    UserScore.objects.remove_user(instance.pk)
+
+
+@receiver(post_save, sender=Problem)
+def refresh_problem_signature(sender, instance, update_fields=None, **kwargs):
+    if touches(update_fields, {'question_html'}):
+        ProblemSignature.objects.refresh([instance.pk])
+
+
+@receiver(problems_bulk_saved, sender=Problem)
+def refresh_problem_signatures(sender, pks, **kwargs):
+    ProblemSignature.objects.refresh(pks)
@@ -0,0 +1,110 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+from .utils import html_to_text
+
+# 128 MinHash values in 32 LSH bands of 4: problems whose question texts have a Jaccard similarity around
+# (1/32) ** (1/4) = 0.42 share a band about half of the time, near-duplicates almost always.
+NUM_PERM = 128
+BAND_ROWS = 4
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+# Fixed hash permutations, so signatures stored by any process stay comparable.
+_rng = np.random.RandomState(1)
+PERMUTATION_A = _rng.randint(1, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+PERMUTATION_B = _rng.randint(0, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+# Share of the similarity score coming from the question text; the rest is tag and company overlap.
+TEXT_WEIGHT = 0.8
+DUPLICATE_THRESHOLD = 0.8
+
+
+def shingles(html):
+    """
+    The overlapping SHINGLE_SIZE-word sequences of the question's plain text.
+    """
+    words = re.findall(r'\w+', html_to_text(html).lower())
+    if not words:
+        return set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))}
+
+
+def minhash(html):
+    """
+    The MinHash signature of the question's shingles as NUM_PERM uint32 values, or None if it has no words.
+    """
+    tokens = shingles(html)
+    if not tokens:
+        return None
+    hashes = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+    # Overflowing uint64 products wrap around, which still permutes the hashes well enough.
+    with np.errstate(over='ignore'):
+        permuted = (PERMUTATION_A[:, None] * hashes + PERMUTATION_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_hashes(signature):
+    """
+    One signed 64-bit hash per LSH band of the signature, salted with the band number.
+    """
+    return [
+        int.from_bytes(hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8).digest(), 'little', signed=True)
+        for band, rows in enumerate(signature.reshape(-1, BAND_ROWS))
+    ]
+
+
+def signature_bytes(signature):
+    return signature.astype('<u4').tobytes()
+
+
+def signature_array(value):
+    return np.frombuffer(bytes(value), dtype='<u4')
+
+
+def estimated_similarity(signature, signatures):
+    """
+    The estimated Jaccard similarity of the signature with each row of the signatures matrix.
+    """
+    return (signatures == signature).mean(axis=1)
+
+
+def facet_set(tags, companies):
+    return {*(('tag', tag) for tag in tags), *(('company', company) for company in companies)}
+
+
+def overlap(first, second):
+    return len(first & second) / len(first | second) if first or second else 0.0
+
+
+def similarity_score(text, facets):
+    return TEXT_WEIGHT * text + (1 - TEXT_WEIGHT) * facets
+
+
+def duplicate_clusters(signatures, buckets, threshold=DUPLICATE_THRESHOLD):
+    """
+    Groups of at least two problems whose {problem_id: signature} are estimated at least threshold similar, largest
+    first, each sorted by problem id. Only problems in the same bucket, lists of ids sharing an LSH band, are compared.
+    """
+    parent = {pk: pk for pk in signatures}
+
+    def root(pk):
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    for bucket in buckets:
+        members = [pk for pk in bucket if pk in signatures]
+        for index, pk in enumerate(members[:-1]):
+            others = members[index + 1:]
+            similarity = estimated_similarity(signatures[pk], np.vstack([signatures[other] for other in others]))
+            for other, value in zip(others, similarity.tolist()):
+                if value >= threshold:
+                    parent[root(other)] = root(pk)
+    clusters = {}
+    for pk in sorted(parent):
+        clusters.setdefault(root(pk), []).append(pk)
+    return sorted((cluster for cluster in clusters.values() if len(cluster) > 1), key=lambda c: (-len(c), c))
@@ -0,0 +1,783 @@
+import math
+import random
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from constants import DIFFICULTY_CHOICES, COMPANIES
+from api import benchmarks
+from problems.autocomplete import AutocompleteIndex, PrefixIndex, autocomplete_index, normalize, word_suffixes
+from problems.models import (
+    Company, LeaderboardNode, Problem, ProblemBand, ProblemFacetCount, ProblemSignature, Tag, UserProblemStatus,
+    UserScore,
+)
+from problems.pagination import KEYSET_ORDERING, KeysetPage
+from problems.recommendations import (
+    BASE_AFFINITY, DIFFICULTY_WEIGHTS, DONE_STATUSES, RECOMMENDATIONS_VERSION_KEY, STATUS_WEIGHTS, RecommendationIndex,
+    RecommendationIndexCache, problem_features, recommendation_index,
+)
+from problems.reviews import MAX_INTERVAL_DAYS
+from problems.similarity import duplicate_clusters, estimated_similarity, minhash, shingles
+from users.models import User
+
+
+class ProblemTestCase(TestCase):
+    def test_excerpt(self):
+        problem = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Find the <b>sum</b> &amp; product.</p>\n<pre>1 + 1</pre>',
+            solution_html='<p>Test Solution</p>',
+        )
+        self.assertEqual(problem.excerpt, 'Find the sum & product. 1 + 1')
+        problem.question_html = '<p>' + 'x' * 300 + '</p>'
+        problem.save(update_fields=['question_html'])
+        problem.refresh_from_db()
+        self.assertEqual(len(problem.excerpt), 200)
+
+
+class RecommendationIndexTestCase(TestCase):
+    def setUp(self):
+        recommendation_index.index = None
+
+    def create(self, name, tags=(), companies=(), acceptance=0.5, difficulty='easy'):
+        return Problem.objects.create(name=name, acceptance=acceptance, difficulty=difficulty, tags=list(tags),
+                                      companies=list(companies), question_html='<p>Q</p>', solution_html='<p>S</p>')
+
+    def test_recommend(self):
+        index = RecommendationIndex({
+            1: (0.5, 'easy', problem_features(['Graph'], ['Google'])),
+            2: (0.5, 'easy', problem_features(['Graph'], ['Google'])),
+            3: (0.9, 'easy', problem_features(['Array'], ['Adobe'])),
+            4: (0.5, 'hard', problem_features(['Graph'], [])),
+        })
+        self.assertEqual([pk for pk, _ in index.recommend({1: 'solved'}, 10)], [2, 4, 3])
+        # Tried problems are still unsolved, so they stay candidates.
+        self.assertEqual({pk for pk, _ in index.recommend({1: 'tried'}, 2)}, {1, 2})
+        # Without history problems rank by acceptance and difficulty.
+        self.assertEqual([pk for pk, _ in index.recommend({}, 1)], [3])
+        self.assertEqual(index.recommend({pk: 'confident' for pk in range(1, 5)}, 10), [])
+        self.assertEqual(RecommendationIndex().recommend({}, 10), [])
+
+    def test_recommend_large(self):
+        random.seed(0)
+        tags = [f'Tag {number}' for number in range(60)]
+        rows = {
+            pk: (random.random(), random.choice(DIFFICULTY_CHOICES)[0],
+                 problem_features(random.sample(tags, 3), random.sample(COMPANIES, 4)))
+            for pk in range(1, 3001)
+        }
+        statuses = {pk: random.choice(['tried', 'solved']) for pk in random.sample(range(1, 3001), 300)}
+        # The same scores computed one problem at a time, without the sparse matrix.
+        frequency = Counter(feature for _, _, features in rows.values() for feature in features)
+        idf = {feature: math.log((1 + len(rows)) / (1 + count)) + 1 for feature, count in frequency.items()}
+        weights = {pk: {feature: idf[feature] / math.sqrt(len(features)) for feature in features}
+                   for pk, (_, _, features) in rows.items()}
+        profile = Counter()
+        for pk, status in statuses.items():
+            for feature, weight in weights[pk].items():
+                profile[feature] += STATUS_WEIGHTS[status] * weight
+        top_acceptance = max(acceptance for acceptance, _, _ in rows.values())
+        expected = sorted((
+            (pk, (sum(profile[feature] * weight for feature, weight in weights[pk].items()) + BASE_AFFINITY)
+             * acceptance / top_acceptance * DIFFICULTY_WEIGHTS[difficulty])
+            for pk, (acceptance, difficulty, _) in rows.items() if statuses.get(pk) not in DONE_STATUSES
+        ), key=lambda item: -item[1])[:20]
+        recommended = RecommendationIndex(rows).recommend(statuses, 20)
+        self.assertEqual([pk for pk, _ in recommended], [pk for pk, _ in expected])
+        for (_, score), (_, expected_score) in zip(recommended, expected):
+            self.assertAlmostEqual(score, expected_score)
+
+    def test_update(self):
+        rng = random.Random(0)
+        tags = [f'Tag {number}' for number in range(20)]
+
+        def row(pk):
+            return pk / 1000, rng.choice(DIFFICULTY_CHOICES)[0], problem_features(rng.sample(tags, 3), [])
+
+        rows = {pk: row(pk) for pk in range(1, 201)}
+        index = RecommendationIndex(rows)
+        for _ in range(10):
+            changed = {pk: row(pk) for pk in rng.sample(range(1, 301), 20)}
+            removed = set(rng.sample(sorted(rows), 10)) - set(changed)
+            index.update(changed, removed)
+            rows.update(changed)
+            for pk in removed:
+                del rows[pk]
+            statuses = {pk: rng.choice(['tried', 'solved']) for pk in rng.sample(sorted(rows), 20)}
+            # Patching gives the same scores as building from the rows.
+            recommended, expected = index.recommend(statuses, 10), RecommendationIndex(rows).recommend(statuses, 10)
+            self.assertEqual([pk for pk, _ in recommended], [pk for pk, _ in expected])
+            for (_, score), (_, expected_score) in zip(recommended, expected):
+                self.assertAlmostEqual(score, expected_score)
+        # Dead rows are compacted once they outnumber the live ones.
+        kept = sorted(rows)[:3]
+        index.update({}, set(rows) - set(kept))
+        self.assertEqual(index.problem_ids.tolist(), kept)
+
+    def test_refresh(self):
+        graph = self.create('Graph', tags=['Graph'])
+        other = self.create('Other', tags=['Array'], acceptance=0.9)
+        self.assertEqual(recommendation_index.get().rows[graph.id][2], [('tag', 'Graph')])
+        other.tags = ['Graph']
+        other.save()
+        self.assertEqual(recommendation_index.get().rows[other.id][2], [('tag', 'Graph')])
+        graph.delete()
+        self.assertNotIn(graph.id, recommendation_index.get().rows)
+        Problem.objects.upsert_by_name([Problem(name='New', acceptance=0.5, difficulty='easy', tags=['Math'],
+                                                question_html='<p>Q</p>', solution_html='<p>S</p>')])
+        self.assertIn(Problem.objects.get(name='New').id, recommendation_index.get().rows)
+
+    def test_refresh_remote(self):
+        problem = self.create('Graph', tags=['Graph'])
+        other = self.create('Other', tags=['Graph'])
+        # Another process keeps its own index and only sees changes through the shared cache.
+        remote = RecommendationIndexCache()
+        remote.get()
+        problem.tags = ['Array']
+        problem.save()
+        other.delete()
+        # Deletions come from the logged ids, so catching up is one query instead of a scan of every id.
+        with self.assertNumQueries(1):
+            rows = remote.get().rows
+        self.assertEqual(rows[problem.id][2], [('tag', 'Array')])
+        self.assertNotIn(other.id, rows)
+        # A save committed after its ids were reloaded is read again through the watermark on the next change.
+        Problem.objects.filter(pk=problem.pk).update(tags=['Math'], updated_at=timezone.now())
+        self.create('New')
+        self.assertEqual(remote.get().rows[problem.id][2], [('tag', 'Math')])
+        # Without the whole changelog the catalog is loaded again.
+        Problem.objects.filter(pk=problem.pk).update(tags=['Tree'], updated_at=timezone.now() - timedelta(days=1))
+        recommendation_index.invalidate([problem.pk])
+        cache.delete(remote.changelog_key(cache.get(RECOMMENDATIONS_VERSION_KEY)))
+        self.assertEqual(remote.get().rows[problem.id][2], [('tag', 'Tree')])
+        Problem.objects.filter(pk=problem.pk).delete()
+        cache.delete(RECOMMENDATIONS_VERSION_KEY)
+        self.assertNotIn(problem.id, remote.get().rows)
+
+    def test_refresh_unshared_cache(self):
+        problem = self.create('Graph', tags=['Graph'])
+        other = self.create('Other', tags=['Graph'])
+        remote = RecommendationIndexCache()
+        remote.get()
+        version = cache.get(RECOMMENDATIONS_VERSION_KEY)
+        problem.tags = ['Array']
+        problem.save()
+        other.delete()
+        # With a per-process cache the version another process bumps never reaches this one.
+        cache.set(RECOMMENDATIONS_VERSION_KEY, version)
+        self.assertEqual(remote.get().rows[problem.id][2], [('tag', 'Graph')])
+        with mock.patch('problems.catalog_index.CATALOG_SYNC_INTERVAL', 0):
+            rows = remote.get().rows
+        self.assertEqual(rows[problem.id][2], [('tag', 'Array')])
+        self.assertNotIn(other.id, rows)
+
+
+class AutocompleteIndexTestCase(TestCase):
+    def setUp(self):
+        autocomplete_index.index = None
+
+    def test_prefix_index(self):
+        index = PrefixIndex(['Two Sum', 'Two Sum II - Input Array Is Sorted', '3Sum', 'Sum of Two Integers'])
+        self.assertEqual(index.search('two', 10), [0, 1, 3])
+        self.assertEqual(index.search('SUM', 10), [3, 0, 1])
+        self.assertEqual(index.search('two sum ii - in', 10), [1])
+        self.assertEqual(index.search('sum', 1), [3])
+        self.assertEqual(index.search('3s', 10), [2])
+        self.assertEqual(index.search('  ', 10), [])
+        self.assertEqual(index.search('tree', 10), [])
+        self.assertEqual(PrefixIndex([]).search('a', 10), [])
+
+    def test_complete(self):
+        index = AutocompleteIndex({
+            1: ('Two Sum', 50.0, ['Array', 'Hash Table'], ['Google']),
+            2: ('Add Two Numbers', 40.0, ['Linked List'], ['Google', 'Goldman Sachs']),
+            3: ('Group Anagrams', 60.0, ['Hash Table'], ['Amazon']),
+        })
+        self.assertEqual(index.complete('g', 10), {
+            'problems': [{'id': 3, 'name': 'Group Anagrams'}],
+            'companies': [{'value': 'Google', 'count': 2}, {'value': 'Goldman Sachs', 'count': 1}],
+            'tags': [],
+        })
+        self.assertEqual(index.complete('two', 10)['problems'], [{'id': 1, 'name': 'Two Sum'},
+                                                                 {'id': 2, 'name': 'Add Two Numbers'}])
+        self.assertEqual(index.complete('ha', 10)['tags'], [{'value': 'Hash Table', 'count': 2}])
+
+    def test_complete_large(self):
+        rng = random.Random(0)
+        words = ['array', 'sum', 'tree', 'binary', 'path', 'maximum', 'minimum', 'string', 'subarray', 'matrix',
+                 'graph', 'valid', 'number', 'of', 'islands', 'longest', 'palindrome', 'k', 'closest', 'points']
+        tags = [f'Tag {number}' for number in range(70)]
+        index = AutocompleteIndex({
+            pk: (' '.join(rng.choices(words, k=rng.randint(2, 6))) + f' {pk}', rng.uniform(10, 90),
+                 rng.sample(tags, 3), rng.sample(COMPANIES, 4))
+            for pk in range(1, 5001)
+        })
+        queries = [word[:length] for word in words + ['goo', 'amaz', 'tag 1'] for length in (1, 2, 4)]
+
+        def scan(texts, query):
+            # Every text checked in order, texts matching from their first word first.
+            query = normalize(query)
+            matches = [(not normalize(text).startswith(query), position) for position, text in enumerate(texts)
+                       if any(suffix.startswith(query) for suffix in word_suffixes(text))]
+            return [position for _, position in sorted(matches)[:10]]
+
+        names = [name for _, name in index.problems]
+        tag_values = [value for value, _ in index.tags]
+        for query in queries:
+            completion = index.complete(query, 10)
+            self.assertEqual([problem['id'] for problem in completion['problems']],
+                             [index.problems[position][0] for position in scan(names, query)])
+            self.assertEqual([tag['value'] for tag in completion['tags']],
+                             [tag_values[position] for position in scan(tag_values, query)])
+        self.assertEqual(len(index.complete('a', 10)['problems']), 10)
+
+    def test_update(self):
+        rng = random.Random(0)
+        words = ['two', 'sum', 'tree', 'path', 'twin', 'sub', 'string', 'trie']
+
+        def row(pk):
+            return ' '.join(rng.choices(words, k=3)), rng.choice([10.0, 20.0, 30.0]), rng.sample(words, 2), []
+
+        rows = {pk: row(pk) for pk in range(1, 101)}
+        index = AutocompleteIndex(rows)
+        rebuilt = False
+        for _ in range(10):
+            changed = {pk: row(pk) for pk in rng.sample(range(1, 151), 10)}
+            removed = set(rng.sample(sorted(rows), 5)) - set(changed)
+            with mock.patch('problems.autocomplete.DELTA_LIMIT', 50):
+                index.update(changed, removed)
+            rebuilt = rebuilt or not index.changed
+            rows.update(changed)
+            for pk in removed:
+                del rows[pk]
+            # Patching gives the same completions as building from the rows, before and after DELTA_LIMIT.
+            for query in ('t', 'tw', 'sum', 'string t', 'x'):
+                self.assertEqual(index.complete(query, 5), AutocompleteIndex(rows).complete(query, 5), query)
+        self.assertTrue(rebuilt)
+
+    def test_refresh(self):
+        problem = Problem.objects.create(name='Two Sum', acceptance=0.5, difficulty='easy', tags=['Array'],
+                                         question_html='<p>Q</p>', solution_html='<p>S</p>')
+        self.assertEqual(autocomplete_index.get().complete('two', 10)['problems'], [{'id': problem.id,
+                                                                                     'name': 'Two Sum'}])
+        problem.name = 'Three Sum'
+        problem.save()
+        self.assertEqual(autocomplete_index.get().complete('two', 10)['problems'], [])
+        Problem.objects.upsert_by_name([Problem(name='Two Pointers', acceptance=0.5, difficulty='easy', tags=['Math'],
+                                                question_html='<p>Q</p>', solution_html='<p>S</p>')])
+        self.assertEqual(autocomplete_index.get().complete('m', 10)['tags'], [{'value': 'Math', 'count': 1}])
+        problem.delete()
+        self.assertEqual(autocomplete_index.get().complete('three', 10)['problems'], [])
+
+
+class ProblemSignatureTestCase(TestCase):
+    text = ('Given an array of integers nums and an integer target, return indices of the two numbers such that they '
+            'add up to target. You may assume that each input would have exactly one solution, and you may not use '
+            'the same element twice. You can return the answer in any order.')
+
+    def create(self, name, question, tags=(), companies=()):
+        return Problem.objects.create(name=name, acceptance=0.5, difficulty='easy', tags=list(tags),
+                                      companies=list(companies), question_html=f'<p>{question}</p>',
+                                      solution_html='<p>S</p>')
+
+    def test_minhash(self):
+        first, second = self.text, self.text.replace('two numbers', 'two values')
+        jaccard = len(shingles(first) & shingles(second)) / len(shingles(first) | shingles(second))
+        estimate = estimated_similarity(minhash(first), minhash(second)[None, :])[0]
+        self.assertAlmostEqual(estimate, jaccard, delta=0.15)
+        self.assertEqual(estimated_similarity(minhash(first), minhash(f'<div>{first}</div>')[None, :])[0], 1.0)
+        self.assertIsNone(minhash('<p> </p>'))
+
+    def test_similar(self):
+        problem = self.create('Two Sum', self.text, tags=['Array'], companies=['Google'])
+        copy = self.create('Two Sum II', self.text.replace('two numbers', 'two values'), tags=['Array'],
+                           companies=['Google'])
+        retagged = self.create('Two Sum III', self.text.replace('two numbers', 'two values'), tags=['Math'])
+        self.create('Other', 'Reverse a singly linked list and return the new head of the reversed list.')
+        empty = self.create('Empty', '')
+        ranked = ProblemSignature.objects.similar(problem.pk, 10)
+        self.assertEqual([pk for pk, _ in ranked], [copy.pk, retagged.pk])
+        self.assertEqual(len(ProblemSignature.objects.similar(problem.pk, 1)), 1)
+        self.assertEqual(ProblemSignature.objects.similar(empty.pk, 10), [])
+        self.assertIsNone(ProblemSignature.objects.similar(empty.pk + 100, 10))
+
+    def test_refresh(self):
+        problem = self.create('Two Sum', self.text)
+        other = self.create('Other', 'Reverse a singly linked list and return the new head of the reversed list.')
+        self.assertEqual(ProblemSignature.objects.similar(problem.pk, 10), [])
+        other.question_html = self.text
+        other.save(update_fields=['question_html'])
+        self.assertEqual([pk for pk, _ in ProblemSignature.objects.similar(problem.pk, 10)], [other.pk])
+        Problem.objects.upsert_by_name([Problem(name='New', acceptance=0.5, difficulty='easy', question_html=self.text,
+                                                solution_html='<p>S</p>')])
+        self.assertEqual(len(ProblemSignature.objects.similar(problem.pk, 10)), 2)
+        other.delete()
+        self.assertEqual(ProblemSignature.objects.count(), 2)
+
+    def test_duplicate_clusters(self):
+        problems = [self.create(f'Two Sum {i}', self.text.replace('integers', f'integers {i}')) for i in range(3)]
+        self.create('Other', 'Reverse a singly linked list and return the new head of the reversed list.')
+        pair = [self.create(f'Reverse {i}', f'Given the head of a singly linked list of {i} nodes, reverse the list '
+                                            f'and return the reversed list, iteratively or recursively.')
+                for i in range(2)]
+        clusters = ProblemSignature.objects.duplicate_clusters(0.6)
+        self.assertEqual(clusters, [[problem.pk for problem in problems], [problem.pk for problem in pair]])
+        self.assertEqual(duplicate_clusters({}, []), [])
+        output = StringIO()
+        call_command('duplicate_problems', '--threshold', '0.6', '--rebuild', stdout=output)
+        self.assertIn(f'  {pair[0].pk}: Reverse 0', output.getvalue())
+        self.assertIn('Found 2 clusters of 5 near-duplicate problems.', output.getvalue())
+
+
+class NameLookupTestCase(TestCase):
+    def create(self, name, **kwargs):
+        return Problem.objects.create(name=name, acceptance=0.5, difficulty='easy', question_html='<p>Q</p>',
+                                      solution_html='<p>S</p>', **kwargs)
+
+    def stored(self, problem):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tags, companies FROM {Problem._meta.db_table} WHERE id = %s', [problem.pk])
+            return cursor.fetchone()
+
+    def test_names_stored_as_ids(self):
+        problem = self.create('Graph', tags=['Graph', 'Array'], companies=['Google'])
+        tag_ids = dict(Tag.objects.values_list('name', 'id'))
+        google = Company.objects.get(name='Google').id
+        self.assertEqual(self.stored(problem), ([tag_ids['Graph'], tag_ids['Array']], [google]))
+        self.assertEqual(Problem.objects.values_list('tags', 'companies').get(pk=problem.pk),
+                         (['Graph', 'Array'], ['Google']))
+        Problem.objects.filter(pk=problem.pk).update(companies=['Adobe', 'Google'])
+        problem.refresh_from_db()
+        self.assertEqual(problem.companies, ['Adobe', 'Google'])
+
+    def test_filter_by_name(self):
+        problem = self.create('Graph', tags=['Graph'], companies=['Google'])
+        self.assertEqual(list(Problem.objects.filter(tags__overlap=['Graph', 'Tree'])), [problem])
+        self.assertEqual(list(Problem.objects.filter(companies__contains=['Google'])), [problem])
+        self.assertFalse(Problem.objects.filter(tags__overlap=['Unknown']).exists())
+        self.assertFalse(Tag.objects.filter(name='Unknown').exists())
+
+    def test_rolled_back_names(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.create('Rolled back', tags=['Rolled back'])
+            raise ValueError
+        self.assertFalse(Tag.objects.filter(name='Rolled back').exists())
+        problem = self.create('Graph', tags=['Rolled back'])
+        self.assertEqual(self.stored(problem)[0], [Tag.objects.get(name='Rolled back').id])
+
+
+class ProblemFacetCountTestCase(TestCase):
+    def counts(self):
+        return {(f.facet, f.value): f.count for f in ProblemFacetCount.objects.all()}
+
+    def test_incremental(self):
+        problem = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+            companies=['Google', 'Amazon'],
+            tags=['Array'],
+        )
+        Problem.objects.create(
+            name='Test Problem 2',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question 2</p>',
+            solution_html='<p>Test Solution 2</p>',
+            companies=['Google'],
+        )
+        self.assertEqual(self.counts(), {
+            ('difficulty', 'easy'): 2, ('company', 'Google'): 2, ('company', 'Amazon'): 1, ('tag', 'Array'): 1})
+        problem.companies = ['Google', 'Apple']
+        problem.difficulty = DIFFICULTY_CHOICES[2][0]
+        problem.save()
+        expected = {('difficulty', 'easy'): 1, ('difficulty', 'hard'): 1, ('company', 'Google'): 2,
+                    ('company', 'Apple'): 1, ('tag', 'Array'): 1}
+        self.assertEqual(self.counts(), expected)
+        ProblemFacetCount.objects.rebuild()
+        self.assertEqual(self.counts(), expected)
+        problem.delete()
+        self.assertEqual(self.counts(), {('difficulty', 'easy'): 1, ('company', 'Google'): 1})
+
+
+class UserProblemStatusTestCase(TestCase):
+    def setUp(self):
+        self.problem = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword',
+        )
+
+    def test_mark_single_statement(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(UserProblemStatus.objects.mark(self.user, self.problem.id, 'tried'), 'Tried')
+        with self.assertNumQueries(1):
+            self.assertEqual(UserProblemStatus.objects.mark(self.user, self.problem.id, 'solved'), 'Solved')
+        self.assertEqual(UserProblemStatus.objects.get(user=self.user).status, 'solved')
+
+    def test_mark_missing_problem(self):
+        self.assertIsNone(UserProblemStatus.objects.mark(self.user, 999, 'solved'))
+        self.assertEqual(UserProblemStatus.objects.count(), 0)
+
+    def test_mark_clear(self):
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'solved')
+        self.assertEqual(UserProblemStatus.objects.mark(self.user, self.problem.id, 'untried'), 'Untried')
+        # The cleared row stays as a tombstone without status or schedule.
+        progress = UserProblemStatus.objects.get()
+        self.assertEqual((progress.status, progress.due_at), (None, None))
+        self.assertEqual(UserProblemStatus.objects.status_map(self.user), {})
+        self.assertEqual(UserProblemStatus.objects.review(self.user, [(self.problem.id, 5)]), {})
+        self.assertIsNone(UserProblemStatus.objects.mark(self.user, self.problem.id + 100, 'untried'))
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'solved')
+        self.assertSchedule(1, 1, 2.5)
+
+    def test_mark_keeps_created_at(self):
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'tried')
+        created_at = UserProblemStatus.objects.get().created_at
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'confident')
+        self.assertEqual(UserProblemStatus.objects.get().created_at, created_at)
+
+    def assertSchedule(self, repetitions, interval_days, ease_factor):
+        progress = UserProblemStatus.objects.get(user=self.user, problem=self.problem)
+        self.assertEqual((progress.repetitions, progress.interval_days), (repetitions, interval_days))
+        self.assertAlmostEqual(progress.ease_factor, ease_factor)
+        self.assertEqual(progress.due_at - progress.reviewed_at, timedelta(days=interval_days))
+
+    def test_mark_schedules_review(self):
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'tried')
+        self.assertSchedule(0, 1, 2.18)
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'solved')
+        self.assertSchedule(1, 1, 2.18)
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'confident')
+        self.assertSchedule(2, 6, 2.28)
+
+    def test_repeated_mark(self):
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'confident')
+        for _ in range(30):
+            UserProblemStatus.objects.mark(self.user, self.problem.id, 'confident')
+        # Marking the stored status again is not a review.
+        self.assertSchedule(1, 1, 2.6)
+
+    def test_review_interval_cap(self):
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'confident')
+        for _ in range(30):
+            UserProblemStatus.objects.review(self.user, [(self.problem.id, 5)])
+        self.assertSchedule(31, MAX_INTERVAL_DAYS, 5.6)
+
+    def test_review(self):
+        UserProblemStatus.objects.mark(self.user, self.problem.id, 'solved')
+        UserProblemStatus.objects.review(self.user, [(self.problem.id, 4)])
+        with self.assertNumQueries(1):
+            schedule = UserProblemStatus.objects.review(self.user, [(self.problem.id, 5), (999, 5)])
+        self.assertEqual(list(schedule), [self.problem.id])
+        self.assertSchedule(3, 15, 2.6)
+        UserProblemStatus.objects.review(self.user, [(self.problem.id, 1)])
+        self.assertSchedule(0, 1, 2.06)
+
+    def test_due(self):
+        problems = [self.problem] + [Problem.objects.create(
+            name=f'Test Problem {i}', acceptance=0.5, difficulty=DIFFICULTY_CHOICES[0][0], question_html='<p>Q</p>',
+            solution_html='<p>S</p>') for i in range(2)]
+        for problem in problems:
+            UserProblemStatus.objects.mark(self.user, problem.id, 'solved')
+        now = timezone.now()
+        for days, problem in zip((3, 5, -1), problems):
+            UserProblemStatus.objects.filter(problem=problem).update(due_at=now - timedelta(days=days))
+        due = UserProblemStatus.objects.due(self.user, 10)
+        self.assertEqual([problem_id for problem_id, _ in due], [problems[1].id, problems[0].id])
+        self.assertEqual(len(UserProblemStatus.objects.due(self.user, 1)), 1)
+
+
+class LeaderboardTestCase(TestCase):
+    def setUp(self):
+        self.problems = [Problem.objects.create(
+            name=f'Test Problem {i}', acceptance=0.5, difficulty=DIFFICULTY_CHOICES[0][0], question_html='<p>Q</p>',
+            solution_html='<p>S</p>', companies=['Google'] if i < 2 else []) for i in range(4)]
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpassword') for i in range(3)]
+
+    def mark(self, user, problem, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProblemStatus.objects.mark(user, problem.id, status)
+
+    def nodes(self):
+        return dict(((scope, node), users) for scope, node, users in
+                    LeaderboardNode.objects.exclude(users=0).values_list('scope', 'node', 'users'))
+
+    def test_rank(self):
+        self.mark(self.users[0], self.problems[0], 'confident')
+        self.mark(self.users[1], self.problems[2], 'solved')
+        self.mark(self.users[1], self.problems[3], 'solved')
+        self.mark(self.users[2], self.problems[1], 'solved')
+        leaders = UserScore.objects.top(10)
+        self.assertEqual([(leader['username'], leader['rank'], leader['score']) for leader in leaders],
+                         [('user0', 1, 2), ('user1', 1, 2), ('user2', 3, 1)])
+        self.assertEqual(UserScore.objects.rank(self.users[2].pk), {'score': 1, 'rank': 3, 'users': 3})
+        self.assertEqual(UserScore.objects.rank(self.users[1].pk, 'Google'), {'score': 0, 'rank': 3, 'users': 2})
+        self.assertEqual(UserScore.objects.rank(self.users[2].pk, 'Google'), {'score': 1, 'rank': 2, 'users': 2})
+        self.mark(self.users[0], self.problems[0], 'tried')
+        self.assertEqual(UserScore.objects.rank(self.users[0].pk), {'score': 0, 'rank': 3, 'users': 2})
+        self.assertEqual(UserScore.objects.rank(self.users[2].pk), {'score': 1, 'rank': 2, 'users': 2})
+
+    def test_rank_lookup_queries(self):
+        self.mark(self.users[0], self.problems[0], 'solved')
+        with self.assertNumQueries(2):
+            UserScore.objects.rank(self.users[0].pk)
+
+    def test_sync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProblemStatus.objects.sync(self.users[0], [
+                (problem.id, 'confident', timezone.now()) for problem in self.problems])
+        self.assertEqual(UserScore.objects.rank(self.users[0].pk), {'score': 8, 'rank': 1, 'users': 1})
+        self.assertEqual(UserScore.objects.rank(self.users[0].pk, 'Google')['score'], 4)
+
+    def test_rebuild(self):
+        for user, problem, status in ((0, 0, 'confident'), (0, 2, 'solved'), (1, 1, 'solved'), (2, 3, 'tried')):
+            self.mark(self.users[user], self.problems[problem], status)
+        self.assertRebuilt()
+
+    def assertRebuilt(self):
+        scores = set(UserScore.objects.values_list('user', 'scope', 'score'))
+        nodes = self.nodes()
+        UserScore.objects.rebuild()
+        self.assertEqual(set(UserScore.objects.values_list('user', 'scope', 'score')), scores)
+        self.assertEqual(self.nodes(), nodes)
+
+    def test_delete_problem(self):
+        self.mark(self.users[0], self.problems[0], 'confident')
+        self.mark(self.users[1], self.problems[1], 'solved')
+        self.mark(self.users[1], self.problems[2], 'solved')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.problems[0].delete()
+        self.assertEqual(UserScore.objects.rank(self.users[0].pk), {'score': 0, 'rank': 2, 'users': 1})
+        self.assertEqual(UserScore.objects.rank(self.users[1].pk, 'Google'), {'score': 1, 'rank': 1, 'users': 1})
+        self.assertRebuilt()
+
+    def test_move_companies(self):
+        self.mark(self.users[0], self.problems[0], 'confident')
+        self.mark(self.users[1], self.problems[2], 'solved')
+        problem = self.problems[0]
+        problem.companies = ['Amazon']
+        with self.captureOnCommitCallbacks(execute=True):
+            problem.save()
+        self.assertEqual(UserScore.objects.rank(self.users[0].pk, 'Google'), {'score': 0, 'rank': 1, 'users': 0})
+        self.assertEqual(UserScore.objects.rank(self.users[0].pk, 'Amazon'), {'score': 2, 'rank': 1, 'users': 1})
+        self.assertRebuilt()
+        # Imports move points the same way.
+        problem = self.problems[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            Problem.objects.upsert_by_name([Problem(
+                name=problem.name, acceptance=0.5, difficulty=problem.difficulty, question_html='<p>Q</p>',
+                solution_html='<p>S</p>', companies=['Amazon'])])
+        self.assertEqual(UserScore.objects.rank(self.users[1].pk, 'Amazon'), {'score': 1, 'rank': 2, 'users': 2})
+        self.assertRebuilt()
+
+    def test_delete_user(self):
+        self.mark(self.users[0], self.problems[0], 'solved')
+        self.mark(self.users[1], self.problems[1], 'solved')
+        self.users[0].delete()
+        self.assertEqual(UserScore.objects.rank(self.users[1].pk), {'score': 1, 'rank': 1, 'users': 1})
+
+
+class ProblemViewsTestCase(TestCase):
+    def setUp(self):
+        self.problem = Problem.objects.create(
+            name='Test Problem',
+            acceptance=0.99,
+            difficulty=DIFFICULTY_CHOICES[0][0],
+            question_html='<p>Test Question</p>',
+            solution_html='<p>Test Solution</p>',
+            companies=['Google'],
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpassword',
+        )
+        self.client.force_login(self.user)
+
+    def test_problem_list(self):
+        res = self.client.get(reverse('problems:problem_list'))
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'Test Question')
+        self.assertNotContains(res, '<p>Test Question</p>')
+
+    def test_problem_list_cursor(self):
+        for i in range(2):
+            Problem.objects.create(
+                name=f'Cursor Problem {i}',
+                acceptance=0.5,
+                difficulty=DIFFICULTY_CHOICES[0][0],
+                question_html='<p>Test Question</p>',
+                solution_html='<p>Test Solution</p>',
+                companies=['Google'],
+            )
+        res = self.client.get(reverse('problems:problem_list'), {'cursor': '', 'company': 'Google'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([p.name for p in res.context['problem_list']],
+                         ['Test Problem', 'Cursor Problem 0', 'Cursor Problem 1'])
+        self.assertIsNone(res.context['next_url'])
+        res = self.client.get(reverse('problems:problem_list'), {'cursor': 'invalid'})
+        self.assertEqual(res.status_code, 404)
+
+    def test_problem_detail_conditional(self):
+        url = reverse('problems:problem_detail', args=[self.problem.id])
+        # the first response sets the CSRF cookie, which is part of the ETag
+        self.client.get(url)
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 304)
+        self.problem.name = 'Changed'
+        self.problem.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 200)
+
+    def test_mark_problem(self):
+        res = self.client.get(reverse('problems:mark_problem', args=[self.problem.id, 'solved']))
+        self.assertRedirects(res, reverse('problems:problem_detail', args=[self.problem.id]))
+        res = self.client.get(reverse('problems:problem_detail', args=[self.problem.id]))
+        self.assertEqual(res.context['problem'].status, 'Solved')
+
+    def test_mark_problem_invalid(self):
+        res = self.client.get(reverse('problems:mark_problem', args=[999, 'solved']))
+        self.assertEqual(res.status_code, 404)
+
+
+class KeysetPageTestCase(TestCase):
+    def setUp(self):
+        for i, acceptance in enumerate([0.9, 0.5, 0.5, 0.5, 0.1]):
+            Problem.objects.create(
+                name=f'Problem {i % 2}',
+                acceptance=acceptance,
+                difficulty=DIFFICULTY_CHOICES[0][0],
+                question_html='<p>Test Question</p>',
+                solution_html='<p>Test Solution</p>',
+            )
+        self.expected = list(Problem.objects.order_by(*KEYSET_ORDERING).values_list('id', flat=True))
+
+    def test_forward_and_back(self):
+        seen, cursor = [], ''
+        while cursor is not None:
+            page = KeysetPage(Problem.objects.all(), cursor, 2)
+            seen += [p.id for p in page.object_list]
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([p.id for p in KeysetPage(Problem.objects.all(), page.previous_cursor, 2).object_list],
+                         self.expected[2:4])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            KeysetPage(Problem.objects.all(), 'invalid', 2)
+
+
+class ProblemAdminTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_superuser(username='teststaff', password='testpassword')
+
+    def changelist(self, **params):
+        request = RequestFactory().get(reverse('admin:problems_problem_changelist'), params)
+        request.user = self.staff
+        return admin.site._registry[Problem].get_changelist_instance(request)
+
+    def test_search(self):
+        for name, question_html in (('Sum of Numbers', '<p>Add them.</p>'), ('Other', '<p>Return the sum.</p>')):
+            Problem.objects.create(
+                name=name,
+                acceptance=0.99,
+                difficulty=DIFFICULTY_CHOICES[0][0],
+                question_html=question_html,
+                solution_html='<p>Test Solution</p>',
+            )
+        cl = self.changelist(q='sum')
+        self.assertEqual([p.name for p in cl.result_list], ['Sum of Numbers', 'Other'])
+        cl = self.changelist(q='missing')
+        self.assertEqual(cl.result_count, 0)
+
+
+class ProblemIndexTestCase(TestCase):
+    """
+    Checks that the common list queries can use their indexes, on a benchmark catalog planned with sequential scans
+    disabled: at this size the planner would still prefer reading the whole table.
+    """
+    problem_count = 3000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = benchmarks.seed(problems=cls.problem_count, users=1, progress=0)
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            # Rolled back with the rest of the test.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn(f'Seq Scan on {Problem._meta.db_table}', plan)
+
+    def test_default_ordering(self):
+        self.assertUsesIndex(Problem.objects.with_status(self.user)[:100], 'problem_ordering_idx')
+
+    def test_review_due(self):
+        problem_ids = list(Problem.objects.values_list('id', flat=True)[:500])
+        users = [self.user] + [User(username=f'user{i}') for i in range(10)]
+        User.objects.bulk_create(users[1:])
+        now = timezone.now()
+        UserProblemStatus.objects.bulk_create([
+            UserProblemStatus(user=user, problem_id=problem_id, status='solved',
+                              due_at=now + timedelta(hours=random.randint(-1000, 1000)))
+            for user in User.objects.all() for problem_id in problem_ids
+        ], batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {UserProblemStatus._meta.db_table}')
+        progress = UserProblemStatus.objects.filter(user=self.user, due_at__lte=now).order_by('due_at', 'problem_id')
+        plan = progress.values_list('problem_id', 'due_at')[:20].explain()
+        self.assertIn('Index Only Scan using progress_user_due_idx', plan)
+
+    def test_difficulty_filter(self):
+        problems = Problem.objects.filter(difficulty='hard').with_status(self.user)[:100]
+        self.assertUsesIndex(problems, 'problem_difficulty_order_idx')
+
+    def test_companies_overlap(self):
+        problems = Problem.objects.filter(companies__overlap=['Yelp', 'Zappos'])
+        self.assertUsesIndex(problems, 'problem_companies_idx')
+
+    def test_companies_contains(self):
+        problems = Problem.objects.filter(companies__contains=['Google'])
+        self.assertUsesIndex(problems, 'problem_companies_idx')
+
+    def test_companies_page(self):
+        problems = Problem.objects.filter(companies__overlap=['Google']).with_status(self.user)[:100]
+        self.assertNotIn(f'Seq Scan on {Problem._meta.db_table}', problems.explain())
+
+    def test_tags_overlap(self):
+        problems = Problem.objects.filter(tags__overlap=['Union Find'])
+        self.assertUsesIndex(problems, 'problem_tags_idx')
+
+    def test_similar(self):
+        problem_id = Problem.objects.values_list('id', flat=True).first()
+        bands = ProblemBand.objects.filter(problem_id=problem_id).values('band_hash')
+        candidates = ProblemBand.objects.filter(band_hash__in=bands)
+        self.assertIn('problem_band_hash_idx', candidates.explain())
+        # Only the problems sharing a band are compared, a small slice of the catalog.
+        self.assertLess(candidates.values('problem_id').distinct().count(), self.problem_count // 100)
+        with self.assertNumQueries(2):
+            ProblemSignature.objects.similar(problem_id, 10)
@@ -3,6 +3,8 @@ from django.urls import path
 from . import views
 
 app_name = 'problems'
+# Run as async views when served over ASGI (job_prep.asgi_urls).
+ASYNC_ROUTES = {'problem_list', 'problem_detail', 'mark_problem'}
 
 urlpatterns = [
     path('', views.ProblemListView.as_view(), name='problem_list'),
@@ -0,0 +1,23 @@
+import hashlib
+import html
+import json
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 200
+
+
+def html_to_text(value):
+    """
+    Plain text of an HTML fragment with entities decoded and whitespace collapsed.
+    """
+    return ' '.join(html.unescape(strip_tags(value)).split())
+
+
+def make_excerpt(value, length=EXCERPT_LENGTH):
+    return Truncator(html_to_text(value)).chars(length)
+
+
+def content_hash(values):
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
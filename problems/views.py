@@ -1,18 +1,32 @@
 import os
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Value, Case, When
-from django.http import HttpResponse
-from django.shortcuts import redirect
+from django.http import HttpResponse, Http404
+from django.shortcuts import redirect, get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views.generic import ListView, DetailView
 
 from constants import COMPANIES
-from users.models import User
-from .models import Problem
+from job_prep.routers import read_from_primary, use_replica
+from .cache import problem_validators
+from .models import Problem, ProblemFacetCount, UserProblemStatus
+from .pagination import EstimatedCountPaginator, KeysetPage
 
 
-class ProblemListView(LoginRequiredMixin, ListView):
+class ReplicaReadMixin:
+    """
+    Sends the reads of safe requests to a replica, once LoginRequiredMixin has checked the user on the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        use_replica(request)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ProblemListView(LoginRequiredMixin, ReplicaReadMixin, ListView):
     def get_queryset(self):
         problems = Problem.objects.all()
         if self.request.GET.get('company'):
@@ -20,43 +34,70 @@ class ProblemListView(LoginRequiredMixin, ListView):
             problems = problems.filter(companies__contains=companies)
         if self.request.GET.get('difficulty'):
             problems = problems.filter(difficulty=self.request.GET.get('difficulty'))
-        return problems.annotate(
-            status=Case(When(id__in=self.request.user.tried_problems, then=Value('Tried')),
-                        When(id__in=self.request.user.solved_problems, then=Value('Solved')),
-                        When(id__in=self.request.user.confident_problems, then=Value('Confident')), ))
+        return problems.defer('question_html', 'solution_html').with_status(self.request.user)
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        if self.request.GET.get('count') == 'estimate':
+            return EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        # ?cursor= (empty for the first page) switches to keyset pagination, which needs neither COUNT nor OFFSET.
+        if 'cursor' not in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            self.keyset_page = KeysetPage(queryset, self.request.GET['cursor'], int(page_size))
+        except ValueError:
+            raise Http404('Invalid cursor')
+        return None, None, self.keyset_page.object_list, True
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['companies'] = COMPANIES
+        counts = dict(ProblemFacetCount.objects.filter(facet='company').values_list('value', 'count'))
+        context['companies'] = [(company, counts.get(company, 0)) for company in COMPANIES]
         context['company'] = self.request.GET.get('company')
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params.pop('cursor', None)
+        context['page_query'] = f'&{params.urlencode()}' if params else ''
+        keyset_page = getattr(self, 'keyset_page', None)
+        if keyset_page is not None:
+            context['keyset_page'] = keyset_page
+            context['next_url'] = self.cursor_url(params, keyset_page.next_cursor)
+            context['previous_url'] = self.cursor_url(params, keyset_page.previous_cursor)
         return context
 
+    @staticmethod
+    def cursor_url(params, cursor):
+        if cursor is None:
+            return None
+        params = params.copy()
+        params['cursor'] = cursor
+        return f'?{params.urlencode()}'
+
     paginate_by = os.getenv('PROBLEMS_PER_PAGE', 10)
 
 
-class ProblemDetailView(LoginRequiredMixin, DetailView):
+class ProblemDetailView(LoginRequiredMixin, ReplicaReadMixin, DetailView):
     def get_queryset(self):
-        return Problem.objects.all().annotate(
-            status=Case(When(id__in=self.request.user.tried_problems, then=Value('Tried')),
-                        When(id__in=self.request.user.solved_problems, then=Value('Solved')),
-                        When(id__in=self.request.user.confident_problems, then=Value('Confident')), ))
+        return Problem.objects.with_status(self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        problem = get_object_or_404(self.get_queryset().only('id', 'content_hash', 'updated_at'), pk=kwargs['pk'])
+        # The page embeds a CSRF token, so a changed CSRF cookie must change the ETag too.
+        etag, last_modified = problem_validators(problem, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
 
 
+@login_required
 def mark_problem(request, pk, mark):
-    user: User = request.user
-    if pk in user.confident_problems:
-        user.confident_problems.remove(pk)
-    if pk in user.solved_problems:
-        user.solved_problems.remove(pk)
-    if pk in user.tried_problems:
-        user.tried_problems.remove(pk)
-    if mark == 'confident':
-        user.confident_problems.append(pk)
-    elif mark == 'solved':
-        user.solved_problems.append(pk)
-    elif mark == 'tried':
-        user.tried_problems.append(pk)
-    user.save()
+    if UserProblemStatus.objects.mark(request.user, pk, mark) is None:
+        raise Http404
     return redirect('problems:problem_detail', pk=pk)
 
 
@@ -65,4 +106,6 @@ def add_problem_link(request, pk):
     problem = Problem.objects.get(pk=pk)
     problem.problem_link = request.POST.get('problem_link')
     problem.save()
+    if request.user.is_authenticated:
+        read_from_primary(request.user.pk)
     return redirect('problems:problem_detail', pk=pk)
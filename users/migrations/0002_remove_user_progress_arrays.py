@@ -0,0 +1,26 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('problems', '0003_userproblemstatus'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='confident_problems',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='solved_problems',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='tried_problems',
+        ),
+    ]